@@ -0,0 +1,245 @@
+"""
+Sales analytics over order line items
+
+Order lines are loaded into column arrays with a projected cursor (plus the
+Parquet archive for older history) and aggregated with numpy/pandas instead
+of Python loops over order dicts. Reports are cached for REPORT_CACHE_TTL
+seconds and concurrent requests for the same report share one computation.
+
+Revenue is the sum of line totals of non-cancelled orders, i.e. merchandise
+without delivery fees, so vendor and platform numbers add up.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from archive import scan_archive
+from cache import cache
+from database import reporting_db
+from singleflight import group
+
+REPORT_CACHE_TTL = int(os.environ.get("REPORT_CACHE_TTL", "300"))
+# Hour-of-day and weekday breakdowns are in the shops' local time
+REPORT_TIMEZONE = os.environ.get("REPORT_TIMEZONE", "Europe/Istanbul")
+LOAD_BATCH_SIZE = 5000
+TOP_N = 20
+
+ORDER_LINE_PROJECTION = {
+    "created_at": 1,
+    "status": 1,
+    "items.product_id": 1,
+    "items.product_name": 1,
+    "items.quantity": 1,
+    "items.total": 1,
+}
+
+report_flights = group("reports")
+
+
+def _lines_frame(order_ids, created_at, statuses, counts, product_ids, names, quantities, totals):
+    import numpy as np
+    import pandas as pd
+
+    counts = np.asarray(counts, dtype=np.int64)
+    return pd.DataFrame({
+        "order_id": np.repeat(np.asarray(order_ids, dtype=object), counts),
+        "created_at": np.repeat(np.asarray(created_at, dtype="datetime64[ms]"), counts),
+        "status": np.repeat(np.asarray(statuses, dtype=object), counts),
+        "product_id": np.asarray(product_ids, dtype=object),
+        "product_name": np.asarray(names, dtype=object),
+        "quantity": np.asarray(quantities, dtype=np.float64),
+        "line_total": np.asarray(totals, dtype=np.float64),
+    })
+
+
+async def load_live_lines(match: dict):
+    """One row per order item; order columns are repeated with np.repeat instead of per item"""
+    order_ids, created_at, statuses, counts = [], [], [], []
+    product_ids, names, quantities, totals = [], [], [], []
+    cursor = reporting_db.orders.find(match, ORDER_LINE_PROJECTION).batch_size(LOAD_BATCH_SIZE)
+    async for order in cursor:
+        items = order.get("items") or []
+        order_ids.append(str(order["_id"]))
+        created_at.append(order.get("created_at") or datetime.min)
+        statuses.append(order.get("status"))
+        counts.append(len(items))
+        for item in items:
+            product_ids.append(item.get("product_id"))
+            names.append(item.get("product_name"))
+            quantities.append(item.get("quantity") or 0)
+            totals.append(item.get("total") or 0.0)
+    return _lines_frame(order_ids, created_at, statuses, counts, product_ids, names, quantities, totals)
+
+
+def load_archived_lines(since: datetime):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = scan_archive(["_id", "created_at", "status", "items"], since)
+    if table is None or table.num_rows == 0:
+        return None
+    table = table.combine_chunks()
+    items = table.column("items").chunk(0)
+    # Order columns are gathered per item with the list parent indices
+    parents = pc.list_parent_indices(items)
+    flat = pc.list_flatten(items)
+    return pd.DataFrame({
+        "order_id": table.column("_id").take(parents).to_numpy(zero_copy_only=False),
+        "created_at": table.column("created_at").take(parents).to_numpy(zero_copy_only=False).astype("datetime64[ms]"),
+        "status": table.column("status").take(parents).to_numpy(zero_copy_only=False),
+        "product_id": flat.field("product_id").to_numpy(zero_copy_only=False),
+        "product_name": flat.field("product_name").to_numpy(zero_copy_only=False),
+        "quantity": flat.field("quantity").fill_null(0).cast(pa.float64()).to_numpy(),
+        "line_total": flat.field("total").fill_null(0.0).to_numpy(),
+    })
+
+
+async def load_order_lines(since: datetime, product_ids: Optional[List[str]] = None, include_archive: bool = True):
+    """Order lines created since `since`; with `product_ids`, only lines of those products"""
+    import pandas as pd
+
+    match: Dict[str, Any] = {"created_at": {"$gte": since}}
+    if product_ids is not None:
+        match["items.product_id"] = {"$in": product_ids}
+    frames = [await load_live_lines(match)]
+    if include_archive:
+        archived = await asyncio.to_thread(load_archived_lines, since)
+        if archived is not None:
+            frames.append(archived)
+    lines = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if product_ids is not None:
+        lines = lines[lines["product_id"].isin(product_ids)]
+    return lines
+
+
+async def product_categories(product_ids) -> Dict[str, str]:
+    oids = [ObjectId(pid) for pid in product_ids if isinstance(pid, str) and ObjectId.is_valid(pid)]
+    categories = {}
+    async for product in reporting_db.products.find({"_id": {"$in": oids}}, {"category": 1}):
+        categories[str(product["_id"])] = product.get("category") or "unknown"
+    return categories
+
+# ============== AGGREGATION ==============
+
+
+def period_totals(lines, starts: Dict[str, datetime]) -> Dict[str, Dict[str, float]]:
+    """Order count and revenue of non-cancelled orders created since each start"""
+    import numpy as np
+
+    sold = lines[lines["status"] != "cancelled"]
+    per_order = sold.groupby("order_id", sort=False).agg(revenue=("line_total", "sum"), created_at=("created_at", "first"))
+    created = per_order["created_at"].to_numpy()
+    revenue = per_order["revenue"].to_numpy()
+    result = {}
+    for name, start in starts.items():
+        mask = created >= np.datetime64(start, "ms")
+        result[name] = {"orders": int(mask.sum()), "revenue": round(float(revenue[mask].sum()), 2)}
+    return result
+
+
+def compute_report(lines, categories: Dict[str, str], timezone: str = REPORT_TIMEZONE) -> Dict[str, Any]:
+    import numpy as np
+
+    cancelled_orders = int(lines.loc[lines["status"] == "cancelled", "order_id"].nunique())
+    sold = lines[lines["status"] != "cancelled"]
+
+    per_order = sold.groupby("order_id", sort=False).agg(revenue=("line_total", "sum"), created_at=("created_at", "first"))
+    order_count = len(per_order)
+    revenue = float(per_order["revenue"].sum())
+    order_revenue = per_order["revenue"].to_numpy()
+
+    local = per_order["created_at"].dt.tz_localize("UTC").dt.tz_convert(timezone)
+    hours = local.dt.hour.to_numpy(dtype=np.int64)
+    weekdays = local.dt.weekday.to_numpy(dtype=np.int64)
+    hour_orders = np.bincount(hours, minlength=24)
+    hour_revenue = np.bincount(hours, weights=order_revenue, minlength=24)
+    weekday_orders = np.bincount(weekdays, minlength=7)
+    weekday_revenue = np.bincount(weekdays, weights=order_revenue, minlength=7)
+
+    daily = per_order.groupby(local.dt.date.to_numpy())["revenue"].agg(["count", "sum"])
+
+    products = sold.groupby("product_id").agg(
+        product_name=("product_name", "first"),
+        revenue=("line_total", "sum"),
+        units=("quantity", "sum"),
+        orders=("order_id", "size"),
+    ).nlargest(TOP_N, "revenue")
+
+    by_category = sold.assign(category=sold["product_id"].map(categories).fillna("unknown")).groupby("category").agg(
+        revenue=("line_total", "sum"),
+        units=("quantity", "sum"),
+    ).sort_values("revenue", ascending=False)
+
+    return {
+        "summary": {
+            "orders": order_count,
+            "revenue": round(revenue, 2),
+            "units": int(sold["quantity"].sum()),
+            "average_order_value": round(revenue / order_count, 2) if order_count else 0.0,
+            "cancelled_orders": cancelled_orders,
+        },
+        "top_products": [
+            {
+                "product_id": str(pid),
+                "product_name": row.product_name,
+                "revenue": round(float(row.revenue), 2),
+                "units": int(row.units),
+                "orders": int(row.orders),
+            }
+            for pid, row in products.iterrows()
+        ],
+        "by_category": [
+            {"category": str(category), "revenue": round(float(row.revenue), 2), "units": int(row.units)}
+            for category, row in by_category.iterrows()
+        ],
+        "by_hour": [
+            {"hour": h, "orders": int(hour_orders[h]), "revenue": round(float(hour_revenue[h]), 2)}
+            for h in range(24)
+        ],
+        "by_weekday": [
+            {"weekday": d, "orders": int(weekday_orders[d]), "revenue": round(float(weekday_revenue[d]), 2)}
+            for d in range(7)
+        ],
+        "daily": [
+            {"date": day.isoformat(), "orders": int(row["count"]), "revenue": round(float(row["sum"]), 2)}
+            for day, row in daily.iterrows()
+        ],
+    }
+
+# ============== REPORTS ==============
+
+
+async def vendor_product_ids(vendor_id: str) -> List[str]:
+    products = await reporting_db.products.find({"vendor_id": vendor_id}, {"_id": 1}).to_list(None)
+    return [str(p["_id"]) for p in products]
+
+
+async def build_sales_report(days: int, vendor_id: Optional[str]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+    product_ids = await vendor_product_ids(vendor_id) if vendor_id else None
+    lines = await load_order_lines(since, product_ids)
+    categories = await product_categories(lines["product_id"].unique())
+    report = await asyncio.to_thread(compute_report, lines, categories)
+    report["range"] = {"from": since.isoformat(), "to": now.isoformat(), "days": days, "timezone": REPORT_TIMEZONE}
+    report["vendor_id"] = vendor_id
+    return report
+
+
+async def sales_report(days: int, vendor_id: Optional[str] = None) -> Dict[str, Any]:
+    """Cached sales report for the last `days` days, platform-wide or for one vendor"""
+    key = f"report:sales:{vendor_id or 'all'}:{days}"
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def build():
+        report = await build_sales_report(days, vendor_id)
+        await cache.set(key, report, REPORT_CACHE_TTL)
+        return report
+
+    return await report_flights.do(key, build)
@@ -0,0 +1,295 @@
+"""
+Order archive in partitioned Parquet files
+
+Completed and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved
+out of the ``orders`` collection into zstd-compressed Parquet files under
+ORDER_ARCHIVE_DIR/year=YYYY/month=MM/. Each batch is claimed in Mongo first
+(``archiving`` = target file), written to a temporary file and renamed into
+place, and only then deleted, so a crash at any point neither loses nor
+duplicates orders. Rows are sorted by user_id inside each file so row group
+statistics let per-user reads skip most of the data.
+
+Usage:
+    python archive.py --older-than-days 90 [--dry-run]
+
+The periodic task only runs with ORDER_ARCHIVE_ENABLED=1 and must run where
+ORDER_ARCHIVE_DIR is shared by every API host that serves reads.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from database import db
+from metrics import metrics
+from scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+ARCHIVE_DIR = Path(os.environ.get("ORDER_ARCHIVE_DIR", str(ROOT_DIR / "archive" / "orders")))
+ARCHIVE_ENABLED = os.environ.get("ORDER_ARCHIVE_ENABLED") == "1"
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ORDER_ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVE_STATUSES = ["completed", "cancelled"]
+ROW_GROUP_SIZE = 2000
+
+# Known order fields get typed columns; anything else is kept in `extra` as JSON
+COLUMNS = [
+    "_id", "user_id", "vendor_id", "status", "subtotal", "delivery_fee", "total",
+    "delivery_address", "delivery_latitude", "delivery_longitude", "phone",
+    "delivery_type", "courier_id", "notes", "cancel_reason", "created_at", "updated_at", "items",
+]
+
+
+def order_schema():
+    import pyarrow as pa
+
+    item = pa.struct([
+        ("product_id", pa.string()),
+        ("product_name", pa.string()),
+        ("quantity", pa.int64()),
+        ("price", pa.float64()),
+        ("total", pa.float64()),
+    ])
+    return pa.schema([
+        ("_id", pa.string()),
+        ("user_id", pa.string()),
+        ("vendor_id", pa.string()),
+        ("status", pa.string()),
+        ("subtotal", pa.float64()),
+        ("delivery_fee", pa.float64()),
+        ("total", pa.float64()),
+        ("delivery_address", pa.string()),
+        ("delivery_latitude", pa.float64()),
+        ("delivery_longitude", pa.float64()),
+        ("phone", pa.string()),
+        ("delivery_type", pa.string()),
+        ("courier_id", pa.string()),
+        ("notes", pa.string()),
+        ("cancel_reason", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+        ("updated_at", pa.timestamp("ms")),
+        ("items", pa.list_(item)),
+        ("extra", pa.string()),
+    ])
+
+
+def to_row(order: dict) -> dict:
+    row = {column: order.get(column) for column in COLUMNS}
+    row["_id"] = str(order["_id"])
+    for key in ("subtotal", "delivery_fee", "total", "delivery_latitude", "delivery_longitude"):
+        if row[key] is not None:
+            row[key] = float(row[key])
+    row["items"] = [
+        {
+            "product_id": i.get("product_id"),
+            "product_name": i.get("product_name"),
+            "quantity": i.get("quantity"),
+            "price": float(i["price"]) if i.get("price") is not None else None,
+            "total": float(i["total"]) if i.get("total") is not None else None,
+        }
+        for i in order.get("items", [])
+    ]
+    extra = {k: v for k, v in order.items() if k not in COLUMNS and k != "archiving"}
+    row["extra"] = json.dumps(extra, default=str) if extra else None
+    return row
+
+
+def from_row(row: dict) -> dict:
+    order = {k: v for k, v in row.items() if k not in ("extra", "year", "month")}
+    if row.get("extra"):
+        order.update(json.loads(row["extra"]))
+    order["archived"] = True
+    return order
+
+# ============== WRITE PATH ==============
+
+
+def write_partition(rows: List[dict], path: Path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pylist(rows, schema=order_schema()).sort_by([("user_id", "ascending"), ("created_at", "descending")])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Dot-prefixed files are ignored by dataset discovery until renamed
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def partition_path(created_at: datetime, batch_id: str) -> Path:
+    return ARCHIVE_DIR / f"year={created_at.year}" / f"month={created_at.month:02d}" / f"part-{batch_id}.parquet"
+
+
+async def finish_claimed():
+    """Complete or roll back batches claimed by a run that did not finish"""
+    for target in await db.orders.distinct("archiving"):
+        if Path(target).exists():
+            await db.orders.delete_many({"archiving": target})
+        else:
+            await db.orders.update_many({"archiving": target}, {"$unset": {"archiving": ""}})
+
+
+async def archive_batch(cutoff: datetime) -> int:
+    orders = await db.orders.find({
+        "status": {"$in": ARCHIVE_STATUSES},
+        "created_at": {"$lt": cutoff},
+        "archiving": {"$exists": False},
+    }).sort("created_at", 1).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+    if not orders:
+        return 0
+
+    batch_id = f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    partitions: Dict[Path, List[dict]] = defaultdict(list)
+    for order in orders:
+        partitions[partition_path(order["created_at"], batch_id)].append(order)
+
+    for path, members in partitions.items():
+        ids = [o["_id"] for o in members]
+        # Claim first, so a crash leaves a marker that finish_claimed can act on
+        await db.orders.update_many({"_id": {"$in": ids}}, {"$set": {"archiving": str(path)}})
+        rows = [to_row(o) for o in members]
+        await asyncio.to_thread(write_partition, rows, path)
+        await db.orders.delete_many({"archiving": str(path)})
+    metrics.inc("orders_archived", len(orders))
+    return len(orders)
+
+
+async def archive_orders(older_than_days: int = ARCHIVE_AFTER_DAYS, max_batches: Optional[int] = None) -> dict:
+    await finish_claimed()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = await archive_batch(cutoff)
+        if not count:
+            break
+        archived += count
+        batches += 1
+    if archived:
+        logger.info(f"Archived {archived} order(s) older than {older_than_days} days")
+    return {"archived": archived}
+
+
+@periodic("archive_orders", interval=6 * 3600)
+async def scheduled_archive() -> Optional[dict]:
+    if not ARCHIVE_ENABLED:
+        return None
+    # Bounded per run so the lease is not outlived by a large backlog
+    return await archive_orders(max_batches=50)
+
+# ============== READ PATH ==============
+
+
+_dataset_cache: Dict[str, Any] = {}
+
+
+def _dataset():
+    import pyarrow.dataset as ds
+
+    files = tuple(sorted(str(path) for path in ARCHIVE_DIR.glob("year=*/month=*/*.parquet")))
+    if not files:
+        return None
+    # Archive files are immutable once renamed into place, so the dataset is only rebuilt when the file set changes
+    if _dataset_cache.get("files") != files:
+        dataset = ds.dataset(list(files), format="parquet", partitioning="hive", partition_base_dir=str(ARCHIVE_DIR))
+        _dataset_cache.update(files=files, dataset=dataset)
+    return _dataset_cache["dataset"]
+
+
+def _read_user_orders(user_id: str, limit: int, before: Optional[datetime]) -> List[dict]:
+    import pyarrow.dataset as ds
+
+    dataset = _dataset()
+    if dataset is None:
+        return []
+    condition = ds.field("user_id") == user_id
+    if before is not None:
+        condition &= ds.field("created_at") < before
+    table = dataset.to_table(filter=condition)
+    table = table.sort_by([("created_at", "descending")]).slice(0, limit)
+    return [from_row(row) for row in table.to_pylist()]
+
+
+async def archived_orders_for_user(user_id: str, limit: int, before: Optional[datetime] = None) -> List[dict]:
+    """Archived orders of one user created before `before` (if given), newest first"""
+    if limit <= 0:
+        return []
+    return await asyncio.to_thread(_read_user_orders, user_id, limit, before)
+
+
+def scan_archive(columns: List[str], since: Optional[datetime] = None):
+    """Archived orders as a pyarrow Table (None without an archive); partitions before `since` are skipped"""
+    import pyarrow.dataset as ds
+
+    dataset = _dataset()
+    if dataset is None:
+        return None
+    condition = None
+    if since is not None:
+        condition = (
+            (ds.field("year") > since.year)
+            | ((ds.field("year") == since.year) & (ds.field("month") >= since.month))
+        ) & (ds.field("created_at") >= since)
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+_summary_cache: Dict[str, Any] = {}
+
+
+def _archive_summary() -> Dict[str, Any]:
+    dataset = _dataset()
+    if dataset is None:
+        return {"orders_by_status": {}, "revenue_by_status": {}}
+    # Archive files are immutable once renamed into place, so the file list identifies the contents
+    files = tuple(sorted(dataset.files))
+    if _summary_cache.get("files") == files:
+        return _summary_cache["summary"]
+    table = dataset.to_table(columns=["status", "total"])
+    grouped = table.group_by("status").aggregate([("total", "sum"), ("status", "count")])
+    summary = {"orders_by_status": {}, "revenue_by_status": {}}
+    for row in grouped.to_pylist():
+        summary["orders_by_status"][row["status"]] = row["status_count"]
+        summary["revenue_by_status"][row["status"]] = row["total_sum"] or 0.0
+    _summary_cache.update(files=files, summary=summary)
+    return summary
+
+
+async def archive_summary() -> Dict[str, Any]:
+    """Order counts and revenue per status over the whole archive"""
+    return await asyncio.to_thread(_archive_summary)
+
+
+async def main():
+    from dotenv import load_dotenv
+    load_dotenv(ROOT_DIR / ".env")
+    import database
+
+    parser = argparse.ArgumentParser(description="Move old completed/cancelled orders to Parquet")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the orders that would be archived")
+    args = parser.parse_args()
+
+    database.connect()
+    try:
+        if args.dry_run:
+            cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+            count = await db.orders.count_documents({"status": {"$in": ARCHIVE_STATUSES}, "created_at": {"$lt": cutoff}})
+            print(f"{count:,} order(s) would be archived to {ARCHIVE_DIR}")
+        else:
+            result = await archive_orders(args.older_than_days)
+            print(f"Archived {result['archived']:,} order(s) to {ARCHIVE_DIR}")
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Authentication helpers and dependencies
+
+Customer/admin accounts (``users``) and vendor panel accounts (``vendors``)
+use separate token types and separate dependencies.
+"""
+from fastapi import HTTPException, Depends, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import os
+from typing import List, Optional
+from datetime import datetime, timedelta
+from functools import lru_cache
+from bson import ObjectId
+
+from database import db
+
+# Security
+# passlib and jose are imported on first use; together they account for a
+# noticeable share of import time and most cold starts serve catalog reads first
+SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production-12345")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+
+security = HTTPBearer()
+
+# ============== HELPER FUNCTIONS ==============
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def verify_password(plain_password, hashed_password):
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return get_pwd_context().hash(password)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    from jose import JWTError, jwt
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        token = credentials.credentials
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+    
+    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    if user is None:
+        raise credentials_exception
+    
+    # Add decoded token data to user object for easy access
+    user["_id"] = str(user["_id"])
+    user["role"] = user.get("role", "customer")
+    return user
+
+def require_role(allowed_roles: List[str]):
+    """
+    Dependency to check if current user has one of the allowed roles
+    Usage: current_user: dict = Depends(require_role(["admin", "vendor"]))
+    """
+    async def role_checker(current_user: dict = Depends(get_current_user)):
+        user_role = current_user.get("role", "customer")
+        if user_role not in allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Access denied. Required roles: {', '.join(allowed_roles)}"
+            )
+        return current_user
+    return role_checker
+
+async def verify_vendor_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify vendor JWT token"""
+    from jose import JWTError, jwt
+    try:
+        token = credentials.credentials
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        vendor_id = payload.get("sub")
+        token_type = payload.get("type")
+        
+        if token_type != "vendor":
+            raise HTTPException(status_code=403, detail="Not a vendor account")
+        
+        if vendor_id is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        
+        vendor = await db.vendors.find_one({"_id": ObjectId(vendor_id)})
+        if vendor is None:
+            raise HTTPException(status_code=401, detail="Vendor not found")
+        
+        return vendor
+        
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
@@ -0,0 +1,365 @@
+"""
+In-memory search autocomplete
+
+Every process keeps a sorted array of index keys over normalised product
+names and categories and answers prefix queries with ``bisect``, so a
+suggestion never touches MongoDB. Normalisation lowercases the Turkish way
+(I -> ı, İ -> i) and then folds ç ğ ı ö ş ü to ASCII, so "sut", "SÜT" and
+"süt" all find "Süt". Each word of a name is a key, so "elma" also finds
+"Kırmızı Elma".
+
+Suggestions are distinct product names (and categories) ranked by popularity,
+the summed ``sold_count`` of the available products carrying the name. Ranked
+results are kept per prefix: precomputed for one- and two-character prefixes,
+which match a large part of the catalog (a one-character list is ranked from
+its two-character lists), and cached on first use for longer ones (up to
+PREFIX_CACHE_SIZE prefixes), so a repeated prefix is a dict lookup.
+
+The index is built at startup from a projected cursor and rebuilt every
+AUTOCOMPLETE_REFRESH_SECONDS (popularity moves with every order). In between,
+PRODUCTS_CHANGED events from product writes in this process are queued and
+applied by a background task in batches gathered over AUTOCOMPLETE_BATCH_SECONDS,
+re-ranking each affected short prefix once per batch; other processes pick
+those changes up on their next rebuild.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from database import catalog_db, db
+from events import PRODUCTS_CHANGED, bus
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.environ.get("AUTOCOMPLETE_REFRESH_SECONDS", "300"))
+AUTOCOMPLETE_LIMIT = 10
+PRECOMPUTED_PREFIX_LENGTH = 2
+PRECOMPUTED_SIZE = 50
+# Ranked results of longer prefixes are cached once asked for
+PREFIX_CACHE_SIZE = 20000
+# Product changes are applied in batches gathered over this long
+AUTOCOMPLETE_BATCH_SECONDS = float(os.environ.get("AUTOCOMPLETE_BATCH_SECONDS", "1"))
+REFRESH_CHUNK_SIZE = 1000
+APPLY_STEP = 64
+# Up to this many key changes a batch edits the sorted key list in place instead of re-sorting it
+KEY_EDIT_LIMIT = 256
+
+PRODUCT_PROJECTION = {"name": 1, "category": 1, "sold_count": 1, "is_available": 1}
+
+TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+ASCII_FOLD = str.maketrans({"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u", "â": "a", "î": "i", "û": "u"})
+NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Turkish-aware lowercase, folded to ASCII letters and digits separated by single spaces"""
+    text = unicodedata.normalize("NFC", str(text)).translate(TURKISH_LOWER).lower()
+    text = text.translate(ASCII_FOLD)
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return NON_WORD.sub(" ", text).strip()
+
+
+def index_keys(normalized: str) -> List[str]:
+    """The whole text and every tail starting at a word ("kirmizi elma", "elma")"""
+    words = normalized.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+@dataclass
+class Term:
+    text: str
+    kind: str  # product, category
+    popularity: int = 0
+    products: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, "kind": self.kind, "popularity": self.popularity, "products": self.products}
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        # term id ("p:<normalised name>" / "c:<category>") -> Term
+        self.terms: Dict[str, Term] = {}
+        # Sorted (index key, term id)
+        self.keys: List[Tuple[str, str]] = []
+        # product id -> (term ids it counts towards, popularity it adds)
+        self.products: Dict[str, Tuple[Tuple[str, ...], int]] = {}
+        # prefix -> ranked term ids
+        self.top: Dict[str, List[str]] = {}
+        self.ready = False
+        self.built_at: Optional[float] = None
+        # Products changed while a rebuild was reading, applied again once it is swapped in
+        self._changed_during_build: Optional[set] = None
+        # Changed products waiting for the next update batch
+        self._pending: set = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._updater: Optional[asyncio.Task] = None
+
+    # ---------- building ----------
+
+    @staticmethod
+    def _product_terms(product: Dict[str, Any]) -> Tuple[Tuple[str, str, str], ...]:
+        """(term id, display text, kind) a product counts towards"""
+        terms = []
+        name = normalize(product.get("name") or "")
+        if name:
+            terms.append((f"p:{name}", str(product["name"]).strip(), "product"))
+        category = normalize(product.get("category") or "")
+        if category:
+            terms.append((f"c:{category}", str(product["category"]), "category"))
+        return tuple(terms)
+
+    def _add_product(self, product: Dict[str, Any], new_keys: List[Tuple[str, str]]):
+        """Count a product towards its terms; keys of new terms go to `new_keys` for the caller to merge"""
+        product_id = str(product["_id"])
+        popularity = max(int(product.get("sold_count") or 0), 0)
+        term_ids = []
+        for term_id, text, kind in self._product_terms(product):
+            term = self.terms.get(term_id)
+            if term is None:
+                term = self.terms[term_id] = Term(text=text, kind=kind)
+                new_keys.extend((key, term_id) for key in index_keys(term_id[2:]))
+            term.popularity += popularity
+            term.products += 1
+            term_ids.append(term_id)
+        self.products[product_id] = (tuple(term_ids), popularity)
+
+    def _remove_product(self, product_id: str, dropped_keys: set):
+        """Uncount a product, dropping terms no product carries any more; their keys go to `dropped_keys`"""
+        entry = self.products.pop(product_id, None)
+        if entry is None:
+            return
+        term_ids, popularity = entry
+        for term_id in term_ids:
+            term = self.terms[term_id]
+            term.popularity -= popularity
+            term.products -= 1
+            if term.products <= 0:
+                del self.terms[term_id]
+                dropped_keys.update((key, term_id) for key in index_keys(term_id[2:]))
+
+    def _rank(self, term_ids: Iterable[str], limit: int) -> List[str]:
+        terms = self.terms
+        # Lists not refreshed yet after a batch may still name dropped terms
+        ranked = heapq.nlargest(limit, [(terms[t].popularity, terms[t].products, t) for t in set(term_ids) if t in terms])
+        return [t for _, _, t in ranked]
+
+    def _bounds(self, prefix: str, start: int = 0) -> Tuple[int, int]:
+        # Keys are [0-9a-z ], all below "{", so the matches are one slice
+        start = bisect_left(self.keys, (prefix, ""), start)
+        return start, bisect_left(self.keys, (prefix + "{", ""), start)
+
+    def _scan(self, prefix: str) -> List[str]:
+        start, end = self._bounds(prefix)
+        return [term_id for _, term_id in self.keys[start:end]]
+
+    def _rank_prefix(self, prefix: str) -> List[str]:
+        if len(prefix) >= PRECOMPUTED_PREFIX_LENGTH:
+            return self._rank(self._scan(prefix), PRECOMPUTED_SIZE)
+        # Every match is the prefix itself or in the ranked list of a one character
+        # longer prefix, so ranking those lists together is exact and far smaller
+        candidates = []
+        i, end = self._bounds(prefix)
+        while i < end:
+            key, term_id = self.keys[i]
+            if len(key) == len(prefix):
+                candidates.append(term_id)
+                i += 1
+            else:
+                child = key[:len(prefix) + 1]
+                candidates.extend(self._ranked(child))
+                i = self._bounds(child, i)[1]
+        return self._rank(candidates, PRECOMPUTED_SIZE)
+
+    def _ranked(self, prefix: str) -> List[str]:
+        ranked = self.top.get(prefix)
+        if ranked is None:
+            ranked = self.top[prefix] = self._rank_prefix(prefix)
+            if len(self.top) > PREFIX_CACHE_SIZE:
+                # Oldest first; precomputed short prefixes come back on their next use
+                del self.top[next(iter(self.top))]
+        return ranked
+
+    def _refresh_top(self, prefixes: Iterable[str]):
+        # Longest first, so shorter prefixes are ranked from fresh lists
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            ranked = self._rank_prefix(prefix)
+            if ranked:
+                self.top[prefix] = ranked
+            else:
+                self.top.pop(prefix, None)
+
+    def _short_prefixes(self, term_ids: Iterable[str]) -> set:
+        prefixes = set()
+        for term_id in term_ids:
+            for key in index_keys(term_id[2:]):
+                for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                    prefixes.add(key[:length])
+        return prefixes
+
+    @staticmethod
+    def build(products: Iterable[Dict[str, Any]]) -> "AutocompleteIndex":
+        """A new index over `products` (CPU only, so it can run in a worker thread)"""
+        fresh = AutocompleteIndex()
+        new_keys: List[Tuple[str, str]] = []
+        for product in products:
+            fresh._add_product(product, new_keys)
+        new_keys.sort()
+        fresh.keys = new_keys
+        fresh._refresh_top({key[:n] for key, _ in new_keys for n in range(1, PRECOMPUTED_PREFIX_LENGTH + 1)})
+        return fresh
+
+    def apply(self, products: Dict[str, Optional[Dict[str, Any]]]) -> set:
+        """
+        Bring a batch of products up to date (product id -> document, None or
+        unavailable when it should not be suggested); returns the short prefixes
+        whose precomputed lists are now stale
+        """
+        changed = set()
+        dropped_keys: set = set()
+        new_keys: List[Tuple[str, str]] = []
+        for product_id, product in products.items():
+            changed.update(self.products.get(product_id, ((), 0))[0])
+            self._remove_product(product_id, dropped_keys)
+            if product is not None and product.get("is_available", True):
+                self._add_product(product, new_keys)
+                changed.update(self.products[product_id][0])
+        if len(dropped_keys) + len(new_keys) <= KEY_EDIT_LIMIT:
+            # A few keys: bisect edits, each a memmove of the list
+            for item in dropped_keys:
+                i = bisect_left(self.keys, item)
+                if i < len(self.keys) and self.keys[i] == item:
+                    del self.keys[i]
+            for item in new_keys:
+                insort(self.keys, item)
+        else:
+            # Many: one pass over the list per batch
+            if dropped_keys:
+                self.keys = [k for k in self.keys if k not in dropped_keys]
+            self.keys.extend(new_keys)
+            self.keys.sort()
+        for term_id in changed:
+            for key in index_keys(term_id[2:]):
+                for length in range(PRECOMPUTED_PREFIX_LENGTH + 1, len(key) + 1):
+                    self.top.pop(key[:length], None)
+        return self._short_prefixes(changed)
+
+    async def _refresh_short(self, prefixes: Iterable[str]):
+        # One prefix at a time, giving way to requests in between; stale lists are served meanwhile
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            self._refresh_top([prefix])
+            await asyncio.sleep(0)
+
+    # ---------- querying ----------
+
+    def suggest(self, query: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Dict[str, Any]]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        return [self.terms[t].to_dict() for t in self._ranked(prefix)[:limit] if t in self.terms]
+
+    # ---------- lifecycle ----------
+
+    async def rebuild(self):
+        started = time.perf_counter()
+        self._changed_during_build = set()
+        try:
+            products = await catalog_db.products.find({"is_available": True}, PRODUCT_PROJECTION).to_list(None)
+            fresh = await asyncio.to_thread(self.build, products)
+            # Swapped on the event loop, so a suggestion never sees half of each
+            self.terms, self.keys, self.products, self.top = fresh.terms, fresh.keys, fresh.products, fresh.top
+            self.ready = True
+            self.built_at = time.time()
+            changed = self._changed_during_build
+        finally:
+            self._changed_during_build = None
+        if changed:
+            self.queue(changed)
+        metrics.inc("autocomplete_rebuilds")
+        logger.info(
+            f"Autocomplete index built: {len(self.terms)} terms from {len(products)} products "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Autocomplete rebuild failed: {str(e)}")
+            await asyncio.sleep(AUTOCOMPLETE_REFRESH_SECONDS)
+
+    def queue(self, product_ids: Iterable[str]):
+        """Apply these products in the next update batch"""
+        self._pending.update(product_ids)
+        if self._changed_during_build is not None:
+            self._changed_during_build.update(product_ids)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _update_loop(self):
+        while True:
+            await self._wake.wait()
+            # Let a burst (an import writes products in chunks) gather into one batch
+            await asyncio.sleep(AUTOCOMPLETE_BATCH_SECONDS)
+            self._wake.clear()
+            product_ids, self._pending = list(self._pending), set()
+            # Before the first build there is nothing to update; the build reads them anyway
+            if not product_ids or not self.ready:
+                continue
+            try:
+                await self.refresh_products(product_ids)
+            except Exception as e:
+                logger.error(f"Autocomplete update of {len(product_ids)} product(s) failed: {str(e)}")
+
+    async def refresh_products(self, product_ids: List[str]):
+        # Primary, so the write that raised the event is visible
+        found = {}
+        for start in range(0, len(product_ids), REFRESH_CHUNK_SIZE):
+            chunk = [ObjectId(pid) for pid in product_ids[start:start + REFRESH_CHUNK_SIZE]]
+            async for product in db.products.find({"_id": {"$in": chunk}}, PRODUCT_PROJECTION):
+                found[str(product["_id"])] = product
+        stale = set()
+        for start in range(0, len(product_ids), APPLY_STEP):
+            # In steps, giving way to requests in between
+            stale |= self.apply({pid: found.get(pid) for pid in product_ids[start:start + APPLY_STEP]})
+            await asyncio.sleep(0)
+        await self._refresh_short(stale)
+        metrics.inc("autocomplete_updates", len(product_ids))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+        if self._updater is None:
+            self._wake = asyncio.Event()
+            self._updater = asyncio.create_task(self._update_loop())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, self._updater) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._updater = None
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+@bus.on(PRODUCTS_CHANGED)
+async def on_products_changed(payload: Dict[str, Any]):
+    """payload: {"product_ids": [...]} of created, updated or deleted products"""
+    # Only queued: the publishing request does not wait for the index
+    ids = [pid for pid in payload.get("product_ids", []) if ObjectId.is_valid(pid)]
+    if ids:
+        autocomplete_index.queue(ids)
@@ -0,0 +1,166 @@
+"""
+Dispatch planning throughput and a small city simulation
+
+  throughput: plan one tick with N waiting orders and M idle couriers around
+              Istanbul and report planning time, plus how much 2-opt shortens
+              nearest-neighbour routes
+  simulate:   run many ticks; new orders arrive every tick, couriers ride their
+              route at --speed-kmh and become idle again when done; reports
+              delivered orders, batch sizes and waiting times
+
+    python benchmarks/bench_dispatch.py --orders 5000 --couriers 800 --vendors 400
+    python benchmarks/bench_dispatch.py --simulate --ticks 180 --orders-per-tick 60
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+import dispatch  # noqa: E402
+from geo import haversine_matrix  # noqa: E402
+
+CITY_CENTER = (41.02, 28.98)
+CITY_SPREAD_DEG = 0.12
+
+
+def random_point(rng: random.Random, around=CITY_CENTER, spread=CITY_SPREAD_DEG):
+    return around[0] + rng.gauss(0, spread / 2), around[1] + rng.gauss(0, spread)
+
+
+def make_vendors(count: int, rng: random.Random):
+    return {f"v{i}": random_point(rng) for i in range(count)}
+
+
+def make_orders(count: int, vendors, rng: random.Random, now: datetime, start: int = 0):
+    vendor_ids = list(vendors)
+    orders = []
+    for i in range(count):
+        vendor_id = rng.choice(vendor_ids)
+        lat, lon = random_point(rng, vendors[vendor_id], 0.03)
+        orders.append({
+            "_id": f"o{start + i}",
+            "vendor_id": vendor_id,
+            "delivery_latitude": lat,
+            "delivery_longitude": lon,
+            "created_at": now - timedelta(seconds=rng.randint(0, 900)),
+        })
+    return orders
+
+
+def make_couriers(count: int, rng: random.Random):
+    return [{"_id": f"c{i}", "latitude": p[0], "longitude": p[1]} for i, p in ((i, random_point(rng)) for i in range(count))]
+
+
+def two_opt_gain(rng: random.Random, stops: int, samples: int):
+    """Average route length with nearest neighbour only vs nearest neighbour + 2-opt"""
+    nn_total = opt_total = 0.0
+    for _ in range(samples):
+        points = [random_point(rng, CITY_CENTER, 0.03) for _ in range(stops + 1)]
+        lats, lons = [p[0] for p in points], [p[1] for p in points]
+        dist = haversine_matrix(lats, lons, lats, lons)
+        route = dispatch.nearest_neighbour(dist)
+        nn_total += dispatch.route_length(route, dist)
+        opt_total += dispatch.route_length(dispatch.two_opt(route, dist), dist)
+    return nn_total / samples, opt_total / samples
+
+
+def throughput(args):
+    rng = random.Random(args.seed)
+    now = datetime(2025, 1, 1, 12)
+    vendors = make_vendors(args.vendors, rng)
+    orders = make_orders(args.orders, vendors, rng, now)
+    couriers = make_couriers(args.couriers, rng)
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        assignments = dispatch.plan_dispatch(orders, vendors, couriers, now, batch_size=args.batch_size)
+        timings.append(time.perf_counter() - started)
+    assigned = sum(len(a.order_ids) for a in assignments)
+    best = min(timings)
+    print(f"{args.orders} orders, {args.couriers} couriers, {args.vendors} vendors, batch size {args.batch_size}")
+    print(f"  plan: {best * 1000:.1f} ms best / {statistics.median(timings) * 1000:.1f} ms median "
+          f"({args.orders / best:,.0f} orders/s)")
+    print(f"  assigned {len(assignments)} batches, {assigned} orders "
+          f"(avg {assigned / max(len(assignments), 1):.2f} per batch, "
+          f"avg pickup {np.mean([a.pickup_km for a in assignments]):.2f} km, "
+          f"avg route {np.mean([a.route_km for a in assignments]):.2f} km)")
+    for stops in (5, 10, 20):
+        nn, opt = two_opt_gain(rng, stops, 200)
+        print(f"  {stops:2d} stops: nearest neighbour {nn:.2f} km, + 2-opt {opt:.2f} km ({(1 - opt / nn) * 100:.1f}% shorter)")
+
+
+def simulate(args):
+    rng = random.Random(args.seed)
+    now = datetime(2025, 1, 1, 12)
+    tick = timedelta(seconds=args.tick_seconds)
+    vendors = make_vendors(args.vendors, rng)
+    couriers = make_couriers(args.couriers, rng)
+    busy_until = {c["_id"]: now for c in couriers}
+    waiting, delivered, waits, batch_sizes, plan_ms = [], 0, [], [], []
+
+    for t in range(args.ticks):
+        new_orders = make_orders(args.orders_per_tick, vendors, rng, now, start=t * args.orders_per_tick)
+        for order in new_orders:
+            order["created_at"] = now
+        waiting.extend(new_orders)
+        idle = [c for c in couriers if busy_until[c["_id"]] <= now]
+
+        started = time.perf_counter()
+        assignments = dispatch.plan_dispatch(waiting, vendors, idle, now, batch_size=args.batch_size)
+        plan_ms.append((time.perf_counter() - started) * 1000)
+
+        by_id = {c["_id"]: c for c in couriers}
+        assigned_ids = set()
+        for a in assignments:
+            courier = by_id[a.courier_id]
+            hours = (a.pickup_km + a.route_km) / args.speed_kmh
+            busy_until[a.courier_id] = now + timedelta(hours=hours) + timedelta(minutes=2 * len(a.order_ids))
+            courier["latitude"], courier["longitude"] = a.stops[-1]
+            assigned_ids.update(a.order_ids)
+            batch_sizes.append(len(a.order_ids))
+        for order in waiting:
+            if order["_id"] in assigned_ids:
+                waits.append((now - order["created_at"]).total_seconds() / 60)
+        delivered += len(assigned_ids)
+        waiting = [o for o in waiting if o["_id"] not in assigned_ids]
+        now += tick
+
+    hours = args.ticks * args.tick_seconds / 3600
+    print(f"{args.ticks} ticks of {args.tick_seconds}s, {args.orders_per_tick} new orders/tick, "
+          f"{args.couriers} couriers, {args.vendors} vendors")
+    print(f"  dispatched {delivered} orders ({delivered / hours:,.0f}/h), {len(waiting)} still waiting")
+    print(f"  batch size avg {np.mean(batch_sizes):.2f}, wait avg {np.mean(waits):.1f} min, "
+          f"p95 {np.percentile(waits, 95):.1f} min")
+    print(f"  plan time avg {np.mean(plan_ms):.1f} ms, max {max(plan_ms):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark courier dispatch planning")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--couriers", type=int, default=800)
+    parser.add_argument("--vendors", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=dispatch.DISPATCH_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--simulate", action="store_true")
+    parser.add_argument("--ticks", type=int, default=180)
+    parser.add_argument("--tick-seconds", type=int, default=20)
+    parser.add_argument("--orders-per-tick", type=int, default=60)
+    parser.add_argument("--speed-kmh", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.simulate:
+        simulate(args)
+    else:
+        throughput(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+CPU cost of serializing list responses
+
+Compares, for one listing of N product documents:
+  - default: what FastAPI does for a handler returning raw dicts
+    (jsonable_encoder + json.dumps in JSONResponse)
+  - validated: read model validation + dump_json (VALIDATE_RESPONSES=1)
+  - fast path: precompiled TypeAdapter dump_json of the trusted documents
+
+    python benchmarks/bench_read_models.py --items 100 --image-bytes 2000
+"""
+import argparse
+import base64
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import read_models  # noqa: E402
+from read_models import ProductRead  # noqa: E402
+
+
+def make_products(count: int, image_bytes: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    products = []
+    for i in range(count):
+        products.append({
+            "_id": str(ObjectId()),
+            "vendor_id": str(ObjectId()),
+            "name": f"Domates {i}",
+            "description": "Günlük taze, yerli üretim",
+            "category": rng.choice(["vegetables", "fruits", "dairy"]),
+            "price": round(rng.uniform(5, 120), 2),
+            "unit": "kg",
+            "stock": rng.randint(0, 500),
+            "images": [base64.b64encode(rng.randbytes(image_bytes)).decode()] if image_bytes else [],
+            "is_available": True,
+            "discount_percentage": 0.0,
+            "quality_grade": "A",
+            "created_at": now - timedelta(days=i),
+            "updated_at": now,
+        })
+    return products
+
+
+def default_path(products):
+    return JSONResponse(content=jsonable_encoder(products)).body
+
+
+def validated_path(products):
+    read_models.VALIDATE_RESPONSES = True
+    return read_models.dump(ProductRead, products, many=True)
+
+
+def fast_path(products):
+    read_models.VALIDATE_RESPONSES = False
+    return read_models.dump(ProductRead, products, many=True)
+
+
+def measure(fn, products, repeat: int) -> float:
+    fn(products)  # warm up (adapter compilation)
+    started = time.process_time()
+    for _ in range(repeat):
+        fn(products)
+    return (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--image-bytes", type=int, default=0, help="Size of one base64 image per product before encoding")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    products = make_products(args.items, args.image_bytes, args.seed)
+    results = {
+        "default": measure(default_path, products, args.repeat),
+        "validated": measure(validated_path, products, args.repeat),
+        "fast path": measure(fast_path, products, args.repeat),
+    }
+    baseline = results["default"]
+    print(f"{args.items} products, {args.image_bytes} image bytes each, {args.repeat} runs")
+    for name, seconds in results.items():
+        print(f"  {name:<10} {seconds * 1e6:9.0f} µs CPU/request  ({baseline / seconds:4.1f}x vs default)")
+
+
+if __name__ == "__main__":
+    main()
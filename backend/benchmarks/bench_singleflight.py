@@ -0,0 +1,75 @@
+"""
+Stampede benchmark for singleflight coalescing
+
+Simulates a burst of clients hitting a few hot keys (a vendor going live, a
+push notification) against a fake database with fixed query latency, with and
+without coalescing, and reports how many queries reach the database:
+
+    python benchmarks/bench_singleflight.py --clients 5000 --burst-ms 1000 --keys 3
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from singleflight import SingleFlight  # noqa: E402
+
+
+class FakeDatabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.queries = 0
+        self.per_bucket = Counter()
+        self.started = time.perf_counter()
+
+    async def find_one(self, key):
+        self.queries += 1
+        self.per_bucket[int((time.perf_counter() - self.started) * 10)] += 1
+        await asyncio.sleep(self.latency)
+        return {"_id": key}
+
+
+async def run(args, coalesce: bool):
+    rng = random.Random(args.seed)
+    database = FakeDatabase(args.latency_ms / 1000)
+    flights = SingleFlight("bench")
+    keys = [f"vendor-{i}" for i in range(args.keys)]
+
+    async def client(delay: float, key: str):
+        await asyncio.sleep(delay)
+        if coalesce:
+            return await flights.do(key, lambda: database.find_one(key))
+        return await database.find_one(key)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(rng.uniform(0, args.burst_ms / 1000), rng.choice(keys)) for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+    peak_qps = max(database.per_bucket.values()) * 10
+    return database.queries, peak_qps, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--burst-ms", type=float, default=1000)
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'db queries':>11} {'peak db qps':>12} {'elapsed s':>10}")
+    for coalesce in (False, True):
+        queries, peak_qps, elapsed = asyncio.run(run(args, coalesce))
+        mode = "singleflight" if coalesce else "direct"
+        print(f"{mode:>12} {queries:>11} {peak_qps:>12} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Throughput vs. worker count
+
+Starts the API with 1, 2, 4, ... workers and drives it with several load
+generator processes, printing requests/second and scaling efficiency:
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --path /api/vendors/all
+
+Needs MONGO_URL/DB_NAME like the server itself. Use a cached or static path to
+measure the serving layer rather than MongoDB.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+async def _drive(url: str, duration: float, connections: int) -> int:
+    done = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as client:
+        async def loop():
+            nonlocal done
+            while time.monotonic() < deadline:
+                response = await client.get(url)
+                if response.status_code == 200:
+                    done += 1
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return done
+
+
+def load_process(url: str, duration: float, connections: int, queue):
+    queue.put(asyncio.run(_drive(url, duration, connections)))
+
+
+def measure(workers: int, args) -> float:
+    port = args.port
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    server = subprocess.Popen([sys.executable, "server.py"], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}{args.path}"
+        wait_until_up(f"http://127.0.0.1:{port}/api/health")
+        # Warm-up pass fills per-worker caches and pools
+        asyncio.run(_drive(url, 2.0, args.connections))
+
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=load_process, args=(url, args.duration, args.connections, queue))
+                 for _ in range(args.load_processes)]
+        for p in procs:
+            p.start()
+        total = sum(queue.get() for _ in procs)
+        for p in procs:
+            p.join()
+        return total / args.duration
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/categories")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent connections per load process")
+    parser.add_argument("--load-processes", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for workers in args.workers:
+        rps = measure(workers, args)
+        baseline = baseline or rps / workers
+        speedup = rps / baseline
+        print(f"{workers:>8} {rps:>10.0f} {speedup:>8.2f} {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Request body size limits
+
+``BodySizeLimitMiddleware`` rejects oversized request bodies with 413 before
+a handler parses them: a Content-Length over the route's limit is refused
+without reading anything, and chunked bodies are counted as they stream in
+and cut off as soon as they pass it. JSON endpoints get MAX_JSON_BODY_BYTES;
+upload and import routes carry their own limits below.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Pattern
+
+from fastapi import HTTPException
+
+from metrics import metrics
+from uploads import UPLOAD_MAX_DOCUMENT_BYTES, UPLOAD_MAX_IMAGE_BYTES
+
+MAX_JSON_BODY_BYTES = int(os.environ.get("MAX_JSON_BODY_BYTES", str(1024 * 1024)))
+# Product and vendor profile JSON still accepts inline base64 images from older clients
+MAX_INLINE_MEDIA_BODY_BYTES = int(os.environ.get("MAX_INLINE_MEDIA_BODY_BYTES", str(8 * 1024 * 1024)))
+BULK_IMPORT_MAX_BYTES = int(os.environ.get("BULK_IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def _encoded(limit: int) -> int:
+    """Room for a base64 or multipart encoded file of `limit` bytes"""
+    return limit * 4 // 3 + 64 * 1024
+
+
+@dataclass(frozen=True)
+class BodyLimit:
+    method: str
+    pattern: Pattern
+    max_bytes: int
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method == "*" or method == self.method) and self.pattern.match(path) is not None
+
+
+def _limit(method: str, path_regex: str, max_bytes: int) -> BodyLimit:
+    return BodyLimit(method, re.compile(path_regex), max_bytes)
+
+
+# First matching rule wins; everything else gets MAX_JSON_BODY_BYTES
+BODY_LIMITS: List[BodyLimit] = [
+    _limit("POST", r"^/api/vendor/panel/products/bulk$", BULK_IMPORT_MAX_BYTES),
+    _limit("PUT", r"^/api/vendor/panel/products/[^/]+/image$", _encoded(UPLOAD_MAX_IMAGE_BYTES)),
+    _limit("POST", r"^/api/vendor/products/[^/]+/images$", _encoded(UPLOAD_MAX_IMAGE_BYTES)),
+    _limit("PUT", r"^/api/vendors/profile/(store-image|tax-document)$", _encoded(UPLOAD_MAX_DOCUMENT_BYTES)),
+    _limit("*", r"^/api/vendor(/panel)?/products(/[^/]+)?$", MAX_INLINE_MEDIA_BODY_BYTES),
+    _limit("POST", r"^/api/vendors/profile$", MAX_INLINE_MEDIA_BODY_BYTES),
+]
+
+
+def body_limit(method: str, path: str) -> int:
+    rule = next((r for r in BODY_LIMITS if r.matches(method, path)), None)
+    return rule.max_bytes if rule else MAX_JSON_BODY_BYTES
+
+
+class BodyTooLarge(HTTPException):
+    """Raised from receive(); an HTTPException so handlers and FastAPI's body parsing pass it through as 413"""
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body is larger than {limit} bytes")
+
+
+async def _reject(send, limit: int):
+    body = json.dumps({"detail": f"Request body is larger than {limit} bytes"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = body_limit(scope["method"], scope["path"])
+        content_length: Optional[int] = None
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    content_length = None
+                break
+        if content_length is not None and content_length > limit:
+            metrics.inc("request_body_rejected", reason="content_length")
+            await _reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.inc("request_body_rejected", reason="streamed")
+                    raise BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            # Only reached when nothing on the way up turned it into a response
+            if not response_started:
+                await _reject(send, limit)
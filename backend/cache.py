@@ -0,0 +1,172 @@
+"""
+Response cache shared by all handlers of a process
+
+The default backend is an in-process TTL/LRU dict. With several workers set
+CACHE_URL=redis://host:6379/0 so every worker reads and invalidates the same
+entries (requires the ``redis`` package).
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.environ.get("CACHE_DEFAULT_TTL", "60"))
+
+
+def _json_default(value):
+    # Tagged so _json_object_hook gives back the same types the memory backend keeps
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return str(value)
+
+
+def _json_object_hook(value: dict):
+    if len(value) == 1:
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default)
+
+
+def _loads(raw) -> Any:
+    return None if raw is None else json.loads(raw, object_hook=_json_object_hook)
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, values: Dict[str, Any], ttl: int):
+        for key, value in values.items():
+            await self.set(key, value, ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def close(self):
+        self._entries.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, url: str, prefix: str = "manavim:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return _loads(await self._redis.get(self.prefix + key))
+
+    async def set(self, key: str, value: Any, ttl: int):
+        await self._redis.set(self.prefix + key, _dumps(value), ex=ttl)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        raws = await self._redis.mget([self.prefix + key for key in keys])
+        return [_loads(raw) for raw in raws]
+
+    async def set_many(self, values: Dict[str, Any], ttl: int):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(self.prefix + key, _dumps(value), ex=ttl)
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class Cache:
+    """Facade over the configured backend; failures degrade to cache misses"""
+
+    def __init__(self):
+        self.backend = MemoryCacheBackend()
+
+    async def open(self, url: Optional[str] = None):
+        url = url if url is not None else os.environ.get("CACHE_URL", "")
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            self.backend = RedisCacheBackend(url)
+            logger.info("Using shared Redis cache backend")
+        else:
+            self.backend = MemoryCacheBackend(int(os.environ.get("CACHE_MAX_ENTRIES", "10000")))
+
+    async def close(self):
+        await self.backend.close()
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {str(e)}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: int = DEFAULT_TTL):
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {str(e)}")
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """One round trip for many keys; missing or failed entries are None"""
+        try:
+            return await self.backend.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {len(keys)} keys: {str(e)}")
+            return [None] * len(keys)
+
+    async def set_many(self, values: Dict[str, Any], ttl: int = DEFAULT_TTL):
+        if not values:
+            return
+        try:
+            await self.backend.set_many(values, ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {len(values)} keys: {str(e)}")
+
+    async def delete(self, *keys: str):
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache delete failed for {keys}: {str(e)}")
+
+
+cache = Cache()
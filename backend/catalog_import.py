@@ -0,0 +1,213 @@
+"""
+Bulk product import for vendors (CSV or NDJSON)
+
+The upload is parsed as it streams in. Rows are validated and applied in
+chunks of IMPORT_CHUNK_SIZE: one ownership query and one unordered
+``bulk_write`` per chunk instead of a find/update/find per product.
+
+A row with an ``id`` (or ``_id``/``product_id``) column updates that product
+with the non-empty fields it carries; a row without one creates a product and
+needs every VendorProductCreate field.
+"""
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import cache
+from database import db
+from events import PRODUCTS_CHANGED, bus
+from metrics import metrics
+from models import VendorProductCreate, VendorProductUpdate
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ROWS = int(os.environ.get("IMPORT_MAX_ROWS", "20000"))
+ID_FIELDS = ("id", "_id", "product_id")
+PRODUCT_FIELDS = set(VendorProductCreate.model_fields)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without holding the whole upload"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+    header: Optional[List[str]] = None
+    record = ""
+    async for line in lines:
+        # A quoted field may contain newlines; keep reading until the quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            continue
+        yield dict(zip(header, values))
+    if record:
+        raise ImportFormatError("Unterminated quoted field at end of CSV")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = {"__error__": f"Invalid JSON: {e.msg}"}
+        if not isinstance(row, dict):
+            row = {"__error__": "Each line must be a JSON object"}
+        yield row
+
+
+def _clean(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty CSV cells and unknown columns"""
+    return {
+        k: v.strip() if isinstance(v, str) else v
+        for k, v in row.items()
+        if k in PRODUCT_FIELDS and v is not None and not (isinstance(v, str) and not v.strip())
+    }
+
+
+def _row_id(row: Dict[str, Any]) -> Optional[str]:
+    for field in ID_FIELDS:
+        value = row.get(field)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _error_text(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+class ImportReport:
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self.counts = {"created": 0, "updated": 0, "unchanged": 0, "error": 0}
+        self.truncated = False
+
+    def add(self, row_number: int, status: str, product_id: Optional[str] = None, error: Optional[str] = None):
+        result = {"row": row_number, "status": status}
+        if product_id:
+            result["product_id"] = product_id
+        if error:
+            result["error"] = error
+        self.results.append(result)
+        self.counts[status] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        self.results.sort(key=lambda r: r["row"])
+        return {"total": len(self.results), **self.counts, "truncated": self.truncated, "results": self.results}
+
+
+async def apply_chunk(vendor_id: str, chunk: List[tuple], report: ImportReport, dry_run: bool):
+    """Validate and write one chunk of (row_number, row) pairs"""
+    now = datetime.utcnow()
+    ops, op_rows = [], []
+
+    wanted = [ObjectId(pid) for _, row in chunk if (pid := _row_id(row)) and ObjectId.is_valid(pid)]
+    owned = set()
+    if wanted:
+        async for product in db.products.find({"_id": {"$in": wanted}, "vendor_id": vendor_id}, {"_id": 1}):
+            owned.add(str(product["_id"]))
+
+    for row_number, row in chunk:
+        if "__error__" in row:
+            report.add(row_number, "error", error=row["__error__"])
+            continue
+        product_id = _row_id(row)
+        fields = _clean(row)
+        try:
+            if product_id:
+                if product_id not in owned:
+                    report.add(row_number, "error", product_id, "Product not found")
+                    continue
+                update = VendorProductUpdate.model_validate(fields).model_dump(exclude_none=True)
+                if not update:
+                    report.add(row_number, "unchanged", product_id)
+                    continue
+                update["updated_at"] = now
+                ops.append(UpdateOne({"_id": ObjectId(product_id), "vendor_id": vendor_id}, {"$set": update}))
+                op_rows.append((row_number, "updated", product_id))
+            else:
+                product = VendorProductCreate.model_validate(fields).model_dump()
+                product_oid = ObjectId()
+                product.update({"_id": product_oid, "vendor_id": vendor_id, "created_at": now, "updated_at": now})
+                ops.append(InsertOne(product))
+                op_rows.append((row_number, "created", str(product_oid)))
+        except ValidationError as e:
+            report.add(row_number, "error", product_id, _error_text(e))
+
+    failed = {}
+    if ops and not dry_run:
+        try:
+            await db.products.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+    for index, (row_number, status, product_id) in enumerate(op_rows):
+        if index in failed:
+            report.add(row_number, "error", product_id, failed[index])
+        else:
+            report.add(row_number, status, product_id)
+
+    updated = [f"product:{pid}" for i, (_, status, pid) in enumerate(op_rows) if status == "updated" and i not in failed]
+    if updated and not dry_run:
+        await cache.delete(*updated)
+    written = [pid for i, (_, _, pid) in enumerate(op_rows) if i not in failed]
+    if written and not dry_run:
+        await bus.publish(PRODUCTS_CHANGED, {"product_ids": written})
+
+
+async def import_products(vendor_id: str, chunks: AsyncIterator[bytes], fmt: str, dry_run: bool = False) -> Dict[str, Any]:
+    if fmt == "csv":
+        rows = iter_csv_rows(iter_lines(chunks))
+    elif fmt == "ndjson":
+        rows = iter_ndjson_rows(iter_lines(chunks))
+    else:
+        raise ImportFormatError(f"Unsupported format {fmt!r}; use csv or ndjson")
+
+    report = ImportReport()
+    chunk: List[tuple] = []
+    row_number = 0
+    async for row in rows:
+        if row_number >= IMPORT_MAX_ROWS:
+            # Rows already applied stay applied; the report says where it stopped
+            report.truncated = True
+            break
+        row_number += 1
+        chunk.append((row_number, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await apply_chunk(vendor_id, chunk, report, dry_run)
+            chunk = []
+    if chunk:
+        await apply_chunk(vendor_id, chunk, report, dry_run)
+
+    metrics.inc("products_imported", report.counts["created"] + report.counts["updated"])
+    result = report.as_dict()
+    result["dry_run"] = dry_run
+    return result
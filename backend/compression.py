@@ -0,0 +1,265 @@
+"""
+Response compression
+
+``CompressionMiddleware`` negotiates zstd, brotli or gzip from Accept-Encoding
+(q-values first, then COMPRESSION_ENCODINGS order) for JSON and text bodies of
+at least COMPRESSION_MIN_SIZE bytes. Complete bodies are compressed in one go,
+in a worker thread once they reach COMPRESSION_OFFLOAD_BYTES so a multi-megabyte
+product listing does not stall the event loop. Streaming responses are
+compressed chunk by chunk and flushed after each chunk, so clients still see
+data as it is produced.
+
+brotli and zstd need the ``Brotli`` and ``zstandard`` packages; without them
+only gzip is offered. Bytes in/out/saved are counted per route and encoding.
+"""
+import asyncio
+import os
+import zlib
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_OFFLOAD_BYTES = int(os.environ.get("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+COMPRESSION_ENCODINGS = [e.strip() for e in os.environ.get("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+COMPRESSION_LEVELS = {
+    "gzip": int(os.environ.get("COMPRESSION_LEVEL_GZIP", "6")),
+    "br": int(os.environ.get("COMPRESSION_LEVEL_BR", "4")),
+    "zstd": int(os.environ.get("COMPRESSION_LEVEL_ZSTD", "3")),
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+# ============== CODECS ==============
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        import brotli
+
+        self._c = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        import zstandard
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+def _available_codecs() -> Dict[str, type]:
+    codecs = {"gzip": _Gzip}
+    try:
+        import brotli  # noqa: F401
+        codecs["br"] = _Brotli
+    except ImportError:
+        pass
+    try:
+        import zstandard  # noqa: F401
+        codecs["zstd"] = _Zstd
+    except ImportError:
+        pass
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    codec = CODECS[encoding](COMPRESSION_LEVELS[encoding])
+    return codec.compress(body) + codec.finish()
+
+
+def negotiate(accept_encoding: str, offered: Optional[List[str]] = None) -> Optional[str]:
+    """Best encoding for an Accept-Encoding header, or None for identity"""
+    offered = [e for e in (offered or COMPRESSION_ENCODINGS) if e in CODECS]
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        # Ties go to the earlier (preferred) encoding
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+# ============== MIDDLEWARE ==============
+
+
+def _route_label(scope) -> str:
+    """Path template of the matched route, so per-route metrics do not explode on IDs"""
+    app, endpoint = scope.get("app"), scope.get("endpoint")
+    if app is None or endpoint is None:
+        return "other"
+    routes = getattr(app.state, "compression_route_labels", None)
+    if routes is None:
+        routes = {getattr(r, "endpoint", None): getattr(r, "path", "other") for r in app.router.routes}
+        app.state.compression_route_labels = routes
+    return routes.get(endpoint, "other")
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size: Optional[int] = None, offload_bytes: Optional[int] = None):
+        self.app = app
+        self.enabled = COMPRESSION_ENABLED
+        self.min_size = min_size if min_size is not None else COMPRESSION_MIN_SIZE
+        self.offload_bytes = offload_bytes if offload_bytes is not None else COMPRESSION_OFFLOAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate((_header(scope["headers"], b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, scope, encoding, send).run(receive)
+
+
+class _CompressedResponse:
+    """Per-request state: the held back response start and the streaming compressor"""
+
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.passthrough = False
+        self.codec = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def run(self, receive):
+        await self.middleware.app(self.scope, receive, self.on_send)
+
+    def _compressible(self, message) -> bool:
+        headers = message.get("headers", [])
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        if _header(headers, b"content-encoding") is not None:
+            return False
+        content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _start_headers(self, content_length: Optional[int]):
+        headers = [(k, v) for k, v in self.start.get("headers", []) if k.lower() not in (b"content-length", b"vary")]
+        vary = _header(self.start.get("headers", []), b"vary")
+        vary_values = {v.strip().lower() for v in vary.split(b",")} if vary else set()
+        if b"accept-encoding" not in vary_values:
+            vary = vary + b", Accept-Encoding" if vary else b"Accept-Encoding"
+        headers.append((b"vary", vary))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return {**self.start, "headers": headers}
+
+    async def _run_codec(self, fn, data: bytes) -> bytes:
+        if len(data) >= self.middleware.offload_bytes:
+            return await asyncio.to_thread(fn, data)
+        return fn(data)
+
+    def _record(self):
+        route = _route_label(self.scope)
+        metrics.inc("compression_responses", route=route, encoding=self.encoding)
+        metrics.inc("compression_bytes_in", self.bytes_in, route=route, encoding=self.encoding)
+        metrics.inc("compression_bytes_out", self.bytes_out, route=route, encoding=self.encoding)
+        metrics.inc("compression_bytes_saved", self.bytes_in - self.bytes_out, route=route, encoding=self.encoding)
+
+    async def on_send(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not self._compressible(message):
+                self.passthrough = True
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.codec is None and not more_body:
+            # Complete body in one message
+            if len(body) < self.middleware.min_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            compressed = await self._run_codec(lambda data: compress_body(self.encoding, data), body)
+            self.bytes_in, self.bytes_out = len(body), len(compressed)
+            await self.send(self._start_headers(len(compressed)))
+            await self.send({"type": "http.response.body", "body": compressed})
+            self._record()
+            return
+
+        if self.codec is None:
+            # Streaming response: length is unknown, compress incrementally
+            self.codec = CODECS[self.encoding](COMPRESSION_LEVELS[self.encoding])
+            await self.send(self._start_headers(None))
+
+        def step(data: bytes) -> bytes:
+            out = self.codec.compress(data)
+            return out + (self.codec.flush() if more_body else self.codec.finish())
+
+        chunk = await self._run_codec(step, body)
+        self.bytes_in += len(body)
+        self.bytes_out += len(chunk)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        if not more_body:
+            self._record()
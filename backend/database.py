@@ -0,0 +1,235 @@
+"""
+MongoDB connection management
+
+The Motor client is created in the application lifespan (``connect()``), not at
+import time. Handlers use the module level database handles below; each one
+resolves to the live client on attribute access and carries its own read
+preference:
+
+- ``db``            primary reads/writes (carts, orders, auth, anything read back after a write)
+- ``catalog_db``    product and vendor catalog reads
+- ``reporting_db``  dashboards, statistics and exports
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def client_options() -> Dict[str, Any]:
+    """Pool, timeout and compression settings for AsyncIOMotorClient, from the environment"""
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 60_000),
+        "maxConnecting": _env_int("MONGO_MAX_CONNECTING", 2),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5_000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5_000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 30_000),
+        "retryWrites": True,
+        "retryReads": True,
+    }
+    # Unavailable compressors (python-zstandard / python-snappy not installed) are
+    # dropped by the driver with a warning, so listing all of them is safe
+    compressors = os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    if compressors:
+        options["compressors"] = compressors
+        options["zlibCompressionLevel"] = _env_int("MONGO_ZLIB_LEVEL", 6)
+    return options
+
+
+def read_preference(setting: str, default: str):
+    """Build a read preference from an env var such as 'secondaryPreferred'"""
+    mode = os.environ.get(setting, default)
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"{setting} must be one of: {', '.join(READ_PREFERENCES)}")
+    if mode == "primary":
+        return Primary()
+    max_staleness = _env_int("MONGO_MAX_STALENESS_SECONDS", -1)
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+# ============== POOL STATISTICS ==============
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps per-server connection pool counters for the metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _bump(self, address, field: str, delta: int = 1):
+        with self._lock:
+            self._servers[f"{address[0]}:{address[1]}"][field] += delta
+
+    def pool_created(self, event):
+        self._bump(event.address, "pools_created")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump(event.address, "pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(event.address, "open")
+        self._bump(event.address, "created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(event.address, "open", -1)
+        self._bump(event.address, "closed")
+
+    def connection_check_out_started(self, event):
+        self._bump(event.address, "waiting")
+
+    def connection_check_out_failed(self, event):
+        self._bump(event.address, "waiting", -1)
+        self._bump(event.address, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._bump(event.address, "waiting", -1)
+        self._bump(event.address, "in_use")
+        self._bump(event.address, "checkouts")
+
+    def connection_checked_in(self, event):
+        self._bump(event.address, "in_use", -1)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(stats) for address, stats in self._servers.items()}
+
+
+pool_stats = PoolStatsListener()
+metrics.register_collector("mongo_pool", pool_stats.snapshot)
+
+# ============== CLIENT LIFECYCLE ==============
+
+_client: Optional[AsyncIOMotorClient] = None
+# Whether the deployment runs multi-document transactions, learnt on first use
+_transactions: Optional[bool] = None
+
+
+def connect() -> AsyncIOMotorClient:
+    """Create the shared client; call once per process from the lifespan hook"""
+    global _client
+    if _client is None:
+        options = client_options()
+        _client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[pool_stats], **options)
+        logger.info(
+            "MongoDB pool configured (maxPoolSize=%s, minPoolSize=%s, compressors=%s)",
+            options["maxPoolSize"], options["minPoolSize"], options.get("compressors"),
+        )
+    return _client
+
+
+def close():
+    global _client, _transactions
+    if _client is not None:
+        _client.close()
+        _client = None
+        _transactions = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    if _client is None:
+        raise RuntimeError("MongoDB client is not connected; database.connect() runs in the app lifespan")
+    return _client
+
+
+async def supports_transactions() -> bool:
+    """Replica sets and sharded clusters do; MONGO_TRANSACTIONS=on/off overrides the check"""
+    global _transactions
+    if _transactions is None:
+        setting = os.environ.get("MONGO_TRANSACTIONS", "auto")
+        if setting in ("on", "off"):
+            _transactions = setting == "on"
+        else:
+            hello = await get_client().admin.command("hello")
+            _transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    return _transactions
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[Optional[Any]]:
+    """
+    A session with a running transaction, committed when the block exits and
+    aborted if it raises; None on a standalone server, where callers undo
+    their own writes
+    """
+    if not await supports_transactions():
+        yield None
+        return
+    async with await get_client().start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+
+class DatabaseHandle:
+    """Attribute access proxy to the configured database with a fixed read preference"""
+
+    def __init__(self, read_preference_setting: Optional[str] = None, default_mode: str = "primary"):
+        self._setting = read_preference_setting
+        self._default_mode = default_mode
+        self._database: Optional[AsyncIOMotorDatabase] = None
+        self._client: Optional[AsyncIOMotorClient] = None
+
+    def _resolve(self) -> AsyncIOMotorDatabase:
+        client = get_client()
+        if self._database is None or self._client is not client:
+            kwargs = {}
+            if self._setting:
+                kwargs["read_preference"] = read_preference(self._setting, self._default_mode)
+            self._database = client.get_database(os.environ['DB_NAME'], **kwargs)
+            self._client = client
+        return self._database
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self._resolve()[name]
+
+
+db = DatabaseHandle()
+catalog_db = DatabaseHandle("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+reporting_db = DatabaseHandle("MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred")
@@ -0,0 +1,168 @@
+"""
+Distance-based delivery fees
+
+A vendor's fee depends on the distance band of the address (the
+DISTANCE_BANDS_KM edges from delivery_zones.py): ``delivery_fee_table`` on
+the profile gives one fee per band, the last entry covering any further bands,
+and DELIVERY_FEE_TABLE is used when a vendor has none. Orders over
+``free_delivery_over`` deliver for free. A surge multiplier set by admins for an
+area (geohash cells of SURGE_CELL_PRECISION, about 5 x 5 km) scales every fee in
+it until it expires.
+
+``quote_delivery`` prices one address against many vendors in a single numpy
+pass. Quotes are computed for the center of the address's grid cell, so every
+address in a cell gets the same fee, and are cached per (cell, vendor) for
+QUOTE_CACHE_TTL seconds; fee table and surge changes apply once that runs out.
+The server charges the quoted fee at checkout, whatever the client sent.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from cache import cache
+from database import catalog_db, db
+from delivery_zones import DEFAULT_DELIVERY_RADIUS_KM, DISTANCE_BANDS_KM, MAX_DELIVERY_RADIUS_KM
+from geo import center, cells_within, encode, haversine_matrix, point_in_polygon
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE_TABLE = [float(f) for f in os.environ.get("DELIVERY_FEE_TABLE", "9.9,14.9,19.9,29.9,49.9").split(",")]
+QUOTE_CACHE_TTL = int(os.environ.get("DELIVERY_QUOTE_CACHE_TTL", "30"))
+SURGE_CELL_PRECISION = 5
+MAX_SURGE_MULTIPLIER = 3.0
+MAX_FEE = 1000.0
+MAX_QUOTE_VENDORS = 100
+
+QUOTE_PROJECTION = {
+    "latitude": 1, "longitude": 1, "delivery_radius_km": 1, "delivery_polygon": 1,
+    "delivery_fee_table": 1, "free_delivery_over": 1, "delivery_options": 1,
+}
+
+
+def parse_fee_table(value: Optional[Sequence[float]]) -> Optional[List[float]]:
+    """Validate a per-band fee table; raises ValueError"""
+    if value is None:
+        return None
+    if not 1 <= len(value) <= len(DISTANCE_BANDS_KM):
+        raise ValueError(f"A fee table needs between 1 and {len(DISTANCE_BANDS_KM)} fees (bands: {DISTANCE_BANDS_KM} km)")
+    fees = [round(float(f), 2) for f in value]
+    if any(f < 0 or f > MAX_FEE for f in fees):
+        raise ValueError(f"Fees must be between 0 and {MAX_FEE}")
+    return fees
+
+# ============== PRICING ==============
+
+
+def compute_quotes(lat: float, lon: float, vendors: List[Dict[str, Any]], surge: float = 1.0) -> List[Dict[str, Any]]:
+    """Quotes for one point against many vendor profiles, in one vectorised pass"""
+    import numpy as np
+
+    if not vendors:
+        return []
+    count = len(vendors)
+    distance = haversine_matrix([lat], [lon], [v["latitude"] for v in vendors], [v["longitude"] for v in vendors])[0]
+    # Same band as delivery_zones.distance_band: the first edge the distance is within
+    band = np.searchsorted(np.asarray(DISTANCE_BANDS_KM), distance, side="left")
+
+    # One row per vendor, padded with its last fee
+    tables = np.empty((count, len(DISTANCE_BANDS_KM)))
+    radius = np.empty(count)
+    for row, vendor in enumerate(vendors):
+        table = vendor.get("delivery_fee_table") or DEFAULT_FEE_TABLE
+        tables[row, :len(table)] = table[:len(DISTANCE_BANDS_KM)]
+        tables[row, len(table):] = table[-1]
+        radius[row] = min(vendor.get("delivery_radius_km") or DEFAULT_DELIVERY_RADIUS_KM, MAX_DELIVERY_RADIUS_KM)
+    base_fee = tables[np.arange(count), np.minimum(band, len(DISTANCE_BANDS_KM) - 1)]
+    fee = np.round(base_fee * surge, 2)
+    deliverable = (band < len(DISTANCE_BANDS_KM)) & (distance <= radius)
+
+    quotes = []
+    for row, vendor in enumerate(vendors):
+        polygon = vendor.get("delivery_polygon")
+        in_zone = point_in_polygon(lat, lon, polygon) if polygon else bool(deliverable[row])
+        quotes.append({
+            "vendor_id": str(vendor["_id"]),
+            "deliverable": in_zone and bool(band[row] < len(DISTANCE_BANDS_KM)),
+            "distance_km": round(float(distance[row]), 3),
+            "band": int(band[row]),
+            "base_fee": round(float(base_fee[row]), 2),
+            "surge_multiplier": surge,
+            "fee": float(fee[row]),
+            "free_delivery_over": vendor.get("free_delivery_over"),
+            "delivery_options": vendor.get("delivery_options") or ["self", "platform"],
+        })
+    return quotes
+
+
+def order_delivery_fee(quote: Dict[str, Any], subtotal: float) -> float:
+    """Fee to charge for an order of `subtotal` under `quote`"""
+    threshold = quote.get("free_delivery_over")
+    if threshold is not None and subtotal >= threshold:
+        return 0.0
+    return quote["fee"]
+
+# ============== SURGE ==============
+
+
+async def surge_multiplier(lat: float, lon: float) -> float:
+    surge = await catalog_db.delivery_surge.find_one(
+        {"_id": encode(lat, lon, SURGE_CELL_PRECISION), "expires_at": {"$gt": datetime.utcnow()}}, {"multiplier": 1}
+    )
+    return surge["multiplier"] if surge else 1.0
+
+
+async def set_surge(lat: float, lon: float, radius_km: float, multiplier: float, minutes: int) -> int:
+    """Apply `multiplier` to the area around a point for `minutes`; 1.0 clears it. Returns the cells touched."""
+    if not 1.0 <= multiplier <= MAX_SURGE_MULTIPLIER:
+        raise ValueError(f"Surge multiplier must be between 1.0 and {MAX_SURGE_MULTIPLIER}")
+    cells = list(cells_within(lat, lon, radius_km, SURGE_CELL_PRECISION)) or [encode(lat, lon, SURGE_CELL_PRECISION)]
+    if multiplier == 1.0:
+        await db.delivery_surge.delete_many({"_id": {"$in": cells}})
+        return len(cells)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=minutes)
+    await db.delivery_surge.bulk_write([
+        UpdateOne(
+            {"_id": cell},
+            {"$set": {"multiplier": multiplier, "expires_at": expires_at, "updated_at": now}},
+            upsert=True,
+        )
+        for cell in cells
+    ], ordered=False)
+    return len(cells)
+
+# ============== QUOTES ==============
+
+
+async def quote_delivery(lat: float, lon: float, vendor_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """vendor_id -> quote for an address; unknown vendors are left out"""
+    cell = encode(lat, lon)
+    vendor_ids = list(dict.fromkeys(v for v in vendor_ids if ObjectId.is_valid(v)))
+    keys = [f"fee:{cell}:{vendor_id}" for vendor_id in vendor_ids]
+    quotes = {}
+    missing = []
+    for vendor_id, cached in zip(vendor_ids, await cache.get_many(keys)):
+        if cached is None:
+            missing.append(vendor_id)
+        else:
+            quotes[vendor_id] = cached
+    metrics.inc("delivery_quotes", len(vendor_ids) - len(missing), outcome="cached")
+    if not missing:
+        return quotes
+
+    metrics.inc("delivery_quotes", len(missing), outcome="computed")
+    vendors = await catalog_db.vendor_profiles.find(
+        {"_id": {"$in": [ObjectId(v) for v in missing]}}, QUOTE_PROJECTION
+    ).to_list(len(missing))
+    vendors = [v for v in vendors if v.get("latitude") is not None and v.get("longitude") is not None]
+    cell_lat, cell_lon = center(cell)
+    computed = compute_quotes(cell_lat, cell_lon, vendors, await surge_multiplier(lat, lon))
+    fresh = {q["vendor_id"]: q for q in computed}
+    await cache.set_many({f"fee:{cell}:{vendor_id}": q for vendor_id, q in fresh.items()}, QUOTE_CACHE_TTL)
+    quotes.update(fresh)
+    return quotes
@@ -0,0 +1,201 @@
+"""
+Delivery zone grid index
+
+Each vendor profile delivers within ``delivery_radius_km`` of its location
+or, when set, inside ``delivery_polygon`` (a list of [lat, lon] vertices).
+Zones are expanded once into geohash cells (see geo.py) and stored per cell
+in ``delivery_cells`` ({_id: cell, vendors: [{vendor_id, band, distance_km}]}),
+so "who delivers to this address" is a single _id lookup. The band is the
+index of the first DISTANCE_BANDS_KM edge the distance falls within and is
+what delivery pricing works from.
+
+``delivery_zones`` keeps each vendor's current cell list, so moving a vendor
+or changing its radius only touches the cells that entered or left its zone.
+Profiles are marked ``zone_dirty`` when their zone changes and a periodic task
+picks up anything an endpoint could not index right away. A cell's entry for a
+vendor is replaced in one document update, so an endpoint and the periodic
+task indexing the same profile at once cannot list the vendor twice, and the
+flag is only cleared while the profile still has the zone that was indexed.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from database import catalog_db, db
+from geo import GEO_CELL_PRECISION, cells_in_polygon, cells_within, center, encode, haversine_km, valid_point
+from metrics import metrics
+from scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_RADIUS_KM = float(os.environ.get("DEFAULT_DELIVERY_RADIUS_KM", "10"))
+MAX_DELIVERY_RADIUS_KM = 50.0
+DISTANCE_BANDS_KM = [float(b) for b in os.environ.get("DELIVERY_DISTANCE_BANDS_KM", "2,5,10,20,50").split(",")]
+REINDEX_BATCH_SIZE = 100
+MAX_ZONE_CELLS = 20000
+# Profile fields that shape the zone
+ZONE_FIELDS = ("latitude", "longitude", "delivery_radius_km", "delivery_polygon")
+
+
+def distance_band(distance_km: float) -> int:
+    for band, edge in enumerate(DISTANCE_BANDS_KM):
+        if distance_km <= edge:
+            return band
+    return len(DISTANCE_BANDS_KM)
+
+
+def zone_signature(profile: Dict[str, Any]) -> str:
+    """Changes whenever anything that shapes the zone changes"""
+    shape = [*(profile.get(field) for field in ZONE_FIELDS), GEO_CELL_PRECISION, DISTANCE_BANDS_KM]
+    return hashlib.sha1(json.dumps(shape, default=str).encode()).hexdigest()
+
+
+def zone_cells(profile: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """cell -> entry for every cell the vendor delivers to"""
+    lat, lon = profile.get("latitude"), profile.get("longitude")
+    if not valid_point(lat, lon):
+        return {}
+    polygon = profile.get("delivery_polygon")
+    if polygon:
+        cells = cells_in_polygon(polygon)
+    else:
+        radius = min(profile.get("delivery_radius_km") or DEFAULT_DELIVERY_RADIUS_KM, MAX_DELIVERY_RADIUS_KM)
+        cells = list(cells_within(lat, lon, radius))
+    if len(cells) > MAX_ZONE_CELLS:
+        raise ValueError(f"Delivery zone is too large ({len(cells)} cells, at most {MAX_ZONE_CELLS})")
+    vendor_id = str(profile["_id"])
+    entries = {}
+    for cell in cells:
+        clat, clon = center(cell)
+        distance = haversine_km(lat, lon, clat, clon)
+        entries[cell] = {
+            "vendor_id": vendor_id, "band": distance_band(distance), "distance_km": round(distance, 3),
+            # The vendor's location, so lookups can give the exact distance to an address
+            "lat": lat, "lon": lon,
+        }
+    return entries
+
+# ============== INDEXING ==============
+
+
+def _zone_shape(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Filter matching the profile only while its zone fields are still the ones in `profile`"""
+    return {field: profile.get(field) for field in ZONE_FIELDS}
+
+
+def _replace_entry(cell: str, vendor_id: str, entry: Dict[str, Any]) -> UpdateOne:
+    """Swap the vendor's entry in one cell in a single document update, so concurrent indexing never duplicates it"""
+    others = {"$filter": {
+        "input": {"$ifNull": ["$vendors", []]},
+        "cond": {"$ne": ["$$this.vendor_id", vendor_id]},
+    }}
+    return UpdateOne(
+        {"_id": cell},
+        [{"$set": {"vendors": {"$concatArrays": [others, [{"$literal": entry}]]}}}],
+        upsert=True,
+    )
+
+
+async def _clear_dirty(profile: Dict[str, Any]):
+    # Left set when the zone changed again meanwhile; that newer zone still needs indexing
+    await db.vendor_profiles.update_one(
+        {"_id": profile["_id"], "zone_dirty": True, **_zone_shape(profile)}, {"$unset": {"zone_dirty": ""}}
+    )
+
+
+async def index_vendor(profile: Dict[str, Any], entries: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Bring the grid in line with `profile`'s zone, touching only cells that changed
+    (`entries` is zone_cells(profile) when the caller already computed it)
+    """
+    vendor_id = str(profile["_id"])
+    signature = zone_signature(profile)
+    current = await db.delivery_zones.find_one({"_id": vendor_id})
+    if current and current.get("signature") == signature:
+        await _clear_dirty(profile)
+        return {"added": 0, "removed": 0, "updated": 0}
+
+    if entries is None:
+        entries = zone_cells(profile)
+    old_cells = set(current.get("cells", [])) if current else set()
+    new_cells = set(entries)
+    removed = old_cells - new_cells
+    # Kept cells are rewritten too: the vendor may have moved within them (distance and band change)
+    ops = [UpdateOne({"_id": cell}, {"$pull": {"vendors": {"vendor_id": vendor_id}}}) for cell in removed]
+    ops += [_replace_entry(cell, vendor_id, entry) for cell, entry in entries.items()]
+    if ops:
+        await db.delivery_cells.bulk_write(ops, ordered=False)
+    if removed:
+        await db.delivery_cells.delete_many({"_id": {"$in": list(removed)}, "vendors": {"$size": 0}})
+
+    await db.delivery_zones.update_one(
+        {"_id": vendor_id},
+        {"$set": {"cells": sorted(new_cells), "signature": signature, "indexed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    await _clear_dirty(profile)
+    metrics.inc("delivery_zone_reindexed")
+    return {"added": len(new_cells - old_cells), "removed": len(removed), "updated": len(new_cells & old_cells)}
+
+
+async def remove_vendor(vendor_id: str):
+    current = await db.delivery_zones.find_one({"_id": vendor_id})
+    if not current:
+        return
+    cells = current.get("cells", [])
+    if cells:
+        await db.delivery_cells.update_many({"_id": {"$in": cells}}, {"$pull": {"vendors": {"vendor_id": vendor_id}}})
+        await db.delivery_cells.delete_many({"_id": {"$in": cells}, "vendors": {"$size": 0}})
+    await db.delivery_zones.delete_one({"_id": vendor_id})
+
+
+@periodic("reindex_delivery_zones", interval=60)
+async def reindex_delivery_zones() -> dict:
+    """Index profiles whose zone changed (zone_dirty) or that were never indexed"""
+    indexed = 0
+    projection = {"latitude": 1, "longitude": 1, "delivery_radius_km": 1, "delivery_polygon": 1, "zone_dirty": 1}
+    indexed_ids = {z["_id"] async for z in db.delivery_zones.find({}, {"_id": 1})}
+    async for profile in db.vendor_profiles.find({}, projection):
+        if not profile.get("zone_dirty") and str(profile["_id"]) in indexed_ids:
+            continue
+        try:
+            await index_vendor(profile)
+            indexed += 1
+        except Exception as e:
+            logger.error(f"Could not index delivery zone of vendor {profile['_id']}: {str(e)}")
+        if indexed >= REINDEX_BATCH_SIZE:
+            break
+    return {"indexed": indexed}
+
+# ============== LOOKUP ==============
+
+
+async def vendors_delivering_to(lat: float, lon: float) -> List[Dict[str, Any]]:
+    """[{vendor_id, band, distance_km}] for vendors whose zone covers the point, nearest first"""
+    cell = await catalog_db.delivery_cells.find_one({"_id": encode(lat, lon)})
+    if not cell:
+        return []
+    vendors = []
+    for entry in cell.get("vendors", []):
+        distance = haversine_km(entry["lat"], entry["lon"], lat, lon)
+        vendors.append({"vendor_id": entry["vendor_id"], "band": distance_band(distance), "distance_km": round(distance, 3)})
+    return sorted(vendors, key=lambda v: v["distance_km"])
+
+
+def parse_polygon(value: Optional[List[List[float]]]) -> Optional[List[List[float]]]:
+    """Validate a delivery polygon; raises ValueError"""
+    if value is None:
+        return None
+    if len(value) < 3 or len(value) > 200:
+        raise ValueError("A delivery polygon needs between 3 and 200 points")
+    polygon = []
+    for point in value:
+        if len(point) != 2 or not valid_point(point[0], point[1]):
+            raise ValueError(f"Invalid polygon point {point!r}, expected [latitude, longitude]")
+        polygon.append([float(point[0]), float(point[1])])
+    return polygon
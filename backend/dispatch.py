@@ -0,0 +1,324 @@
+"""
+Courier dispatch for platform deliveries
+
+Every DISPATCH_INTERVAL_SECONDS the dispatcher (one process at a time, through
+the scheduler lease) takes the platform-delivery orders that are being
+prepared or are ready and have no courier, and:
+
+1. batches them per vendor: the oldest waiting order seeds a batch and picks up
+   the nearest other drop-offs within DISPATCH_BATCH_RADIUS_KM, up to
+   DISPATCH_BATCH_SIZE orders;
+2. assigns batches to idle couriers greedily by pickup distance (minus a bonus
+   for how long the batch has waited), skipping couriers further than
+   DISPATCH_MAX_PICKUP_KM;
+3. orders each courier's drop-offs with nearest neighbour followed by 2-opt.
+
+All distances come from one vectorised haversine matrix per step, and planning
+runs in a worker thread, so a tick with thousands of orders does not block the
+event loop. ``plan_dispatch`` is pure and is what benchmarks/bench_dispatch.py
+simulates.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import catalog_db, db
+from geo import haversine_matrix
+from metrics import metrics
+from scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_INTERVAL_SECONDS = float(os.environ.get("DISPATCH_INTERVAL_SECONDS", "20"))
+DISPATCH_STATUSES = [s.strip() for s in os.environ.get("DISPATCH_STATUSES", "preparing,ready").split(",") if s.strip()]
+DISPATCH_BATCH_SIZE = int(os.environ.get("DISPATCH_BATCH_SIZE", "3"))
+DISPATCH_BATCH_RADIUS_KM = float(os.environ.get("DISPATCH_BATCH_RADIUS_KM", "2"))
+DISPATCH_MAX_PICKUP_KM = float(os.environ.get("DISPATCH_MAX_PICKUP_KM", "8"))
+# Km of pickup distance one minute of waiting is worth, so old batches are not starved
+DISPATCH_AGE_WEIGHT_KM = float(os.environ.get("DISPATCH_AGE_WEIGHT_KM", "0.2"))
+DISPATCH_MAX_ORDERS = int(os.environ.get("DISPATCH_MAX_ORDERS", "5000"))
+COURIER_STALE_MINUTES = int(os.environ.get("COURIER_STALE_MINUTES", "5"))
+TERMINAL_STATUSES = ["completed", "cancelled"]
+
+
+@dataclass
+class Assignment:
+    courier_id: str
+    vendor_id: str
+    # Drop-off order, first stop first
+    order_ids: List[str]
+    stops: List[Tuple[float, float]]
+    pickup_km: float
+    route_km: float
+    batch_id: str = field(default_factory=lambda: str(ObjectId()))
+
+# ============== ROUTING ==============
+
+
+def nearest_neighbour(dist) -> List[int]:
+    """Open path over nodes of `dist` starting at node 0, always moving to the closest unvisited node"""
+    import numpy as np
+
+    count = dist.shape[0]
+    route = [0]
+    visited = np.zeros(count, dtype=bool)
+    visited[0] = True
+    for _ in range(count - 1):
+        row = np.where(visited, np.inf, dist[route[-1]])
+        nxt = int(np.argmin(row))
+        route.append(nxt)
+        visited[nxt] = True
+    return route
+
+
+def two_opt(route: List[int], dist, max_passes: int = 20) -> List[int]:
+    """Improve an open path with a fixed first node by reversing segments while that shortens it"""
+    import numpy as np
+
+    route = np.asarray(route)
+    count = len(route)
+    if count < 4:
+        return route.tolist()
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, count - 1):
+            # Reverse route[i..j] for every j > i at once
+            j = np.arange(i + 1, count)
+            a, b = route[i - 1], route[i]
+            c = route[j]
+            has_next = j + 1 < count
+            d = route[np.minimum(j + 1, count - 1)]
+            delta = dist[a, c] - dist[a, b]
+            delta = delta + np.where(has_next, dist[b, d] - dist[c, d], 0.0)
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                jj = j[best]
+                route[i:jj + 1] = route[i:jj + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def route_length(route: Sequence[int], dist) -> float:
+    return float(sum(dist[route[k], route[k + 1]] for k in range(len(route) - 1)))
+
+
+def plan_route(pickup: Tuple[float, float], drops: Sequence[Tuple[float, float]]) -> Tuple[List[int], float]:
+    """Drop-off order (indices into `drops`) and route length in km, starting at the pickup"""
+    lats = [pickup[0]] + [p[0] for p in drops]
+    lons = [pickup[1]] + [p[1] for p in drops]
+    dist = haversine_matrix(lats, lons, lats, lons)
+    route = two_opt(nearest_neighbour(dist), dist)
+    return [node - 1 for node in route[1:]], route_length(route, dist)
+
+# ============== PLANNING ==============
+
+
+def batch_orders(orders: List[Dict[str, Any]], batch_size: int = DISPATCH_BATCH_SIZE,
+                 radius_km: float = DISPATCH_BATCH_RADIUS_KM) -> List[List[int]]:
+    """Group one vendor's orders (oldest first) into batches of nearby drop-offs; returns index lists"""
+    import numpy as np
+
+    count = len(orders)
+    if count == 0:
+        return []
+    lats = [o["delivery_latitude"] for o in orders]
+    lons = [o["delivery_longitude"] for o in orders]
+    dist = haversine_matrix(lats, lons, lats, lons)
+    free = np.ones(count, dtype=bool)
+    batches = []
+    for seed in range(count):
+        if not free[seed]:
+            continue
+        free[seed] = False
+        candidates = np.flatnonzero(free & (dist[seed] <= radius_km))
+        chosen = candidates[np.argsort(dist[seed, candidates], kind="stable")][:batch_size - 1]
+        free[chosen] = False
+        batches.append([seed] + chosen.tolist())
+    return batches
+
+
+def plan_dispatch(
+    orders: List[Dict[str, Any]],
+    vendor_locations: Dict[str, Tuple[float, float]],
+    couriers: List[Dict[str, Any]],
+    now: Optional[datetime] = None,
+    batch_size: int = DISPATCH_BATCH_SIZE,
+    batch_radius_km: float = DISPATCH_BATCH_RADIUS_KM,
+    max_pickup_km: float = DISPATCH_MAX_PICKUP_KM,
+    age_weight_km: float = DISPATCH_AGE_WEIGHT_KM,
+) -> List[Assignment]:
+    """Batches, courier choice and routes for one tick; pure, so it can run in a thread or a simulation"""
+    import numpy as np
+
+    now = now or datetime.utcnow()
+    by_vendor: Dict[str, List[Dict[str, Any]]] = {}
+    for order in sorted(orders, key=lambda o: o["created_at"]):
+        if order.get("vendor_id") in vendor_locations:
+            by_vendor.setdefault(order["vendor_id"], []).append(order)
+
+    batches: List[Tuple[str, List[Dict[str, Any]]]] = []
+    for vendor_id, vendor_orders in by_vendor.items():
+        for indices in batch_orders(vendor_orders, batch_size, batch_radius_km):
+            batches.append((vendor_id, [vendor_orders[i] for i in indices]))
+    if not batches or not couriers:
+        return []
+
+    pickup_lat = [vendor_locations[v][0] for v, _ in batches]
+    pickup_lon = [vendor_locations[v][1] for v, _ in batches]
+    pickup_km = haversine_matrix(pickup_lat, pickup_lon, [c["latitude"] for c in couriers], [c["longitude"] for c in couriers])
+    waited_minutes = np.array([(now - group[0]["created_at"]).total_seconds() / 60 for _, group in batches])
+    cost = np.where(pickup_km <= max_pickup_km, pickup_km - age_weight_km * waited_minutes[:, None], np.inf)
+
+    # Greedy matching: cheapest (batch, courier) pairs first
+    flat = np.argsort(cost, axis=None, kind="stable")
+    flat = flat[np.isfinite(cost.ravel()[flat])]
+    batch_used = np.zeros(len(batches), dtype=bool)
+    courier_used = np.zeros(len(couriers), dtype=bool)
+    limit = min(len(batches), len(couriers))
+    assignments = []
+    for b, c in zip(*np.unravel_index(flat, cost.shape)):
+        if batch_used[b] or courier_used[c]:
+            continue
+        batch_used[b] = courier_used[c] = True
+        vendor_id, group = batches[b]
+        drops = [(o["delivery_latitude"], o["delivery_longitude"]) for o in group]
+        order, length = plan_route(vendor_locations[vendor_id], drops)
+        assignments.append(Assignment(
+            courier_id=couriers[c]["_id"],
+            vendor_id=vendor_id,
+            order_ids=[str(group[i]["_id"]) for i in order],
+            stops=[drops[i] for i in order],
+            pickup_km=round(float(pickup_km[b, c]), 3),
+            route_km=round(length, 3),
+        ))
+        if len(assignments) == limit:
+            break
+    return assignments
+
+# ============== DISPATCH TICK ==============
+
+
+async def release_finished_batches() -> int:
+    """Free couriers whose batch has no open order left"""
+    active = await db.dispatch_batches.find({"state": "assigned"}, {"_id": 1}).to_list(None)
+    if not active:
+        return 0
+    ids = [b["_id"] for b in active]
+    still_open = set(await db.orders.distinct(
+        "dispatch_batch_id", {"dispatch_batch_id": {"$in": ids}, "status": {"$nin": TERMINAL_STATUSES}}
+    ))
+    finished = [batch_id for batch_id in ids if batch_id not in still_open]
+    if finished:
+        now = datetime.utcnow()
+        await db.dispatch_batches.update_many(
+            {"_id": {"$in": finished}}, {"$set": {"state": "finished", "finished_at": now}}
+        )
+        await db.couriers.update_many(
+            {"active_batch_id": {"$in": finished}}, {"$set": {"active_batch_id": None, "updated_at": now}}
+        )
+    return len(finished)
+
+
+async def load_dispatch_inputs(now: datetime):
+    orders = await db.orders.find(
+        {"delivery_type": "platform", "status": {"$in": DISPATCH_STATUSES}, "courier_id": None},
+        {"vendor_id": 1, "delivery_latitude": 1, "delivery_longitude": 1, "created_at": 1},
+    ).sort("created_at", 1).limit(DISPATCH_MAX_ORDERS).to_list(DISPATCH_MAX_ORDERS)
+    orders = [o for o in orders if o.get("delivery_latitude") is not None and o.get("delivery_longitude") is not None]
+
+    vendor_ids = {o.get("vendor_id") for o in orders}
+    vendor_locations = {}
+    if vendor_ids:
+        cursor = catalog_db.vendor_profiles.find(
+            {"_id": {"$in": [ObjectId(v) for v in vendor_ids if v and ObjectId.is_valid(v)]}},
+            {"latitude": 1, "longitude": 1},
+        )
+        async for vendor in cursor:
+            if vendor.get("latitude") is not None and vendor.get("longitude") is not None:
+                vendor_locations[str(vendor["_id"])] = (vendor["latitude"], vendor["longitude"])
+
+    couriers = await db.couriers.find(
+        {
+            "available": True,
+            "active_batch_id": None,
+            "last_seen_at": {"$gte": now - timedelta(minutes=COURIER_STALE_MINUTES)},
+        },
+        {"latitude": 1, "longitude": 1},
+    ).to_list(None)
+    return orders, vendor_locations, couriers
+
+
+async def apply_assignments(assignments: List[Assignment], now: datetime) -> List[Assignment]:
+    """Claim couriers, record batches and stamp the orders; returns the assignments that were applied"""
+    if not assignments:
+        return []
+    batch_ids = {a.batch_id: ObjectId(a.batch_id) for a in assignments}
+    # A courier going offline since the plan was made keeps the guard from matching
+    await db.couriers.bulk_write([
+        UpdateOne(
+            {"_id": a.courier_id, "available": True, "active_batch_id": None},
+            {"$set": {"active_batch_id": batch_ids[a.batch_id], "updated_at": now}},
+        )
+        for a in assignments
+    ], ordered=False)
+    claimed = {
+        str(c["active_batch_id"]) async for c in db.couriers.find(
+            {"active_batch_id": {"$in": list(batch_ids.values())}}, {"active_batch_id": 1}
+        )
+    }
+    applied = [a for a in assignments if a.batch_id in claimed]
+    if not applied:
+        return []
+
+    await db.dispatch_batches.insert_many([{
+        "_id": batch_ids[a.batch_id],
+        "courier_id": a.courier_id,
+        "vendor_id": a.vendor_id,
+        "order_ids": a.order_ids,
+        "stops": [{"order_id": oid, "latitude": lat, "longitude": lon} for oid, (lat, lon) in zip(a.order_ids, a.stops)],
+        "pickup_km": a.pickup_km,
+        "route_km": a.route_km,
+        "state": "assigned",
+        "created_at": now,
+    } for a in applied])
+    await db.orders.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId(order_id), "courier_id": None, "status": {"$in": DISPATCH_STATUSES}},
+            {"$set": {
+                "courier_id": a.courier_id,
+                "dispatch_batch_id": batch_ids[a.batch_id],
+                "dispatch_stop": position,
+                "updated_at": now,
+            }},
+        )
+        for a in applied
+        for position, order_id in enumerate(a.order_ids)
+    ], ordered=False)
+    return applied
+
+
+@periodic("dispatch_couriers", interval=DISPATCH_INTERVAL_SECONDS)
+async def dispatch_couriers() -> dict:
+    now = datetime.utcnow()
+    released = await release_finished_batches()
+    orders, vendor_locations, couriers = await load_dispatch_inputs(now)
+    result = {"released": released, "waiting": len(orders), "idle_couriers": len(couriers), "assigned": 0}
+    if not orders or not couriers:
+        return result
+
+    started = datetime.utcnow()
+    assignments = await asyncio.to_thread(plan_dispatch, orders, vendor_locations, couriers, now)
+    result["plan_ms"] = round((datetime.utcnow() - started).total_seconds() * 1000, 1)
+    applied = await apply_assignments(assignments, now)
+    result["assigned"] = len(applied)
+    metrics.inc("dispatch_batches_assigned", len(applied))
+    metrics.inc("dispatch_orders_assigned", sum(len(a.order_ids) for a in applied))
+    return result
@@ -0,0 +1,52 @@
+"""
+In-process publish/subscribe
+
+Writers publish one event per logical change (a batch of status updates is a
+single event) and subscribers such as caches and indexes react to it. Handlers
+run concurrently; a failing handler is logged and does not affect the
+publisher or the other handlers. Events do not cross process boundaries; use
+the job queue for work that must survive a restart.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+ORDER_STATUS_CHANGED = "orders.status_changed"
+PRODUCTS_CHANGED = "products.changed"
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+    def subscribe(self, topic: str, handler: Handler):
+        if handler not in self._handlers[topic]:
+            self._handlers[topic].append(handler)
+
+    def on(self, topic: str):
+        """Decorator form of subscribe"""
+        def decorator(fn: Handler) -> Handler:
+            self.subscribe(topic, fn)
+            return fn
+        return decorator
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        handlers = self._handlers.get(topic)
+        metrics.inc("events_published", topic=topic)
+        if not handlers:
+            return
+        results = await asyncio.gather(*(h(payload) for h in handlers), return_exceptions=True)
+        for handler, result in zip(handlers, results):
+            if isinstance(result, Exception):
+                metrics.inc("event_handler_errors", topic=topic)
+                logger.error(f"Event handler {handler.__name__} failed for {topic}: {str(result)}")
+
+
+bus = EventBus()
@@ -0,0 +1,152 @@
+"""
+Geographic helpers: distances, geohash cells and polygons
+
+Coordinates are (latitude, longitude) in degrees. ``haversine_matrix`` is the
+numpy version for many-to-many distances (dispatch, pricing). Geohash cells of
+GEO_CELL_PRECISION characters (6 by default, about 1.2 x 0.6 km) are the unit
+of the delivery zone index.
+"""
+import math
+import os
+from typing import Iterator, List, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+GEO_CELL_PRECISION = int(os.environ.get("GEO_CELL_PRECISION", "6"))
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+BASE32_INDEX = {c: i for i, c in enumerate(BASE32)}
+
+Point = Tuple[float, float]
+
+# ============== DISTANCE ==============
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def haversine_matrix(lat_a, lon_a, lat_b, lon_b):
+    """Pairwise distances in km between points A (rows) and B (columns) as a numpy array"""
+    import numpy as np
+
+    phi_a = np.radians(np.asarray(lat_a, dtype=np.float64))[:, None]
+    phi_b = np.radians(np.asarray(lat_b, dtype=np.float64))[None, :]
+    dlambda = np.radians(np.asarray(lon_b, dtype=np.float64))[None, :] - np.radians(np.asarray(lon_a, dtype=np.float64))[:, None]
+    a = np.sin((phi_b - phi_a) / 2) ** 2 + np.cos(phi_a) * np.cos(phi_b) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def valid_point(lat, lon) -> bool:
+    return isinstance(lat, (int, float)) and isinstance(lon, (int, float)) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+# ============== GEOHASH ==============
+
+
+def encode(lat: float, lon: float, precision: int = GEO_CELL_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def bounds(cell: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def center(cell: str) -> Point:
+    lat_min, lat_max, lon_min, lon_max = bounds(cell)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+def cell_size(precision: int = GEO_CELL_PRECISION) -> Tuple[float, float]:
+    """(lat, lon) extent in degrees of cells at `precision`"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def cells_in_box(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                 precision: int = GEO_CELL_PRECISION) -> Iterator[str]:
+    """Every cell overlapping a bounding box (no antimeridian wrap; not needed for our region)"""
+    dlat, dlon = cell_size(precision)
+    lat_min, lat_max = max(lat_min, -90.0), min(lat_max, 90.0 - 1e-9)
+    lon_min, lon_max = max(lon_min, -180.0), min(lon_max, 180.0 - 1e-9)
+    # Start at the south-west cell corner so every step lands inside a new cell
+    lat = (math.floor((lat_min + 90.0) / dlat) + 0.5) * dlat - 90.0
+    while lat < lat_max + dlat / 2:
+        lon = (math.floor((lon_min + 180.0) / dlon) + 0.5) * dlon - 180.0
+        while lon < lon_max + dlon / 2:
+            yield encode(min(lat, lat_max), min(lon, lon_max), precision)
+            lon += dlon
+        lat += dlat
+
+
+def cells_within(lat: float, lon: float, radius_km: float, precision: int = GEO_CELL_PRECISION) -> Iterator[str]:
+    """Cells whose center lies within `radius_km` of a point"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    for cell in cells_in_box(lat - dlat, lat + dlat, lon - dlon, lon + dlon, precision):
+        clat, clon = center(cell)
+        if haversine_km(lat, lon, clat, clon) <= radius_km:
+            yield cell
+
+# ============== POLYGONS ==============
+
+
+def point_in_polygon(lat: float, lon: float, polygon: Sequence[Sequence[float]]) -> bool:
+    """Ray casting; `polygon` is a list of [lat, lon] vertices (closing vertex optional)"""
+    inside = False
+    count = len(polygon)
+    j = count - 1
+    for i in range(count):
+        lat_i, lon_i = polygon[i][0], polygon[i][1]
+        lat_j, lon_j = polygon[j][0], polygon[j][1]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def cells_in_polygon(polygon: Sequence[Sequence[float]], precision: int = GEO_CELL_PRECISION) -> List[str]:
+    """Cells whose center lies inside the polygon"""
+    lats = [p[0] for p in polygon]
+    lons = [p[1] for p in polygon]
+    cells = []
+    for cell in cells_in_box(min(lats), max(lats), min(lons), max(lons), precision):
+        clat, clon = center(cell)
+        if point_in_polygon(clat, clon, polygon):
+            cells.append(cell)
+    return cells
@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Every worker is a uvicorn event loop with its own Mongo pool; set CACHE_URL to
+a Redis URL so cached catalog entries and their invalidation are shared.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Keep-alive above typical load balancer idle timeouts
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", "75"))
+timeout = int(os.environ.get("WORKER_TIMEOUT_SECONDS", "60"))
+# Shutdown waits up to SHUTDOWN_DRAIN_SECONDS for in-flight checkouts and then as
+# long again for running jobs (server.py lifespan), so cover both plus a margin
+graceful_timeout = int(os.environ.get(
+    "GRACEFUL_TIMEOUT_SECONDS",
+    str(int(2 * float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "20"))) + 10),
+))
+
+# Recycle workers periodically to bound memory growth; jitter avoids restarting all at once
+max_requests = int(os.environ.get("MAX_REQUESTS", "20000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "2000"))
+
+accesslog = "-" if os.environ.get("ACCESS_LOG") == "1" else None
+
+
+def on_starting(server):
+    """Runs once in the master before workers are forked"""
+    from dotenv import load_dotenv
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    from indexes import prepare_for_workers
+
+    prepare_for_workers()
+    server.log.info("MongoDB indexes ensured")
@@ -0,0 +1,226 @@
+"""
+Idempotency-Key support for retried writes
+
+The first request with a given key runs the handler and stores its response
+in ``idempotency_keys`` (expired by a TTL index). Retries with the same key
+replay the stored response after one indexed lookup. Identical requests that
+arrive while the first is still running in this process wait for it instead of
+running again; across workers the ``_id`` claim makes only one of them run.
+The claim carries a lease (``lease_until``), so a key left in progress by a
+worker that died is taken over by the next retry instead of answering 409
+until the TTL. Handlers whose writes cannot be rolled back call
+``commit_response`` once they are committed, so a failure after that point
+never lets a retry write again.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+
+from database import db
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+# How long a retry waits for a first attempt running in another worker
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# An in-progress key whose worker has not finished by then may be taken over by a retry;
+# kept above the gunicorn worker timeout so a live attempt is never run twice
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "120"))
+STORE_ATTEMPTS = 3
+MAX_KEY_LENGTH = 255
+
+_inflight: Dict[str, asyncio.Future] = {}
+# (record id, fingerprint) of the key the running handler holds
+_current: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("idempotency_current", default=None)
+
+
+def _fingerprint(payload: Any) -> str:
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _replay(record: dict, fingerprint: str, scope: str) -> JSONResponse:
+    if record.get("fingerprint") != fingerprint:
+        metrics.inc("idempotency", outcome="mismatch", scope=scope)
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    metrics.inc("idempotency", outcome="replayed", scope=scope)
+    return JSONResponse(
+        content=record["response"],
+        status_code=record.get("status_code", 200),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _claim(record_id: str, fingerprint: str, scope: str) -> bool:
+    """Insert the in-progress record, or take over one whose lease ran out; True when this call may run"""
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": record_id,
+            "state": "in_progress",
+            "fingerprint": fingerprint,
+            "lease_until": lease_until,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        })
+        return True
+    except DuplicateKeyError:
+        pass
+    # The attempt holding the key died (or could not store its response) before finishing
+    taken = await db.idempotency_keys.find_one_and_update(
+        {"_id": record_id, "state": "in_progress", "fingerprint": fingerprint, "lease_until": {"$lt": now}},
+        {"$set": {"lease_until": lease_until}},
+    )
+    if taken is not None:
+        metrics.inc("idempotency", outcome="taken_over", scope=scope)
+        return True
+    return False
+
+
+async def _wait_for_other_worker(record_id: str, fingerprint: str, scope: str) -> Optional[dict]:
+    """
+    Poll until the attempt running in another worker stores its response (returned),
+    or until the key is free again and this call claims it (None)
+    """
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        if record is not None and record.get("state") == "done":
+            return record
+        # Released after a failure, or its lease ran out
+        if (record is None or record.get("lease_until", datetime.max) < datetime.utcnow()) and await _claim(record_id, fingerprint, scope):
+            return None
+    metrics.inc("idempotency", outcome="conflict", scope=scope)
+    raise HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still being processed",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _store_response(record_id: str, stored: dict):
+    """Mark the key done, retrying so a blip does not leave it in progress until the lease runs out"""
+    for attempt in range(STORE_ATTEMPTS):
+        try:
+            now = datetime.utcnow()
+            # Upsert: a cancelled handler may have released the key before its committed response got here
+            await db.idempotency_keys.update_one(
+                {"_id": record_id},
+                {
+                    "$set": {**stored, "completed_at": now},
+                    "$unset": {"lease_until": ""},
+                    "$setOnInsert": {"created_at": now, "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)},
+                },
+                upsert=True,
+            )
+            return
+        except Exception as e:
+            if attempt == STORE_ATTEMPTS - 1:
+                # The request did run; a retry after the lease would run it again
+                logger.error(f"Could not store idempotent response for {record_id}: {str(e)}")
+                return
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+
+async def commit_response(response: Any):
+    """
+    Store the response a handler is about to return as soon as its writes are
+    committed: a failure or cancellation after this point no longer releases
+    the key, so a retry replays the response instead of writing again.
+    A no-op outside run_idempotent or without a key.
+    """
+    current = _current.get()
+    if current is None:
+        return
+    record_id, fingerprint = current
+    stored = {"state": "done", "fingerprint": fingerprint, "response": jsonable_encoder(response), "status_code": 200}
+    await asyncio.shield(_store_response(record_id, stored))
+
+
+async def _execute(record_id: str, fingerprint: str, scope: str, handler):
+    """Returns (response for this caller, stored record for coalesced duplicates)"""
+    record = await db.idempotency_keys.find_one({"_id": record_id})
+    if record is not None and record.get("state") == "done":
+        return _replay(record, fingerprint, scope), record
+    if record is not None and record.get("fingerprint") != fingerprint:
+        metrics.inc("idempotency", outcome="mismatch", scope=scope)
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+
+    if not await _claim(record_id, fingerprint, scope):
+        record = await _wait_for_other_worker(record_id, fingerprint, scope)
+        if record is not None:
+            return _replay(record, fingerprint, scope), record
+
+    token = _current.set((record_id, fingerprint))
+    try:
+        result = await handler()
+    except BaseException:
+        # Release the key so a retry can run the request again (unless commit_response already stored it)
+        await asyncio.shield(db.idempotency_keys.delete_one({"_id": record_id, "state": "in_progress"}))
+        raise
+    finally:
+        _current.reset(token)
+
+    stored = {"state": "done", "fingerprint": fingerprint, "response": jsonable_encoder(result), "status_code": 200}
+    # Shielded: a cancelled request must still record that it ran
+    await asyncio.shield(_store_response(record_id, stored))
+    metrics.inc("idempotency", outcome="executed", scope=scope)
+    return result, stored
+
+
+async def run_idempotent(
+    scope: str,
+    user_id: str,
+    key: Optional[str],
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Run `handler` at most once per (user, scope, key); without a key it just runs"""
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    record_id = f"{user_id}:{scope}:{key}"
+    fingerprint = _fingerprint(payload)
+
+    # Coalesce concurrent duplicates inside this process
+    pending = _inflight.get(record_id)
+    if pending is not None:
+        metrics.inc("idempotency", outcome="coalesced", scope=scope)
+        stored = await asyncio.shield(pending)
+        return _replay(stored, fingerprint, scope)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[record_id] = future
+    try:
+        result, stored = await _execute(record_id, fingerprint, scope, handler)
+    except BaseException as e:
+        # Duplicates waiting on this attempt see the same client error, or a
+        # retryable conflict when the attempt crashed or was cancelled
+        if isinstance(e, HTTPException):
+            future.set_exception(e)
+        else:
+            future.set_exception(HTTPException(status_code=409, detail="Original request failed, please retry"))
+        future.exception()  # mark retrieved when nobody is waiting
+        raise
+    else:
+        future.set_result(stored)
+        return result
+    finally:
+        _inflight.pop(record_id, None)
@@ -0,0 +1,120 @@
+"""
+Index definitions for all collections
+
+``ensure_indexes`` is idempotent. In multi-worker mode the gunicorn master runs
+it once before forking (see gunicorn.conf.py) and workers skip it.
+"""
+import asyncio
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEXES_READY_ENV = "MANAVIM_INDEXES_READY"
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "vendors": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("open_intervals.start", ASCENDING), ("open_intervals.end", ASCENDING)], name="open_intervals"),
+        IndexModel([("open_now", ASCENDING)], name="open_now"),
+        IndexModel([("schedule_version", ASCENDING)], name="schedule_version"),
+    ],
+    "vendor_profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("is_approved", ASCENDING)], name="is_approved"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+        # "Open now" is an $elemMatch over the compiled weekly intervals (see schedule.py)
+        IndexModel([("open_intervals.start", ASCENDING), ("open_intervals.end", ASCENDING)], name="open_intervals"),
+        IndexModel([("open_now", ASCENDING)], name="open_now"),
+        IndexModel([("schedule_version", ASCENDING)], name="schedule_version"),
+        IndexModel([("zone_dirty", ASCENDING)], name="zone_dirty", partialFilterExpression={"zone_dirty": True}),
+    ],
+    "products": [
+        IndexModel([("vendor_id", ASCENDING)], name="vendor_id"),
+        IndexModel([("is_available", ASCENDING), ("category", ASCENDING)], name="available_category"),
+        # Delta sync pages through changes in (updated_at, _id) order
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+    ],
+    "orders": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+        # Expired orders whose stock has not been released yet (normally none)
+        IndexModel([("stock_released", ASCENDING)], name="stock_release_pending",
+                   partialFilterExpression={"stock_released": False}),
+        IndexModel([("items.product_id", ASCENDING)], name="items_product_id"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], name="user_updated_at_id"),
+        # Platform orders waiting for a courier (see dispatch.py)
+        IndexModel([("delivery_type", ASCENDING), ("status", ASCENDING), ("courier_id", ASCENDING), ("created_at", ASCENDING)],
+                   name="dispatch_queue"),
+        IndexModel([("dispatch_batch_id", ASCENDING)], name="dispatch_batch_id", sparse=True),
+        IndexModel([("checkout_id", ASCENDING)], name="checkout_id", sparse=True),
+    ],
+    "carts": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # Empty carts get an expires_at; filled carts have none and are kept
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("state", ASCENDING), ("run_at", ASCENDING)], name="state_run_at"),
+        IndexModel([("state", ASCENDING), ("locked_until", ASCENDING)], name="state_locked_until"),
+    ],
+    "jobs_dead": [
+        IndexModel([("failed_at", DESCENDING)], name="failed_at"),
+    ],
+    "couriers": [
+        IndexModel([("available", ASCENDING), ("active_batch_id", ASCENDING), ("last_seen_at", ASCENDING)], name="idle"),
+    ],
+    "dispatch_batches": [
+        IndexModel([("state", ASCENDING)], name="state"),
+        IndexModel([("courier_id", ASCENDING), ("created_at", DESCENDING)], name="courier_created"),
+    ],
+    "co_purchases": [
+        IndexModel([("dirty", ASCENDING)], name="dirty", partialFilterExpression={"dirty": True}),
+    ],
+    "delivery_surge": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "tombstones": [
+        IndexModel([("collection", ASCENDING), ("deleted_at", ASCENDING)], name="collection_deleted_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes(database):
+    """Create missing indexes; a failing index is logged and does not stop startup"""
+    for collection, models in INDEXES.items():
+        try:
+            await database[collection].create_indexes(models)
+        except Exception as e:
+            logger.warning(f"Could not create indexes on {collection}: {str(e)}")
+    os.environ[INDEXES_READY_ENV] = "1"
+
+
+def indexes_ready() -> bool:
+    return os.environ.get(INDEXES_READY_ENV) == "1"
+
+
+def prepare_for_workers():
+    """Ensure indexes from the parent process so forked/spawned workers skip it"""
+    import database
+
+    async def run():
+        database.connect()
+        try:
+            await ensure_indexes(database.db)
+        finally:
+            database.close()
+
+    asyncio.run(run())
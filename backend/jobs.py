@@ -0,0 +1,225 @@
+"""
+Durable background jobs backed by the ``jobs`` collection
+
+Request handlers ``enqueue`` work that does not have to finish before the
+response (cart clearing, notifications, rollups). ``JobWorker`` tasks started
+in the lifespan hook claim due jobs with ``find_one_and_update`` and run the
+registered handler. Delivery is at least once: a claim is a lease, and a job
+whose worker died is picked up again when the lease runs out, so handlers must
+be idempotent. Failures are retried with exponential backoff; jobs that run
+out of attempts are moved to ``jobs_dead``.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from database import db
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "8"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+JOB_BACKOFF_BASE_SECONDS = 2.0
+JOB_BACKOFF_MAX_SECONDS = 600.0
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job(name: str):
+    """Register an async handler taking the job payload"""
+    def decorator(fn: JobHandler) -> JobHandler:
+        if name in JOB_HANDLERS and JOB_HANDLERS[name] is not fn:
+            raise RuntimeError(f"Job handler {name} registered twice")
+        JOB_HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+async def enqueue(name: str, payload: Dict[str, Any], delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+    now = datetime.utcnow()
+    result = await db.jobs.insert_one({
+        "name": name,
+        "payload": payload,
+        "state": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+        "locked_by": None,
+        "locked_until": None,
+    })
+    metrics.inc("jobs_enqueued", job=name)
+    if delay <= 0:
+        worker.notify()
+    return str(result.inserted_id)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff, jittered so retries of a failed batch spread out"""
+    ceiling = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+# ============== WORKER ==============
+
+class JobWorker:
+    def __init__(self, concurrency: int = JOB_WORKERS):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks = []
+        self._stopping = False
+        self._running = 0
+        # Set by enqueue so a local idle worker picks new jobs up without waiting a poll interval
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db.jobs.find_one_and_update(
+            {
+                "name": {"$in": list(JOB_HANDLERS)},
+                "$or": [
+                    {"state": "queued", "run_at": {"$lte": now}},
+                    # Lease ran out: the worker holding it crashed or hung
+                    {"state": "running", "locked_until": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "state": "running",
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def run_one(self, doc: dict):
+        name = doc["name"]
+        started = datetime.utcnow()
+        try:
+            await asyncio.wait_for(JOB_HANDLERS[name](doc["payload"]), JOB_LEASE_SECONDS)
+        except Exception as e:
+            await self._failed(doc, e)
+            return
+        # Only the lease holder may complete the job
+        await db.jobs.delete_one({"_id": doc["_id"], "locked_by": self.worker_id})
+        metrics.inc("jobs_completed", job=name)
+        metrics.set("job_last_duration_seconds", (datetime.utcnow() - started).total_seconds(), job=name)
+
+    async def _failed(self, doc: dict, error: Exception):
+        name = doc["name"]
+        message = f"{type(error).__name__}: {error}"
+        if doc["attempts"] >= doc.get("max_attempts", JOB_MAX_ATTEMPTS):
+            logger.error(f"Job {name} {doc['_id']} moved to dead letters after {doc['attempts']} attempts: {message}")
+            dead = {**doc, "state": "dead", "last_error": message, "failed_at": datetime.utcnow()}
+            await db.jobs_dead.replace_one({"_id": doc["_id"]}, dead, upsert=True)
+            await db.jobs.delete_one({"_id": doc["_id"], "locked_by": self.worker_id})
+            metrics.inc("jobs_dead", job=name)
+            return
+        delay = backoff_seconds(doc["attempts"])
+        logger.warning(f"Job {name} {doc['_id']} failed (attempt {doc['attempts']}), retrying in {delay:.0f}s: {message}")
+        await db.jobs.update_one(
+            {"_id": doc["_id"], "locked_by": self.worker_id},
+            {"$set": {
+                "state": "queued",
+                "run_at": datetime.utcnow() + timedelta(seconds=delay),
+                "locked_by": None,
+                "locked_until": None,
+                "last_error": message,
+            }},
+        )
+        metrics.inc("jobs_retried", job=name)
+
+    async def _loop(self):
+        idle = JOB_POLL_SECONDS
+        while not self._stopping:
+            try:
+                doc = await self.claim() if JOB_HANDLERS else None
+            except Exception as e:
+                logger.error(f"Job claim failed: {str(e)}")
+                doc = None
+            if doc is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), idle)
+                    idle = JOB_POLL_SECONDS
+                except asyncio.TimeoutError:
+                    # Back off while the queue stays empty
+                    idle = min(idle * 2, JOB_POLL_SECONDS * 8)
+                continue
+            idle = JOB_POLL_SECONDS
+            self._running += 1
+            try:
+                await self.run_one(doc)
+            except Exception as e:
+                # Bookkeeping failed; the lease expires and the job is retried
+                logger.error(f"Job {doc['name']} {doc['_id']} bookkeeping failed: {str(e)}")
+            finally:
+                self._running -= 1
+
+    def start(self):
+        if self.concurrency <= 0:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job worker(s) as {self.worker_id}")
+
+    async def stop(self, timeout: float):
+        """Finish the jobs being run; anything still running after `timeout` is retried by the lease"""
+        self._stopping = True
+        self.notify()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+
+worker = JobWorker()
+
+
+async def queue_stats() -> Dict[str, Any]:
+    now = datetime.utcnow()
+    try:
+        depth = await db.jobs.count_documents({"state": "queued", "run_at": {"$lte": now}})
+        delayed = await db.jobs.count_documents({"state": "queued", "run_at": {"$gt": now}})
+        running = await db.jobs.count_documents({"state": "running"})
+        dead = await db.jobs_dead.estimated_document_count()
+        oldest = await db.jobs.find_one(
+            {"state": "queued", "run_at": {"$lte": now}}, {"run_at": 1}, sort=[("run_at", 1)]
+        )
+    except Exception as e:
+        return {"error": str(e)}
+    return {
+        "depth": depth,
+        "delayed": delayed,
+        "running": running,
+        "dead": dead,
+        # How long the oldest due job has been waiting for a worker
+        "lag_seconds": (now - oldest["run_at"]).total_seconds() if oldest else 0.0,
+        "local_running": worker._running,
+        "handlers": sorted(JOB_HANDLERS),
+    }
+
+
+metrics.register_collector("jobs", queue_stats)
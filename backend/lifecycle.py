@@ -0,0 +1,63 @@
+"""
+Graceful shutdown support
+
+Requests that must not be cut off half way (checkout) run inside
+``checkouts.track()``. On shutdown the lifespan hook stops admitting new ones
+and waits for the in-flight ones before the Mongo client is closed.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class InflightTracker:
+    def __init__(self, name: str):
+        self.name = name
+        self.draining = False
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @asynccontextmanager
+    async def track(self):
+        if self.draining:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is shutting down, please retry",
+                headers={"Retry-After": "2"},
+            )
+        self._inflight += 1
+        self._idle.clear()
+        metrics.set("inflight", self._inflight, operation=self.name)
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            metrics.set("inflight", self._inflight, operation=self.name)
+            if self._inflight == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Refuse new work and wait up to `timeout` seconds for in-flight work to finish"""
+        self.draining = True
+        if self._inflight:
+            logger.info(f"Waiting for {self._inflight} in-flight {self.name} request(s)")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutdown with {self._inflight} {self.name} request(s) still running")
+            return False
+
+
+checkouts = InflightTracker("checkout")
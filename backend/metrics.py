@@ -0,0 +1,50 @@
+"""
+Minimal in-process metrics registry
+
+Counters and gauges are kept in plain dicts keyed by name and labels.
+Subsystems that already track their own state register a collector that is
+called when a snapshot is taken.
+"""
+import inspect
+from collections import defaultdict
+from typing import Any, Callable, Dict
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class Metrics:
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._collectors: Dict[str, Callable[[], Any]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self._counters[_key(name, labels)] += value
+
+    def set(self, name: str, value: float, **labels):
+        self._gauges[_key(name, labels)] = value
+
+    def register_collector(self, name: str, collector: Callable[[], Any]):
+        """Register a (sync or async) callable whose result is included in snapshots"""
+        self._collectors[name] = collector
+
+    async def snapshot(self) -> Dict[str, Any]:
+        collected = {}
+        for name, collector in self._collectors.items():
+            value = collector()
+            if inspect.isawaitable(value):
+                value = await value
+            collected[name] = value
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            **collected,
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,275 @@
+"""
+Request/response models shared by the routers
+"""
+from pydantic import BaseModel, Field, EmailStr
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+from bson import ObjectId
+
+# ============== MODELS ==============
+
+class PyObjectId(str):
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+    
+    @classmethod
+    def validate(cls, v):
+        if not ObjectId.is_valid(v):
+            raise ValueError("Invalid ObjectId")
+        return str(v)
+
+class UserBase(BaseModel):
+    email: EmailStr
+    full_name: str
+    phone: str
+    role: str = "customer"  # customer, vendor, admin, courier
+
+class UserCreate(UserBase):
+    password: str
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class User(UserBase):
+    id: str = Field(alias="_id")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    is_active: bool = True
+    
+    class Config:
+        populate_by_name = True
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+    user: Dict[str, Any]
+
+class VendorProfile(BaseModel):
+    user_id: str
+    store_name: str
+    store_description: Optional[str] = None
+    store_image: Optional[str] = None  # base64
+    address: str
+    latitude: float
+    longitude: float
+    phone: str
+    working_hours: Optional[str] = "09:00-22:00"
+    delivery_options: List[str] = ["self", "platform"]  # self delivery or platform courier
+    delivery_radius_km: Optional[float] = None  # DEFAULT_DELIVERY_RADIUS_KM when unset
+    delivery_polygon: Optional[List[List[float]]] = None  # [[lat, lon], ...]; replaces the radius when set
+    delivery_fee_table: Optional[List[float]] = None  # fee per distance band; DELIVERY_FEE_TABLE when unset
+    free_delivery_over: Optional[float] = None  # subtotal from which delivery is free
+    tax_document: Optional[str] = None  # Vergi levhası (base64)
+    tax_number: Optional[str] = None  # Vergi numarası
+    is_approved: bool = False
+    rating: float = 0.0
+    total_orders: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class VendorProfileCreate(BaseModel):
+    store_name: str
+    store_description: Optional[str] = None
+    store_image: Optional[str] = None
+    address: str
+    latitude: float
+    longitude: float
+    phone: str
+    working_hours: Optional[str] = "09:00-22:00"
+    delivery_options: List[str] = ["self", "platform"]
+    delivery_radius_km: Optional[float] = Field(None, gt=0, le=50)
+    delivery_polygon: Optional[List[List[float]]] = None
+    delivery_fee_table: Optional[List[float]] = None
+    free_delivery_over: Optional[float] = Field(None, ge=0)
+    tax_document: Optional[str] = None  # Vergi levhası (base64)
+    tax_number: Optional[str] = None  # Vergi numarası
+
+class VendorDeliveryZoneUpdate(BaseModel):
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    delivery_radius_km: Optional[float] = Field(None, gt=0, le=50)
+    delivery_polygon: Optional[List[List[float]]] = None
+    clear_polygon: bool = False
+
+class VendorDeliveryFeesUpdate(BaseModel):
+    delivery_fee_table: Optional[List[float]] = None  # None resets to the platform default
+    free_delivery_over: Optional[float] = Field(None, ge=0)  # None turns free delivery off
+
+class DeliverySurgeUpdate(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    radius_km: float = Field(5.0, gt=0, le=50)
+    multiplier: float = Field(..., ge=1.0, le=3.0)  # 1.0 clears the surge
+    minutes: int = Field(60, ge=1, le=24 * 60)
+
+class Product(BaseModel):
+    vendor_id: str
+    name: str
+    description: Optional[str] = None
+    category: str  # fruits, vegetables, dairy, etc.
+    price: float
+    unit: str  # kg, piece, package
+    stock: int
+    images: List[str] = []  # base64 images
+    is_available: bool = True
+    discount_percentage: Optional[float] = 0.0
+    quality_grade: Optional[str] = "A"  # A, B, C kalite
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ProductCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    category: str
+    price: float
+    unit: str
+    stock: int
+    images: List[str] = []
+    is_available: bool = True
+    discount_percentage: Optional[float] = 0.0
+    quality_grade: Optional[str] = "A"  # A, B, C kalite
+
+class ProductUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    unit: Optional[str] = None
+    stock: Optional[int] = None
+    images: Optional[List[str]] = None
+    is_available: Optional[bool] = None
+    discount_percentage: Optional[float] = None
+
+class CartItem(BaseModel):
+    product_id: str
+    quantity: int
+    price: float
+
+class Cart(BaseModel):
+    user_id: str
+    items: List[CartItem] = []
+    total: float = 0.0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class OrderItem(BaseModel):
+    product_id: str
+    product_name: str
+    quantity: int
+    price: float
+    total: float
+
+class Order(BaseModel):
+    user_id: str
+    vendor_id: str
+    items: List[OrderItem]
+    subtotal: float
+    delivery_fee: float
+    total: float
+    delivery_address: str
+    delivery_latitude: float
+    delivery_longitude: float
+    phone: str
+    status: str = "pending"  # pending, accepted, preparing, ready, delivering, completed, cancelled
+    delivery_type: str  # self, platform
+    courier_id: Optional[str] = None
+    notes: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class OrderCreate(BaseModel):
+    vendor_id: str
+    items: List[OrderItem]
+    subtotal: float
+    delivery_fee: float  # what the client showed; the order is charged the server's quote (delivery_fees.py)
+    total: float
+    delivery_address: str
+    delivery_latitude: float
+    delivery_longitude: float
+    phone: str
+    delivery_type: str
+    notes: Optional[str] = None
+
+class CourierStatusUpdate(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    available: bool = True
+
+class CartCheckout(BaseModel):
+    delivery_address: str
+    delivery_latitude: float
+    delivery_longitude: float
+    phone: str
+    delivery_type: str
+    notes: Optional[str] = None
+
+class AddToCart(BaseModel):
+    product_id: str
+    quantity: int = 1
+
+class UpdateCartItem(BaseModel):
+    product_id: str
+    quantity: int
+
+class RemoveFromCart(BaseModel):
+    product_id: str
+
+# ============== VENDOR PANEL MODELS ==============
+
+class VendorLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class VendorDashboardResponse(BaseModel):
+    total_orders_today: int
+    total_revenue_today: float
+    pending_orders: int
+    total_products: int
+    active_products: int
+    low_stock_products: int
+    total_orders_week: int
+    total_revenue_week: float
+    total_orders_month: int
+    total_revenue_month: float
+    recent_orders: List[Dict[str, Any]]
+
+class VendorProductCreate(BaseModel):
+    name: str
+    category: str
+    price: float
+    unit: str
+    stock: int
+    description: Optional[str] = None
+    image: Optional[str] = None
+    discount_percentage: Optional[float] = 0
+    is_available: bool = True
+
+class VendorProductUpdate(BaseModel):
+    name: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    unit: Optional[str] = None
+    stock: Optional[int] = None
+    description: Optional[str] = None
+    image: Optional[str] = None
+    discount_percentage: Optional[float] = None
+    is_available: Optional[bool] = None
+
+class VendorOrderStatusUpdate(BaseModel):
+    status: str  # pending, accepted, preparing, ready, delivering, completed, cancelled (see order_state.py)
+
+class VendorOrderStatusChange(BaseModel):
+    order_id: str
+    status: str
+
+class VendorOrderStatusBatch(BaseModel):
+    updates: List[VendorOrderStatusChange] = Field(..., min_length=1, max_length=200)
+
+class VendorWorkingHours(BaseModel):
+    monday: Dict[str, str]
+    tuesday: Dict[str, str]
+    wednesday: Dict[str, str]
+    thursday: Dict[str, str]
+    friday: Dict[str, str]
+    saturday: Dict[str, str]
+    sunday: Dict[str, str]
+    holidays: List[str] = []
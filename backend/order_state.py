@@ -0,0 +1,183 @@
+"""
+Order status state machine
+
+pending -> accepted -> preparing -> ready -> delivering -> completed, and any
+open order can be cancelled. ``transition_orders`` checks a whole batch with
+one read (ownership through the vendor's products and current status), writes
+every valid transition in a single ``bulk_write`` whose filters include the
+status that was read, and publishes one ORDER_STATUS_CHANGED event for the
+batch. A transition that lost a race with another update is reported as a
+conflict instead of overwriting it.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from cache import cache
+from database import db
+from events import ORDER_STATUS_CHANGED, bus
+from metrics import metrics
+
+ORDER_STATUSES = ["pending", "accepted", "preparing", "ready", "delivering", "completed", "cancelled"]
+
+TRANSITIONS = {
+    "pending": {"accepted", "cancelled"},
+    "accepted": {"preparing", "cancelled"},
+    "preparing": {"ready", "cancelled"},
+    "ready": {"delivering", "cancelled"},
+    "delivering": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+
+# Status names older panel builds still send
+LEGACY_STATUSES = {"on_the_way": "delivering", "delivered": "completed"}
+
+MAX_BATCH = 200
+
+
+def normalize_status(status: str) -> str:
+    status = status.strip().lower()
+    return LEGACY_STATUSES.get(status, status)
+
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, set())
+
+
+async def release_stock(order_filter: dict) -> int:
+    """
+    Give back the stock of cancelled orders matching `order_filter` with one bulk write
+
+    Each order is first claimed by swapping ``stock_released: False`` for this
+    call's token, so a concurrent release (a vendor cancelling while the
+    recovery pass runs) or a replay after a crash never counts an order twice.
+    A crash between the claim and the stock write leaves the token in place:
+    that order's stock stays out rather than being given back twice.
+    """
+    candidates = [o["_id"] async for o in db.orders.find(order_filter, {"_id": 1})]
+    if not candidates:
+        return 0
+    token = ObjectId()
+    await db.orders.update_many(
+        {"_id": {"$in": candidates}, "stock_released": False}, {"$set": {"stock_released": token}}
+    )
+
+    quantities = defaultdict(int)
+    order_ids = []
+    cursor = db.orders.find(
+        {"_id": {"$in": candidates}, "stock_released": token}, {"items.product_id": 1, "items.quantity": 1}
+    )
+    async for order in cursor:
+        order_ids.append(order["_id"])
+        for item in order.get("items", []):
+            if ObjectId.is_valid(item.get("product_id", "")):
+                quantities[item["product_id"]] += item.get("quantity", 0)
+    if quantities:
+        now = datetime.utcnow()
+        await db.products.bulk_write(
+            [
+                UpdateOne({"_id": ObjectId(pid)}, {"$inc": {"stock": qty, "sold_count": -qty}, "$set": {"updated_at": now}})
+                for pid, qty in quantities.items()
+            ],
+            ordered=False,
+        )
+        await cache.delete(*(f"product:{pid}" for pid in quantities))
+    if order_ids:
+        await db.orders.update_many({"_id": {"$in": order_ids}, "stock_released": token}, {"$set": {"stock_released": True}})
+    return len(order_ids)
+
+
+async def vendor_product_ids(vendor_id: str) -> List[str]:
+    products = await db.products.find({"vendor_id": vendor_id}, {"_id": 1}).to_list(None)
+    return [str(p["_id"]) for p in products]
+
+
+async def transition_orders(vendor_id: str, changes: List[Tuple[str, str]], as_admin: bool = False) -> List[Dict[str, Any]]:
+    """
+    Apply (order_id, target_status) pairs for a vendor; returns one result per pair
+    with result "updated", or "error" and a `code` of invalid/not_found/invalid_transition/conflict.
+    With `as_admin` any order may be changed and `vendor_id` is the admin's user id.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(changes)
+    wanted = {}
+    for index, (order_id, status) in enumerate(changes):
+        target = normalize_status(status)
+        if not ObjectId.is_valid(order_id):
+            results[index] = {"order_id": order_id, "result": "error", "code": "invalid", "error": "Invalid order ID"}
+        elif target not in TRANSITIONS:
+            results[index] = {"order_id": order_id, "result": "error", "code": "invalid", "error": f"Invalid status {status}"}
+        elif order_id in wanted:
+            results[index] = {"order_id": order_id, "result": "error", "code": "invalid", "error": "Order listed twice"}
+        else:
+            wanted[order_id] = (index, target)
+
+    current = {}
+    if wanted:
+        query = {"_id": {"$in": [ObjectId(o) for o in wanted]}}
+        if not as_admin:
+            query["items.product_id"] = {"$in": await vendor_product_ids(vendor_id)}
+        cursor = db.orders.find(query, {"status": 1})
+        async for order in cursor:
+            current[str(order["_id"])] = order.get("status", "pending")
+
+    now = datetime.utcnow()
+    batch_id = ObjectId()
+    ops, planned = [], []
+    for order_id, (index, target) in wanted.items():
+        if order_id not in current:
+            results[index] = {"order_id": order_id, "result": "error", "code": "not_found", "error": "Order not found"}
+            continue
+        from_status = current[order_id]
+        if not can_transition(from_status, target):
+            results[index] = {
+                "order_id": order_id, "result": "error", "code": "invalid_transition",
+                "error": f"Cannot change status from {from_status} to {target}", "from": from_status,
+            }
+            continue
+        update = {"status": target, "updated_at": now}
+        if target == "cancelled":
+            update["stock_released"] = False
+        ops.append(UpdateOne(
+            # Guard on the status we read so concurrent updates are not overwritten
+            {"_id": ObjectId(order_id), "status": from_status},
+            {"$set": update, "$push": {"status_history": {"from": from_status, "to": target, "at": now, "by": vendor_id, "batch": batch_id}}},
+        ))
+        planned.append((order_id, index, from_status, target))
+
+    changed = []
+    if ops:
+        result = await db.orders.bulk_write(ops, ordered=False)
+        applied = {order_id for order_id, *_ in planned}
+        if result.matched_count < len(ops):
+            # Some guards did not match; the last history entry tells which updates were ours
+            applied = set()
+            cursor = db.orders.find(
+                {"_id": {"$in": [ObjectId(o) for o, *_ in planned]}},
+                {"status": 1, "status_history": {"$slice": -1}},
+            )
+            async for order in cursor:
+                history = order.get("status_history") or [{}]
+                if history[-1].get("batch") == batch_id:
+                    applied.add(str(order["_id"]))
+        for order_id, index, from_status, target in planned:
+            if order_id in applied:
+                results[index] = {"order_id": order_id, "result": "updated", "from": from_status, "status": target}
+                changed.append({"order_id": order_id, "from": from_status, "to": target})
+            else:
+                results[index] = {
+                    "order_id": order_id, "result": "error", "code": "conflict",
+                    "error": "Order was changed by someone else, reload and retry",
+                }
+
+    cancelled = [ObjectId(c["order_id"]) for c in changed if c["to"] == "cancelled"]
+    if cancelled:
+        await release_stock({"_id": {"$in": cancelled}, "stock_released": False})
+
+    if changed:
+        metrics.inc("order_transitions", len(changed))
+        await bus.publish(ORDER_STATUS_CHANGED, {"vendor_id": vendor_id, "changes": changed, "at": now})
+    return results
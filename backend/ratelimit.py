@@ -0,0 +1,255 @@
+"""
+Rate limiting and admission control
+
+``RateLimitMiddleware`` applies token buckets per client IP and per principal
+(bearer token), with route-specific budgets for expensive endpoints such as
+login (bcrypt) and product search (regex scans). A global concurrency limit
+sheds load with 503 before latency collapses. Both answer with Retry-After.
+
+Buckets live in process memory by default; pass a shared store (e.g. the
+Redis backed one) so limits hold across workers.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+
+@dataclass(frozen=True)
+class Budget:
+    """`rate` tokens per second with bursts of up to `burst` requests"""
+    rate: float
+    burst: int
+
+
+@dataclass(frozen=True)
+class RouteRule:
+    method: str
+    path_prefix: str
+    name: str
+    per_ip: Optional[Budget] = None
+    per_principal: Optional[Budget] = None
+    # Only apply when this query parameter is present (e.g. search)
+    query_param: Optional[str] = None
+
+    def matches(self, method: str, path: str, query_string: bytes) -> bool:
+        if self.method != "*" and method != self.method:
+            return False
+        if not path.startswith(self.path_prefix):
+            return False
+        if self.query_param:
+            return any(part.split(b"=", 1)[0] == self.query_param.encode() for part in query_string.split(b"&"))
+        return True
+
+
+def _env_budget(name: str, rate: float, burst: int) -> Budget:
+    value = os.environ.get(name)
+    if value:
+        rate_str, burst_str = value.split("/")
+        return Budget(float(rate_str), int(burst_str))
+    return Budget(rate, burst)
+
+
+# First matching rule wins; the default budgets apply to everything else
+ROUTE_RULES: List[RouteRule] = [
+    RouteRule("POST", "/api/auth/login", "auth.login",
+              per_ip=_env_budget("RATE_LIMIT_LOGIN", 5 / 60, 10)),
+    RouteRule("POST", "/api/vendor/login", "vendor.login",
+              per_ip=_env_budget("RATE_LIMIT_LOGIN", 5 / 60, 10)),
+    RouteRule("POST", "/api/auth/register", "auth.register",
+              per_ip=_env_budget("RATE_LIMIT_REGISTER", 1 / 60, 5)),
+    RouteRule("GET", "/api/products", "products.search", query_param="search",
+              per_ip=_env_budget("RATE_LIMIT_SEARCH", 5, 20),
+              per_principal=_env_budget("RATE_LIMIT_SEARCH", 5, 20)),
+    RouteRule("POST", "/api/orders", "orders.create",
+              per_principal=_env_budget("RATE_LIMIT_CHECKOUT", 1, 5)),
+]
+DEFAULT_PER_IP = _env_budget("RATE_LIMIT_PER_IP", 50, 100)
+DEFAULT_PER_PRINCIPAL = _env_budget("RATE_LIMIT_PER_PRINCIPAL", 20, 60)
+
+# Share of max_buckets a full memory store is swept down to
+SWEEP_LOW_WATER = 0.9
+
+# Paths that are never limited (load balancer probes, scraping)
+EXEMPT_PATHS = ("/api/health", "/api/metrics")
+
+# ============== BUCKET STORES ==============
+
+
+class MemoryBucketStore:
+    """Token buckets in a dict; refilled buckets are swept and the nearest to full evicted, so memory stays bounded"""
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        # key -> (tokens, updated, time the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    async def take(self, key: str, budget: Budget, now: float) -> float:
+        """Take one token; returns 0 when allowed, otherwise seconds until a token is available"""
+        tokens, updated, _ = self._buckets.get(key, (budget.burst, now, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / budget.rate
+        self._buckets[key] = (tokens, now, now + (budget.burst - tokens) / budget.rate)
+        if len(self._buckets) > self.max_buckets:
+            self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float):
+        # A bucket that has refilled to its burst is the same as a new one; drop it
+        full = [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+        # Still too many (e.g. random bearer tokens): evict those closest to full, which gives
+        # away the fewest tokens, down to a low-water mark so the next request does not sweep again
+        excess = len(self._buckets) - int(self.max_buckets * SWEEP_LOW_WATER)
+        if excess > 0:
+            for key in heapq.nsmallest(excess, self._buckets, key=lambda k: self._buckets[k][2]):
+                del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Shared token buckets; the refill-and-take step runs atomically in Redis"""
+
+    SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = "manavim:rl:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def take(self, key: str, budget: Budget, now: float) -> float:
+        # Wall clock, so all workers agree on time
+        wait = await self._script(keys=[self.prefix + key], args=[budget.rate, budget.burst, time.time()])
+        return float(wait)
+
+
+def create_bucket_store():
+    url = os.environ.get("RATE_LIMIT_STORE_URL") or os.environ.get("CACHE_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketStore(url)
+    return MemoryBucketStore()
+
+# ============== MIDDLEWARE ==============
+
+
+def _client_ip(scope) -> str:
+    if os.environ.get("TRUST_FORWARDED_FOR") == "1":
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode().split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _principal(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            # The token is not verified here (that costs a DB lookup); hashing it
+            # gives each session its own bucket and the per-IP bucket still applies
+            return hashlib.sha1(value[7:]).hexdigest()
+    return None
+
+
+async def _reject(send, status: int, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, store=None, max_concurrency: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.app = app
+        self.store = store or create_bucket_store()
+        self.enabled = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+        max_concurrency = max_concurrency or int(os.environ.get("MAX_CONCURRENT_REQUESTS", "0"))
+        # 0 disables the global limit
+        self.concurrency = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(
+            os.environ.get("ADMISSION_QUEUE_TIMEOUT", "0.5"))
+        self.inflight = 0
+        metrics.register_collector("admission", lambda: {"inflight": self.inflight, "limit": max_concurrency})
+
+    async def _check_buckets(self, scope) -> Tuple[float, str]:
+        method, path = scope["method"], scope["path"]
+        rule = next((r for r in ROUTE_RULES if r.matches(method, path, scope.get("query_string", b""))), None)
+        route = rule.name if rule else "default"
+        per_ip = rule.per_ip if rule and rule.per_ip else DEFAULT_PER_IP
+        per_principal = rule.per_principal if rule and rule.per_principal else DEFAULT_PER_PRINCIPAL
+
+        now = time.monotonic()
+        wait = await self.store.take(f"ip:{route}:{_client_ip(scope)}", per_ip, now)
+        principal = _principal(scope)
+        if not wait and principal:
+            wait = await self.store.take(f"user:{route}:{principal}", per_principal, now)
+        return wait, route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait, route = await self._check_buckets(scope)
+        except Exception:
+            # A broken shared store must not take the API down with it
+            metrics.inc("ratelimit_store_errors")
+            wait, route = 0.0, "unknown"
+        if wait:
+            metrics.inc("ratelimited", route=route)
+            await _reject(send, 429, wait, "Too many requests")
+            return
+
+        if self.concurrency is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await asyncio.wait_for(self.concurrency.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("load_shed", route=route)
+            await _reject(send, 503, 1, "Server is busy, please retry")
+            return
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+            self.concurrency.release()
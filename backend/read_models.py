@@ -0,0 +1,125 @@
+"""
+Typed read models and a serialization fast path for trusted documents
+
+Documents we just read from Mongo (or built ourselves) do not need to be
+validated again on the way out. ``json_response``/``list_response`` serialize
+them with a precompiled TypeAdapter straight to JSON bytes, skipping both
+response-model validation and FastAPI's ``jsonable_encoder`` walk. With
+VALIDATE_RESPONSES=1 (development, CI) the data is first validated against the
+read model, so schema drift still surfaces. (``model_construct`` was measured
+too; building instances in Python costs more than pydantic-core validation.)
+
+Read models allow extra fields, so the wire format stays the stored document.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+VALIDATE_RESPONSES = os.environ.get("VALIDATE_RESPONSES") == "1"
+
+
+class ReadModel(BaseModel):
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+
+class ProductRead(ReadModel):
+    id: str = Field(alias="_id")
+    vendor_id: str
+    name: str
+    description: Optional[str] = None
+    category: str
+    price: float
+    unit: str
+    stock: int
+    is_available: bool = True
+    discount_percentage: Optional[float] = 0.0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class VendorProductRead(ReadModel):
+    id: str = Field(alias="_id")
+    name: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    unit: Optional[str] = None
+    stock: int = 0
+    description: Optional[str] = None
+    image: Optional[str] = None
+    discount_percentage: Optional[float] = 0
+    is_available: bool = True
+    created_at: str
+
+
+class OrderItemRead(ReadModel):
+    product_id: str
+    product_name: Optional[str] = None
+    quantity: int
+    price: float
+    total: Optional[float] = None
+
+
+class OrderRead(ReadModel):
+    id: str = Field(alias="_id")
+    user_id: str
+    vendor_id: Optional[str] = None
+    items: List[OrderItemRead]
+    total: float
+    status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class SyncCollectionRead(ReadModel):
+    changed: List[Dict[str, Any]]
+    deleted: List[str]
+    has_more: bool
+
+
+class SyncRead(ReadModel):
+    reset: bool
+    watermark: str
+    has_more: bool
+    server_time: datetime
+    products: Optional[SyncCollectionRead] = None
+    vendors: Optional[SyncCollectionRead] = None
+    orders: Optional[SyncCollectionRead] = None
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+# Serializes plain dicts/lists in pydantic-core without looking at a schema
+_trusted = TypeAdapter(Any)
+
+
+def _adapter(model: Type[BaseModel], many: bool) -> TypeAdapter:
+    key = (model, many)
+    if key not in _adapters:
+        _adapters[key] = TypeAdapter(List[model] if many else model)
+    return _adapters[key]
+
+
+def dump(model: Type[BaseModel], data: Any, many: bool = False) -> bytes:
+    """JSON bytes for trusted `data`; checked against `model` only when VALIDATE_RESPONSES=1"""
+    if VALIDATE_RESPONSES:
+        try:
+            _adapter(model, many).validate_python(data)
+        except ValidationError as e:
+            logger.error(f"Response does not match {model.__name__}: {str(e)}")
+            raise
+    # The document itself is written either way, so both modes send identical bodies;
+    # stray BSON types (ObjectId, Decimal128) are written as strings
+    return _trusted.dump_json(data, fallback=str)
+
+
+def json_response(model: Type[BaseModel], data: Dict[str, Any], status_code: int = 200) -> Response:
+    return Response(content=dump(model, data), status_code=status_code, media_type="application/json")
+
+
+def list_response(model: Type[BaseModel], docs: Iterable[Dict[str, Any]]) -> Response:
+    return Response(content=dump(model, list(docs), many=True), media_type="application/json")
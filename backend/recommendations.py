@@ -0,0 +1,241 @@
+"""
+"Buy again" and "frequently bought together" from order history
+
+Two small collections are maintained as orders come in (from the
+``orders.placed`` job, so checkout does not wait for them):
+
+- ``customer_items``: one document per customer, ``items`` maps product id to
+  {n: orders containing it (a cart checkout counts as one), q: quantity,
+  t: last ordered}; ``buy_again`` is the
+  top BUY_AGAIN_SIZE product ids by order count decayed with
+  RECOMMENDATION_HALF_LIFE_DAYS, recomputed on every update.
+- ``co_purchases``: one document per product, ``with`` maps other product ids
+  to how many orders contained both;
+  ``together`` is the top TOGETHER_SIZE, recomputed by a periodic task for
+  documents marked ``dirty``.
+
+Serving is then one ``_id`` read of the precomputed list. Lists hold product
+ids and names only; clients take prices and stock from their synced catalog.
+
+Orders are claimed with a lease (``recommendations_claimed_until``) before
+counting and marked ``recommendations_recorded`` only once their counts are
+written, so concurrent or retried jobs do not count an order twice and a
+failed run leaves it to be counted again (a failure between the customer and
+co-purchase updates can count part of a basket twice, which is acceptable
+here). Item product ids that are not ObjectIds are skipped: they become
+field names in the update paths.
+"""
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from itertools import permutations
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from database import catalog_db, db
+from metrics import metrics
+from scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+BUY_AGAIN_SIZE = int(os.environ.get("BUY_AGAIN_SIZE", "30"))
+TOGETHER_SIZE = int(os.environ.get("TOGETHER_SIZE", "12"))
+RECOMMENDATION_HALF_LIFE_DAYS = float(os.environ.get("RECOMMENDATION_HALF_LIFE_DAYS", "45"))
+# Bounds keeping each document small
+MAX_CUSTOMER_ITEMS = 300
+MAX_CO_PURCHASES = 200
+MAX_ITEMS_PER_BASKET = 25
+REFRESH_BATCH_SIZE = 500
+BACKFILL_BATCH_SIZE = 500
+# Longer than the job lease, so a claim only expires once its job is gone
+RECORD_LEASE_SECONDS = 300
+
+# ============== SCORING ==============
+
+
+def buy_again_score(entry: Dict[str, Any], now: datetime) -> float:
+    """Order count, halved every RECOMMENDATION_HALF_LIFE_DAYS since the last order"""
+    age_days = max((now - entry["t"]).total_seconds() / 86400, 0.0)
+    return entry["n"] * math.pow(0.5, age_days / RECOMMENDATION_HALF_LIFE_DAYS)
+
+
+def rank_buy_again(items: Dict[str, Dict[str, Any]], now: datetime) -> List[str]:
+    return sorted(items, key=lambda pid: buy_again_score(items[pid], now), reverse=True)
+
+
+def rank_together(counts: Dict[str, int]) -> List[str]:
+    return sorted(counts, key=lambda pid: (-counts[pid], pid))
+
+# ============== RECORDING ==============
+
+
+async def claim_orders(order_ids: List[str]) -> List[Dict[str, Any]]:
+    """Lease orders not yet counted; returns those this call claimed"""
+    claimed = []
+    now = datetime.utcnow()
+    for order_id in order_ids:
+        if not ObjectId.is_valid(order_id):
+            continue
+        order = await db.orders.find_one_and_update(
+            {
+                "_id": ObjectId(order_id),
+                "recommendations_recorded": {"$ne": True},
+                "recommendations_claimed_until": {"$not": {"$gt": now}},
+            },
+            {"$set": {"recommendations_claimed_until": now + timedelta(seconds=RECORD_LEASE_SECONDS)}},
+            projection={"user_id": 1, "items": 1, "created_at": 1},
+        )
+        if order:
+            claimed.append(order)
+    return claimed
+
+
+async def finish_claim(orders: List[Dict[str, Any]], recorded: bool):
+    """Mark claimed orders as counted, or release them so a retry counts them"""
+    update: Dict[str, Any] = {"$unset": {"recommendations_claimed_until": ""}}
+    if recorded:
+        update["$set"] = {"recommendations_recorded": True}
+    await db.orders.update_many({"_id": {"$in": [order["_id"] for order in orders]}}, update)
+
+
+async def update_customer(user_id: str, lines: Dict[str, Dict[str, Any]], ordered_at: datetime):
+    """Add one basket (product id -> {name, quantity}) to a customer's vector and re-rank buy_again"""
+    update: Dict[str, Dict[str, Any]] = {"$inc": {}, "$max": {}, "$set": {"updated_at": datetime.utcnow()}}
+    for product_id, line in lines.items():
+        update["$inc"][f"items.{product_id}.n"] = 1
+        update["$inc"][f"items.{product_id}.q"] = line["quantity"]
+        update["$max"][f"items.{product_id}.t"] = ordered_at
+        update["$set"][f"names.{product_id}"] = line["name"]
+    doc = await db.customer_items.find_one_and_update(
+        {"_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER,
+        projection={"items": 1},
+    )
+
+    now = datetime.utcnow()
+    ranked = rank_buy_again(doc["items"], now)
+    refresh: Dict[str, Any] = {"$set": {"buy_again": ranked[:BUY_AGAIN_SIZE]}}
+    dropped = ranked[MAX_CUSTOMER_ITEMS:]
+    if dropped:
+        refresh["$unset"] = {f"{field}.{pid}": "" for pid in dropped for field in ("items", "names")}
+    await db.customer_items.update_one({"_id": user_id}, refresh)
+
+
+async def update_co_purchases(product_ids: List[str]):
+    """Count every ordered pair of products in one basket"""
+    basket = product_ids[:MAX_ITEMS_PER_BASKET]
+    if len(basket) < 2:
+        return
+    increments: Dict[str, Dict[str, int]] = {}
+    for a, b in permutations(basket, 2):
+        increments.setdefault(a, {})[f"with.{b}"] = 1
+    await db.co_purchases.bulk_write([
+        UpdateOne({"_id": product_id}, {"$inc": inc, "$set": {"dirty": True}}, upsert=True)
+        for product_id, inc in increments.items()
+    ], ordered=False)
+
+
+async def record_orders(order_ids: List[str]) -> int:
+    """Count the orders of one checkout (or a single order) once; returns how many were new"""
+    orders = await claim_orders(order_ids)
+    if not orders:
+        return 0
+
+    # All orders of one checkout are one basket for co-purchases; vectors are per customer
+    baskets: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    ordered_at: Dict[str, datetime] = {}
+    for order in orders:
+        lines = baskets.setdefault(order["user_id"], {})
+        for item in order.get("items", []):
+            product_id = item.get("product_id")
+            if not isinstance(product_id, str) or not ObjectId.is_valid(product_id):
+                metrics.inc("recommendation_items_skipped")
+                continue
+            line = lines.setdefault(product_id, {"name": item.get("product_name", ""), "quantity": 0})
+            line["quantity"] += item.get("quantity", 1)
+        created_at = order.get("created_at") or datetime.utcnow()
+        ordered_at[order["user_id"]] = max(ordered_at.get(order["user_id"], created_at), created_at)
+
+    try:
+        for user_id, lines in baskets.items():
+            if lines:
+                await update_customer(user_id, lines, ordered_at[user_id])
+                await update_co_purchases(list(lines))
+    except BaseException:
+        await finish_claim(orders, recorded=False)
+        raise
+    await finish_claim(orders, recorded=True)
+    metrics.inc("recommendation_orders_recorded", len(orders))
+    return len(orders)
+
+# ============== MAINTENANCE ==============
+
+
+@periodic("refresh_co_purchases", interval=300)
+async def refresh_co_purchases() -> dict:
+    """Re-rank `together` for products whose counts changed, trimming the long tail"""
+    refreshed = 0
+    cursor = db.co_purchases.find({"dirty": True}, {"with": 1}).limit(REFRESH_BATCH_SIZE)
+    ops = []
+    async for doc in cursor:
+        ranked = rank_together(doc.get("with") or {})
+        update: Dict[str, Any] = {"$set": {"together": ranked[:TOGETHER_SIZE], "updated_at": datetime.utcnow()},
+                                  "$unset": {"dirty": ""}}
+        for pid in ranked[MAX_CO_PURCHASES:]:
+            update["$unset"][f"with.{pid}"] = ""
+        ops.append(UpdateOne({"_id": doc["_id"]}, update))
+        refreshed += 1
+    if ops:
+        await db.co_purchases.bulk_write(ops, ordered=False)
+    return {"refreshed": refreshed}
+
+
+@periodic("backfill_recommendations", interval=600)
+async def backfill_recommendations() -> dict:
+    """Count orders placed before recommendations existed, oldest first, resuming from a stored position"""
+    state = await db.recommendation_state.find_one({"_id": "backfill"}) or {}
+    if state.get("done"):
+        return {"recorded": 0}
+    query = {"_id": {"$gt": state["last_id"]}} if state.get("last_id") else {}
+    orders = await db.orders.find(query, {"_id": 1}).sort("_id", 1).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+    recorded = 0
+    for order in orders:
+        # One order at a time: old orders carry no checkout grouping
+        recorded += await record_orders([str(order["_id"])])
+    if orders:
+        await db.recommendation_state.update_one(
+            {"_id": "backfill"}, {"$set": {"last_id": orders[-1]["_id"]}}, upsert=True
+        )
+    if len(orders) < BACKFILL_BATCH_SIZE:
+        await db.recommendation_state.update_one({"_id": "backfill"}, {"$set": {"done": True}}, upsert=True)
+    return {"recorded": recorded}
+
+# ============== SERVING ==============
+
+
+async def buy_again(user_id: str, limit: int = BUY_AGAIN_SIZE) -> List[Dict[str, Any]]:
+    doc = await catalog_db.customer_items.find_one({"_id": user_id}, {"buy_again": 1, "names": 1, "items": 1})
+    if not doc:
+        return []
+    items, names = doc.get("items") or {}, doc.get("names") or {}
+    return [
+        {
+            "product_id": pid,
+            "product_name": names.get(pid, ""),
+            "times_ordered": items[pid]["n"],
+            "last_ordered_at": items[pid]["t"],
+        }
+        for pid in doc.get("buy_again", [])[:limit]
+        if pid in items
+    ]
+
+
+async def bought_together(product_id: str, limit: int = TOGETHER_SIZE) -> List[Dict[str, Any]]:
+    doc = await catalog_db.co_purchases.find_one({"_id": product_id}, {"together": 1, "with": 1})
+    if not doc:
+        return []
+    counts = doc.get("with") or {}
+    return [{"product_id": pid, "orders_together": counts.get(pid, 0)} for pid in doc.get("together", [])[:limit]]
+
@@ -0,0 +1,128 @@
+"""
+Platform administration (admin role only)
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from analytics import sales_report
+from archive import archive_summary
+from auth import require_role
+from database import reporting_db
+from delivery_fees import set_surge
+from models import DeliverySurgeUpdate
+from uploads import upload_path
+
+router = APIRouter()
+
+# ============== ADMIN ENDPOINTS ==============
+
+@router.get("/admin/users")
+async def get_all_users(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Get all users (admin only)
+    """
+    users = await reporting_db.users.find({}, {"password": 0}).to_list(1000)
+    for user in users:
+        user["_id"] = str(user["_id"])
+    return users
+
+@router.get("/admin/vendors")
+async def get_all_vendors(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Get all vendor users (admin only)
+    """
+    vendors = await reporting_db.users.find({"role": "vendor"}, {"password": 0}).to_list(1000)
+    for vendor in vendors:
+        vendor["_id"] = str(vendor["_id"])
+    return vendors
+
+@router.get("/admin/statistics")
+async def get_admin_statistics(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Get platform statistics (admin only)
+    """
+    # Count users
+    total_users = await reporting_db.users.count_documents({})
+    total_customers = await reporting_db.users.count_documents({"role": "customer"})
+    total_vendors = await reporting_db.users.count_documents({"role": "vendor"})
+    total_admins = await reporting_db.users.count_documents({"role": "admin"})
+    
+    # Count orders
+    total_orders = await reporting_db.orders.count_documents({})
+    pending_orders = await reporting_db.orders.count_documents({"status": "pending"})
+    completed_orders = await reporting_db.orders.count_documents({"status": "completed"})
+    
+    # Calculate revenue
+    revenue = await reporting_db.orders.aggregate([
+        {"$match": {"status": "completed"}},
+        {"$group": {"_id": None, "total": {"$sum": "$total"}}},
+    ]).to_list(1)
+    total_revenue = revenue[0]["total"] if revenue else 0.0
+    
+    # Include archived history
+    archived = await archive_summary()
+    archived_orders = sum(archived["orders_by_status"].values())
+    total_orders += archived_orders
+    completed_orders += archived["orders_by_status"].get("completed", 0)
+    total_revenue += archived["revenue_by_status"].get("completed", 0.0)
+    
+    # Count products
+    total_products = await reporting_db.products.count_documents({})
+    active_products = await reporting_db.products.count_documents({"is_available": True})
+    
+    return {
+        "users": {
+            "total": total_users,
+            "customers": total_customers,
+            "vendors": total_vendors,
+            "admins": total_admins
+        },
+        "orders": {
+            "total": total_orders,
+            "pending": pending_orders,
+            "completed": completed_orders,
+            "archived": archived_orders
+        },
+        "revenue": {
+            "total": round(total_revenue, 2),
+            "currency": "TRY"
+        },
+        "products": {
+            "total": total_products,
+            "active": active_products
+        }
+    }
+
+@router.get("/admin/reports/sales")
+async def get_sales_report(
+    days: int = Query(30, ge=1, le=730),
+    vendor_id: Optional[str] = None,
+    current_user: dict = Depends(require_role(["admin"])),
+):
+    """
+    Platform-wide (or one vendor's) sales report including archived orders (admin only)
+    """
+    return await sales_report(days, vendor_id)
+
+@router.put("/admin/delivery-surge")
+async def update_delivery_surge(surge: DeliverySurgeUpdate, current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Multiply delivery fees around a point for a while, e.g. in a storm (admin only)
+    Body: {latitude, longitude, radius_km, multiplier, minutes}; multiplier 1.0 ends the surge.
+    """
+    try:
+        cells = await set_surge(surge.latitude, surge.longitude, surge.radius_km, surge.multiplier, surge.minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"cells": cells, "multiplier": surge.multiplier, "minutes": surge.minutes}
+
+@router.get("/admin/uploads/documents/{name}")
+async def get_uploaded_document(name: str, current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Download a vendor document such as a tax certificate (admin only)
+    """
+    path = upload_path("documents", name)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, headers={"Cache-Control": "private, no-store"})
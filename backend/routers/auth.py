@@ -0,0 +1,100 @@
+"""
+Account registration and login for customers, vendors and admins
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+
+from auth import create_access_token, get_current_user, get_password_hash, verify_password
+from database import db
+from models import Token, UserCreate, UserLogin
+from read_models import json_response
+
+router = APIRouter()
+
+# ============== AUTH ENDPOINTS ==============
+
+@router.post("/auth/register", response_model=Token)
+async def register(user_data: UserCreate):
+    # Check if user exists
+    existing_user = await db.users.find_one({"email": user_data.email})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Validate role
+    valid_roles = ["customer", "vendor", "admin", "courier"]
+    if user_data.role not in valid_roles:
+        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}")
+    
+    # Create user
+    user_dict = user_data.model_dump()
+    user_dict["password"] = get_password_hash(user_data.password)
+    user_dict["created_at"] = datetime.utcnow()
+    user_dict["is_active"] = True
+    
+    result = await db.users.insert_one(user_dict)
+    user_id = str(result.inserted_id)
+    
+    # Create access token with role
+    access_token = create_access_token(data={
+        "sub": user_id,
+        "email": user_data.email,
+        "role": user_data.role
+    })
+    
+    # Return user data
+    user_dict["_id"] = user_id
+    del user_dict["password"]
+    
+    # response_model documents the shape; the response is built from trusted data without re-validation
+    return json_response(Token, {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user_id,
+            "email": user_dict["email"],
+            "full_name": user_dict["full_name"],
+            "phone": user_dict["phone"],
+            "role": user_dict["role"],
+            "is_active": user_dict["is_active"],
+            "created_at": user_dict["created_at"]
+        }
+    })
+
+@router.post("/auth/login", response_model=Token)
+async def login(credentials: UserLogin):
+    user = await db.users.find_one({"email": credentials.email})
+    if not user or not verify_password(credentials.password, user["password"]):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=403, detail="Account is inactive")
+    
+    user_id = str(user["_id"])
+    user_role = user.get("role", "customer")
+    user_email = user.get("email")
+    
+    # Create access token with role and email
+    access_token = create_access_token(data={
+        "sub": user_id,
+        "email": user_email,
+        "role": user_role
+    })
+    
+    # Return structured user data
+    return json_response(Token, {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user_id,
+            "email": user_email,
+            "full_name": user.get("full_name", ""),
+            "phone": user.get("phone", ""),
+            "role": user_role,
+            "is_active": user.get("is_active", True),
+            "created_at": user.get("created_at")
+        }
+    })
+
+@router.get("/auth/me")
+async def get_me(current_user: dict = Depends(get_current_user)):
+    return current_user
@@ -0,0 +1,186 @@
+"""
+Shopping cart
+"""
+from fastapi import APIRouter, HTTPException, Depends, Header
+from typing import Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from auth import get_current_user
+from database import db
+from idempotency import run_idempotent
+from models import AddToCart, RemoveFromCart, UpdateCartItem
+from scheduler import EMPTY_CART_TTL_HOURS
+
+router = APIRouter()
+
+
+def empty_cart_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(hours=EMPTY_CART_TTL_HOURS)
+
+
+def cart_update(items: list, total: float) -> dict:
+    """Update document for a cart; empty carts expire through the TTL index, filled ones never do"""
+    fields = {"items": items, "total": total, "updated_at": datetime.utcnow()}
+    if items:
+        return {"$set": fields, "$unset": {"expires_at": ""}}
+    return {"$set": {**fields, "expires_at": empty_cart_expiry()}}
+
+# ============== CART ENDPOINTS ==============
+
+@router.get("/cart")
+async def get_cart(current_user: dict = Depends(get_current_user)):
+    cart = await db.carts.find_one({"user_id": current_user["_id"]})
+    if not cart:
+        # Create empty cart
+        cart = {
+            "user_id": current_user["_id"],
+            "items": [],
+            "total": 0.0,
+            "updated_at": datetime.utcnow(),
+            "expires_at": empty_cart_expiry()
+        }
+        result = await db.carts.insert_one(cart)
+        cart["_id"] = str(result.inserted_id)
+    else:
+        cart["_id"] = str(cart["_id"])
+    
+    return cart
+
+@router.post("/cart/add")
+async def add_to_cart(
+    item: AddToCart,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+):
+    # A retried add with the same Idempotency-Key must not add the quantity twice
+    return await run_idempotent(
+        "cart.add",
+        current_user["_id"],
+        idempotency_key,
+        item,
+        lambda: add_item_to_cart(item, current_user),
+    )
+
+async def add_item_to_cart(item: AddToCart, current_user: dict):
+    # Get product
+    if not ObjectId.is_valid(item.product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+    
+    product = await db.products.find_one({"_id": ObjectId(item.product_id)})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    if not product.get("is_available", False):
+        raise HTTPException(status_code=400, detail="Product is not available")
+    
+    if product.get("stock", 0) < item.quantity:
+        raise HTTPException(status_code=400, detail="Insufficient stock")
+    
+    # Get or create cart
+    cart = await db.carts.find_one({"user_id": current_user["_id"]})
+    if not cart:
+        cart = {
+            "user_id": current_user["_id"],
+            "items": [],
+            "total": 0.0,
+            "updated_at": datetime.utcnow(),
+            "expires_at": empty_cart_expiry()
+        }
+        result = await db.carts.insert_one(cart)
+        cart["_id"] = result.inserted_id
+    
+    # Check if item already in cart
+    items = cart.get("items", [])
+    found = False
+    for cart_item in items:
+        if cart_item["product_id"] == item.product_id:
+            cart_item["quantity"] += item.quantity
+            found = True
+            break
+    
+    if not found:
+        items.append({
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price": product["price"]
+        })
+    
+    # Calculate total
+    total = sum(i["quantity"] * i["price"] for i in items)
+    
+    # Update cart
+    await db.carts.update_one(
+        {"_id": cart["_id"]},
+        cart_update(items, total)
+    )
+    
+    cart["items"] = items
+    cart["total"] = total
+    cart["_id"] = str(cart["_id"])
+    
+    return cart
+
+@router.put("/cart/update")
+async def update_cart_item(update: UpdateCartItem, current_user: dict = Depends(get_current_user)):
+    cart = await db.carts.find_one({"user_id": current_user["_id"]})
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    
+    items = cart.get("items", [])
+    found = False
+    
+    for cart_item in items:
+        if cart_item["product_id"] == update.product_id:
+            if update.quantity <= 0:
+                items.remove(cart_item)
+            else:
+                cart_item["quantity"] = update.quantity
+            found = True
+            break
+    
+    if not found:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    
+    total = sum(i["quantity"] * i["price"] for i in items)
+    
+    await db.carts.update_one(
+        {"_id": cart["_id"]},
+        cart_update(items, total)
+    )
+    
+    cart["items"] = items
+    cart["total"] = total
+    cart["_id"] = str(cart["_id"])
+    
+    return cart
+
+@router.post("/cart/remove")
+async def remove_from_cart(item: RemoveFromCart, current_user: dict = Depends(get_current_user)):
+    cart = await db.carts.find_one({"user_id": current_user["_id"]})
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    
+    items = cart.get("items", [])
+    items = [i for i in items if i["product_id"] != item.product_id]
+    
+    total = sum(i["quantity"] * i["price"] for i in items)
+    
+    await db.carts.update_one(
+        {"_id": cart["_id"]},
+        cart_update(items, total)
+    )
+    
+    cart["items"] = items
+    cart["total"] = total
+    cart["_id"] = str(cart["_id"])
+    
+    return cart
+
+@router.delete("/cart/clear")
+async def clear_cart(current_user: dict = Depends(get_current_user)):
+    await db.carts.update_one(
+        {"user_id": current_user["_id"]},
+        cart_update([], 0.0)
+    )
+    return {"message": "Cart cleared"}
@@ -0,0 +1,354 @@
+"""
+Public catalog: products, vendor profiles and categories
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse
+import os
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+import logging
+
+from auth import get_current_user
+from autocomplete import AUTOCOMPLETE_LIMIT, autocomplete_index
+from cache import cache
+from database import db, catalog_db
+from delivery_fees import MAX_QUOTE_VENDORS, parse_fee_table, quote_delivery
+from delivery_zones import index_vendor, parse_polygon, vendors_delivering_to, zone_cells
+from geo import valid_point
+from models import VendorDeliveryFeesUpdate, VendorDeliveryZoneUpdate, VendorProfileCreate
+from read_models import ProductRead, list_response
+from schedule import ScheduleError, compile_schedule, is_open_at, open_now_filter
+from singleflight import group
+from uploads import UploadError, delete_upload, receive_upload, upload_path
+
+PRODUCT_CACHE_TTL = int(os.environ.get("PRODUCT_CACHE_TTL", "30"))
+VENDOR_CACHE_TTL = int(os.environ.get("VENDOR_CACHE_TTL", "60"))
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+product_flights = group("products")
+vendor_flights = group("vendors")
+
+# ============== PRODUCT ENDPOINTS ==============
+
+@router.get("/products")
+async def get_all_products(category: Optional[str] = None, search: Optional[str] = None, skip: int = 0, limit: int = 50):
+    """
+    Get all products (public or authenticated)
+    Query params: category, search, skip, limit
+    """
+    query = {"is_available": True}
+    
+    if category:
+        query["category"] = category
+    
+    if search:
+        query["name"] = {"$regex": search, "$options": "i"}
+    
+    products = await catalog_db.products.find(query).skip(skip).limit(limit).to_list(limit)
+    for product in products:
+        product["_id"] = str(product["_id"])
+    return list_response(ProductRead, products)
+
+@router.get("/search/autocomplete")
+async def autocomplete(q: str = Query(..., max_length=100), limit: int = Query(AUTOCOMPLETE_LIMIT, ge=1, le=50)):
+    """
+    Product name and category suggestions for a typed prefix, most popular first
+    Served from the in-memory index (see autocomplete.py), without a database query.
+    """
+    return {"suggestions": autocomplete_index.suggest(q, limit), "ready": autocomplete_index.ready}
+
+async def load_product(product_id: str):
+    cached = await cache.get(f"product:{product_id}")
+    if cached is not None:
+        return cached
+    
+    product = await catalog_db.products.find_one({"_id": ObjectId(product_id)})
+    if product:
+        product["_id"] = str(product["_id"])
+        await cache.set(f"product:{product_id}", product, PRODUCT_CACHE_TTL)
+    return product
+
+@router.get("/products/{product_id}")
+async def get_product_by_id(product_id: str):
+    """Get single product by ID"""
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+    
+    # Concurrent requests for the same product share one cache/DB lookup
+    product = await product_flights.do(product_id, lambda: load_product(product_id))
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+# ============== LEGACY VENDOR PROFILE ENDPOINTS (kept for backward compatibility) ==============
+
+@router.post("/vendors/profile")
+async def create_vendor_profile(profile: VendorProfileCreate, current_user: dict = Depends(get_current_user)):
+    # Check if profile exists
+    existing = await db.vendor_profiles.find_one({"user_id": current_user["_id"]})
+    if existing:
+        raise HTTPException(status_code=400, detail="Vendor profile already exists")
+    
+    profile_dict = profile.model_dump()
+    profile_dict["user_id"] = current_user["_id"]
+    profile_dict["is_approved"] = False
+    profile_dict["rating"] = 0.0
+    profile_dict["total_orders"] = 0
+    profile_dict["created_at"] = datetime.utcnow()
+    profile_dict["updated_at"] = profile_dict["created_at"]
+    try:
+        profile_dict.update(compile_schedule(profile_dict.get("working_hours")))
+    except ScheduleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    profile_dict["open_now"] = is_open_at(profile_dict)
+    try:
+        profile_dict["delivery_polygon"] = parse_polygon(profile_dict.get("delivery_polygon"))
+        profile_dict["delivery_fee_table"] = parse_fee_table(profile_dict.get("delivery_fee_table"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Cleared once the delivery zone is in the grid index
+    profile_dict["zone_dirty"] = True
+    
+    result = await db.vendor_profiles.insert_one(profile_dict)
+    try:
+        await index_vendor(profile_dict)
+        profile_dict.pop("zone_dirty")
+    except Exception as e:
+        # The periodic reindex picks it up
+        logger.error(f"Could not index delivery zone of vendor {result.inserted_id}: {str(e)}")
+    profile_dict["_id"] = str(result.inserted_id)
+    
+    return profile_dict
+
+@router.put("/vendors/profile/delivery-zone")
+async def update_vendor_delivery_zone(zone: VendorDeliveryZoneUpdate, current_user: dict = Depends(get_current_user)):
+    """
+    Move the store or change where it delivers (radius in km, or a polygon of [lat, lon] points)
+    Only the grid cells that enter or leave the zone are reindexed.
+    """
+    profile = await db.vendor_profiles.find_one({"user_id": current_user["_id"]})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Vendor profile not found")
+    
+    update = {k: v for k, v in zone.model_dump(exclude={"clear_polygon"}).items() if v is not None}
+    if zone.clear_polygon:
+        update["delivery_polygon"] = None
+    try:
+        if update.get("delivery_polygon") is not None:
+            update["delivery_polygon"] = parse_polygon(update["delivery_polygon"])
+        merged = {**profile, **update}
+        entries = zone_cells(merged)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    update["updated_at"] = datetime.utcnow()
+    await db.vendor_profiles.update_one({"_id": profile["_id"]}, {"$set": {**update, "zone_dirty": True}})
+    try:
+        result = await index_vendor(merged, entries)
+    except Exception as e:
+        logger.error(f"Could not index delivery zone of vendor {profile['_id']}: {str(e)}")
+        result = {"queued": True}
+    await cache.delete(f"vendor:{profile['_id']}")
+    await cache.delete("vendors:all")
+    return {"cells": len(entries), **result}
+
+@router.put("/vendors/profile/delivery-fees")
+async def update_vendor_delivery_fees(fees: VendorDeliveryFeesUpdate, current_user: dict = Depends(get_current_user)):
+    """
+    Set the fee per distance band and the free delivery threshold
+    Cached quotes keep the old fees for up to DELIVERY_QUOTE_CACHE_TTL seconds.
+    """
+    profile = await db.vendor_profiles.find_one({"user_id": current_user["_id"]}, {"_id": 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Vendor profile not found")
+    try:
+        table = parse_fee_table(fees.delivery_fee_table)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    update = {"delivery_fee_table": table, "free_delivery_over": fees.free_delivery_over, "updated_at": datetime.utcnow()}
+    await db.vendor_profiles.update_one({"_id": profile["_id"]}, {"$set": update})
+    await cache.delete(f"vendor:{profile['_id']}")
+    await cache.delete("vendors:all")
+    return {"delivery_fee_table": table, "free_delivery_over": fees.free_delivery_over}
+
+@router.get("/vendors/profile")
+async def get_vendor_profile_by_user(current_user: dict = Depends(get_current_user)):
+    profile = await db.vendor_profiles.find_one({"user_id": current_user["_id"]})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Vendor profile not found")
+    
+    profile["_id"] = str(profile["_id"])
+    return profile
+
+@router.put("/vendors/profile/{field}")
+async def upload_vendor_profile_file(
+    field: str,
+    request: Request,
+    encoding: Optional[str] = Query(None, pattern="^base64$"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Upload the store image or tax document (raw body or multipart "file")
+    Path: store-image or tax-document; encoding=base64 for base64 bodies.
+    """
+    targets = {"store-image": ("store_image", "images"), "tax-document": ("tax_document", "documents")}
+    if field not in targets:
+        raise HTTPException(status_code=404, detail="Not found")
+    profile_field, kind = targets[field]
+    
+    profile = await db.vendor_profiles.find_one({"user_id": current_user["_id"]}, {profile_field: 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Vendor profile not found")
+    
+    try:
+        stored = await receive_upload(request, kind, encoding)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    await db.vendor_profiles.update_one(
+        {"_id": profile["_id"]},
+        {"$set": {profile_field: stored.url, "updated_at": datetime.utcnow()}},
+    )
+    delete_upload(profile.get(profile_field))
+    await cache.delete(f"vendor:{profile['_id']}")
+    await cache.delete("vendors:all")
+    return stored.to_dict()
+
+@router.get("/vendors/deliverable")
+async def get_deliverable_vendors(latitude: float, longitude: float, open_now: bool = False):
+    """Approved vendors whose delivery zone covers the address, nearest first (one grid cell lookup)"""
+    if not valid_point(latitude, longitude):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    
+    candidates = await vendors_delivering_to(latitude, longitude)
+    if not candidates:
+        return []
+    by_id = {c["vendor_id"]: c for c in candidates}
+    query = {"_id": {"$in": [ObjectId(v) for v in by_id]}, "is_approved": True}
+    if open_now:
+        query.update(open_now_filter())
+    vendors = await catalog_db.vendor_profiles.find(query, {"tax_document": 0, "tax_number": 0}).to_list(len(by_id))
+    for vendor in vendors:
+        vendor["_id"] = str(vendor["_id"])
+        vendor["distance"] = by_id[vendor["_id"]]["distance_km"]
+        vendor["distance_band"] = by_id[vendor["_id"]]["band"]
+    vendors.sort(key=lambda v: v["distance"])
+    return vendors
+
+@router.get("/vendors/nearby")
+async def get_nearby_vendors(latitude: float, longitude: float, radius: float = 10.0, open_now: bool = False):
+    query = {"is_approved": True}
+    if open_now:
+        # Evaluated against the compiled opening intervals (indexed), not per vendor
+        query.update(open_now_filter())
+    # Simple distance calculation (for production, use geospatial queries)
+    vendors = await catalog_db.vendor_profiles.find(query).to_list(100)
+    
+    nearby_vendors = []
+    for vendor in vendors:
+        # Calculate simple distance (this is approximate)
+        lat_diff = abs(vendor["latitude"] - latitude)
+        lon_diff = abs(vendor["longitude"] - longitude)
+        distance = ((lat_diff ** 2) + (lon_diff ** 2)) ** 0.5
+        
+        if distance <= radius / 111:  # Rough conversion to degrees
+            vendor["_id"] = str(vendor["_id"])
+            vendor["distance"] = round(distance * 111, 2)  # Convert to km
+            nearby_vendors.append(vendor)
+    
+    # Sort by distance
+    nearby_vendors.sort(key=lambda x: x["distance"])
+    return nearby_vendors
+
+async def load_approved_vendors():
+    """Load approved vendor profiles into the shared cache"""
+    vendors = await catalog_db.vendor_profiles.find({"is_approved": True}).to_list(100)
+    for vendor in vendors:
+        vendor["_id"] = str(vendor["_id"])
+    await cache.set("vendors:all", vendors, VENDOR_CACHE_TTL)
+    return vendors
+
+async def get_approved_vendors():
+    vendors = await cache.get("vendors:all")
+    if vendors is None:
+        vendors = await load_approved_vendors()
+    return vendors
+
+@router.get("/vendors/all")
+async def get_all_vendors_list():
+    return await vendor_flights.do("all", get_approved_vendors)
+
+async def load_vendor(vendor_id: str):
+    cached = await cache.get(f"vendor:{vendor_id}")
+    if cached is not None:
+        return cached
+    
+    vendor = await catalog_db.vendor_profiles.find_one({"_id": ObjectId(vendor_id)})
+    if vendor:
+        vendor["_id"] = str(vendor["_id"])
+        await cache.set(f"vendor:{vendor_id}", vendor, VENDOR_CACHE_TTL)
+    return vendor
+
+@router.get("/vendors/{vendor_id}")
+async def get_vendor_by_id(vendor_id: str):
+    if not ObjectId.is_valid(vendor_id):
+        raise HTTPException(status_code=400, detail="Invalid vendor ID")
+    
+    vendor = await vendor_flights.do(vendor_id, lambda: load_vendor(vendor_id))
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    return vendor
+
+# ============== DELIVERY QUOTES ==============
+
+@router.get("/delivery/quote")
+async def get_delivery_quote(latitude: float, longitude: float, vendor_ids: Optional[str] = None):
+    """
+    Delivery fees to an address from many vendors at once
+    Query params: latitude, longitude, vendor_ids (comma separated; default every vendor delivering there)
+    """
+    if not valid_point(latitude, longitude):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    
+    if vendor_ids:
+        ids = [v.strip() for v in vendor_ids.split(",") if v.strip()]
+    else:
+        ids = [c["vendor_id"] for c in await vendors_delivering_to(latitude, longitude)]
+    if len(ids) > MAX_QUOTE_VENDORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUOTE_VENDORS} vendors per quote")
+    
+    quotes = await quote_delivery(latitude, longitude, ids)
+    return {"quotes": sorted(quotes.values(), key=lambda q: q["distance_km"])}
+
+# ============== UPLOADED FILES ==============
+
+@router.get("/uploads/images/{name}")
+async def get_uploaded_image(name: str):
+    path = upload_path("images", name)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    # Names are unique per upload, so the file never changes
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+# ============== CATEGORIES ==============
+
+CATEGORIES = [
+    {"id": "fruits", "name": "Fruits", "icon": "🍎"},
+    {"id": "vegetables", "name": "Vegetables", "icon": "🥕"},
+    {"id": "dairy", "name": "Dairy", "icon": "🥛"},
+    {"id": "meat", "name": "Meat & Poultry", "icon": "🍗"},
+    {"id": "bakery", "name": "Bakery", "icon": "🍞"},
+    {"id": "snacks", "name": "Snacks", "icon": "🍿"},
+    {"id": "beverages", "name": "Beverages", "icon": "🥤"},
+    {"id": "other", "name": "Other", "icon": "📦"},
+]
+
+@router.get("/categories")
+async def get_categories():
+    # Static list, served without touching MongoDB
+    return CATEGORIES
@@ -0,0 +1,118 @@
+"""
+Courier app: location/availability heartbeat and current assignment
+
+Couriers report their position with PUT /courier/status every minute or so;
+the dispatcher (dispatch.py) only considers couriers seen within
+COURIER_STALE_MINUTES and hands them batches they read from
+GET /courier/assignment.
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+from bson import ObjectId
+import logging
+
+from auth import require_role
+from database import db
+from models import CourierStatusUpdate
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# ============== COURIER ENDPOINTS ==============
+
+@router.put("/courier/status")
+async def update_courier_status(
+    status: CourierStatusUpdate,
+    current_user: dict = Depends(require_role(["courier"])),
+):
+    """
+    Report location and availability
+    Body: {latitude, longitude, available}
+    """
+    try:
+        now = datetime.utcnow()
+        await db.couriers.update_one(
+            {"_id": current_user["_id"]},
+            {
+                "$set": {
+                    "latitude": status.latitude,
+                    "longitude": status.longitude,
+                    "available": status.available,
+                    "last_seen_at": now,
+                    "updated_at": now,
+                },
+                # A running batch is kept; the dispatcher frees the courier when it is delivered
+                "$setOnInsert": {"active_batch_id": None, "created_at": now},
+            },
+            upsert=True,
+        )
+        courier = await db.couriers.find_one({"_id": current_user["_id"]}, {"active_batch_id": 1})
+        batch_id = courier.get("active_batch_id") if courier else None
+        return {
+            "available": status.available,
+            "active_batch_id": str(batch_id) if batch_id else None,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating courier status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/courier/assignment")
+async def get_courier_assignment(current_user: dict = Depends(require_role(["courier"]))):
+    """
+    Current batch: pickup vendor and drop-offs in route order (null when idle)
+    """
+    try:
+        courier = await db.couriers.find_one({"_id": current_user["_id"]}, {"active_batch_id": 1})
+        if not courier or not courier.get("active_batch_id"):
+            return {"assignment": None}
+        batch = await db.dispatch_batches.find_one({"_id": courier["active_batch_id"]})
+        if not batch:
+            return {"assignment": None}
+
+        orders = {
+            str(o["_id"]): o async for o in db.orders.find(
+                {"dispatch_batch_id": batch["_id"]},
+                {"status": 1, "delivery_address": 1, "phone": 1, "notes": 1, "total": 1},
+            )
+        }
+        stops = []
+        for stop in batch.get("stops", []):
+            order = orders.get(stop["order_id"], {})
+            stops.append({
+                "order_id": stop["order_id"],
+                "latitude": stop["latitude"],
+                "longitude": stop["longitude"],
+                "status": order.get("status"),
+                "delivery_address": order.get("delivery_address"),
+                "phone": order.get("phone"),
+                "notes": order.get("notes"),
+                "total": order.get("total"),
+            })
+
+        vendor = None
+        if ObjectId.is_valid(batch["vendor_id"]):
+            vendor = await db.vendor_profiles.find_one(
+                {"_id": ObjectId(batch["vendor_id"])},
+                {"store_name": 1, "address": 1, "latitude": 1, "longitude": 1, "phone": 1},
+            )
+        if vendor:
+            vendor["_id"] = str(vendor["_id"])
+
+        return {
+            "assignment": {
+                "batch_id": str(batch["_id"]),
+                "vendor_id": batch["vendor_id"],
+                "pickup": vendor,
+                "stops": stops,
+                "pickup_km": batch.get("pickup_km"),
+                "route_km": batch.get("route_km"),
+                "created_at": batch.get("created_at"),
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching courier assignment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
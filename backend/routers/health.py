@@ -0,0 +1,29 @@
+"""
+Liveness and metrics endpoints, mounted in every deployment
+"""
+from fastapi import APIRouter, HTTPException, Header
+import os
+from typing import Optional
+from datetime import datetime
+
+from metrics import metrics
+
+router = APIRouter()
+
+# ============== HEALTH CHECK ==============
+
+@router.get("/")
+async def root():
+    return {"message": "Manavım API v1.0", "status": "running"}
+
+@router.get("/health")
+async def health_check():
+    return {"status": "healthy", "timestamp": datetime.utcnow()}
+
+@router.get("/metrics")
+async def get_metrics(x_metrics_token: Optional[str] = Header(None)):
+    """Process metrics (connection pool statistics, counters). Guarded by METRICS_TOKEN when set."""
+    metrics_token = os.environ.get("METRICS_TOKEN")
+    if metrics_token and x_metrics_token != metrics_token:
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+    return await metrics.snapshot()
@@ -0,0 +1,356 @@
+"""
+Customer checkout and order history
+"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+import asyncio
+import logging
+
+from archive import archived_orders_for_user
+from auth import get_current_user, require_role
+from cache import cache
+from database import db, transaction
+from delivery_fees import order_delivery_fee, quote_delivery
+from idempotency import commit_response, run_idempotent
+from jobs import enqueue, job
+from lifecycle import checkouts
+from models import CartCheckout, OrderCreate
+from order_state import transition_orders
+from read_models import OrderRead, list_response
+from recommendations import record_orders
+from routers.cart import cart_update
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# ============== ORDER ENDPOINTS ==============
+
+@router.post("/orders")
+async def create_order(
+    order_data: OrderCreate,
+    current_user: dict = Depends(require_role(["customer"])),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Create new order (customer only)
+    Retries carrying the same Idempotency-Key header get the first response back
+    """
+    # Tracked so a graceful shutdown waits for the order and its stock updates
+    async with checkouts.track():
+        return await run_idempotent(
+            "orders.create",
+            current_user["_id"],
+            idempotency_key,
+            order_data,
+            lambda: place_order(order_data, current_user),
+        )
+
+async def place_order(order_data: OrderCreate, current_user: dict):
+    order_dict = order_data.model_dump()
+    # The delivery fee is priced here; the client's figure is only what it displayed
+    quote = (await quote_delivery(order_data.delivery_latitude, order_data.delivery_longitude, [order_data.vendor_id])).get(order_data.vendor_id)
+    if not quote:
+        raise HTTPException(status_code=400, detail="Vendor not found")
+    if not quote["deliverable"]:
+        raise HTTPException(status_code=400, detail="This vendor does not deliver to the address")
+    if order_data.delivery_type not in quote["delivery_options"]:
+        raise HTTPException(status_code=400, detail=f"Delivery type must be one of: {', '.join(quote['delivery_options'])}")
+    order_dict["delivery_fee"] = order_delivery_fee(quote, order_data.subtotal)
+    order_dict["total"] = round(order_data.subtotal + order_dict["delivery_fee"], 2)
+    order_dict["delivery_quote"] = {k: quote[k] for k in ("distance_km", "band", "base_fee", "surge_multiplier")}
+    order_dict["user_id"] = current_user["_id"]
+    order_dict["status"] = "pending"
+    order_dict["courier_id"] = None
+    order_dict["created_at"] = datetime.utcnow()
+    order_dict["updated_at"] = datetime.utcnow()
+    
+    async def insert_order():
+        result = await db.orders.insert_one(order_dict)
+        order_dict["_id"] = str(result.inserted_id)
+        response = {
+            "order_id": order_dict["_id"],
+            "status": order_dict["status"],
+            "delivery_fee": order_dict["delivery_fee"],
+            "total": order_dict["total"],
+            "created_at": order_dict["created_at"]
+        }
+        # The order exists now: a retry with the same Idempotency-Key must get it back, not place another
+        await commit_response(response)
+        return response
+    
+    # Shielded, so a cancelled request cannot leave an inserted order whose key was released
+    response = await asyncio.shield(insert_order())
+    
+    # Stock is part of the order itself, so it is decremented before responding (one round trip)
+    stock_updates = [
+        UpdateOne(
+            {"_id": ObjectId(item.product_id)},
+            {"$inc": {"stock": -item.quantity, "sold_count": item.quantity}, "$set": {"updated_at": order_dict["created_at"]}},
+        )
+        for item in order_data.items
+        if ObjectId.is_valid(item.product_id)
+    ]
+    if stock_updates:
+        try:
+            await db.products.bulk_write(stock_updates, ordered=False)
+        except Exception as e:
+            # Failing the request would not undo the order; the stock needs reconciling instead
+            logger.error(f"Could not update stock for order {order_dict['_id']}: {str(e)}")
+        # Product pages show stock, so drop them from the shared cache
+        await cache.delete(*(f"product:{item.product_id}" for item in order_data.items))
+    
+    # Everything else runs in the background job queue
+    try:
+        await enqueue("orders.placed", {
+            "order_id": order_dict["_id"],
+            "user_id": current_user["_id"],
+            "created_at": order_dict["created_at"],
+        })
+    except Exception as e:
+        # The order is committed; failing the request now would invite a duplicate order on retry
+        logger.error(f"Could not enqueue side effects for order {order_dict['_id']}: {str(e)}")
+    
+    return response
+
+@router.post("/orders/checkout")
+async def checkout_cart(
+    checkout: CartCheckout,
+    current_user: dict = Depends(require_role(["customer"])),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Order everything in the cart, one order per vendor under a shared checkout_id (customer only)
+    Retries carrying the same Idempotency-Key header get the first response back
+    """
+    async with checkouts.track():
+        return await run_idempotent(
+            "orders.checkout",
+            current_user["_id"],
+            idempotency_key,
+            checkout,
+            lambda: place_checkout(checkout, current_user),
+        )
+
+async def commit_checkout(cart: dict, orders: list, quantities: dict, now: datetime) -> list:
+    """
+    Empty the cart, take the stock and insert the orders; returns the order ids.
+    Runs in one transaction where the deployment supports it; on a standalone
+    server the stock and cart writes that already ran are undone if a later step fails.
+    """
+    async with transaction() as session:
+        # Only the cart that was priced: a double tap or an edit since then loses here
+        emptied = cart_update([], 0.0)
+        claimed = await db.carts.update_one(
+            {"_id": cart["_id"], "updated_at": cart.get("updated_at")}, emptied, session=session
+        )
+        if claimed.matched_count == 0:
+            raise HTTPException(status_code=409, detail="Cart changed or was already checked out, reload it and retry")
+        
+        names = {item["product_id"]: item["product_name"] for order in orders for item in order["items"]}
+        taken = {}
+        try:
+            for product_id, quantity in quantities.items():
+                # Conditional, so concurrent checkouts cannot take the same last units
+                result = await db.products.update_one(
+                    {"_id": ObjectId(product_id), "stock": {"$gte": quantity}},
+                    {"$inc": {"stock": -quantity, "sold_count": quantity}, "$set": {"updated_at": now}},
+                    session=session,
+                )
+                if result.matched_count == 0:
+                    raise HTTPException(status_code=400, detail=f"Insufficient stock for {names[product_id]}")
+                taken[product_id] = quantity
+            result = await db.orders.insert_many(orders, ordered=True, session=session)
+        except BaseException:
+            if session is None:
+                await asyncio.shield(undo_checkout(cart, emptied["$set"]["updated_at"], taken, now))
+            raise
+    return [str(oid) for oid in result.inserted_ids]
+
+async def undo_checkout(cart: dict, emptied_at: datetime, taken: dict, now: datetime):
+    """Give back stock taken by a failed checkout and refill its cart (unless the customer changed it since)"""
+    try:
+        if taken:
+            await db.products.bulk_write([
+                UpdateOne({"_id": ObjectId(pid)}, {"$inc": {"stock": qty, "sold_count": -qty}, "$set": {"updated_at": now}})
+                for pid, qty in taken.items()
+            ], ordered=False)
+        await db.carts.update_one(
+            {"_id": cart["_id"], "updated_at": emptied_at}, cart_update(cart["items"], cart.get("total", 0.0))
+        )
+    except Exception as e:
+        logger.error(f"Could not undo failed checkout of cart {cart['_id']} (stock taken: {taken}): {str(e)}")
+
+async def place_checkout(checkout: CartCheckout, current_user: dict):
+    """
+    Split the cart by vendor: cart, products ($in), quotes, then commit_checkout
+    (cart claim, one conditional stock update per product, one insert_many) and one job.
+    """
+    cart = await db.carts.find_one({"user_id": current_user["_id"]}, {"items": 1, "total": 1, "updated_at": 1})
+    cart_items = (cart or {}).get("items") or []
+    if not cart_items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    
+    quantities = {}
+    for item in cart_items:
+        if not ObjectId.is_valid(item["product_id"]):
+            raise HTTPException(status_code=400, detail=f"Invalid product ID {item['product_id']}")
+        quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+    products = {
+        str(p["_id"]): p async for p in db.products.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in quantities]}},
+            {"name": 1, "price": 1, "vendor_id": 1, "stock": 1, "is_available": 1},
+        )
+    }
+    
+    # Group by vendor at current prices
+    by_vendor = {}
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Product {product_id} no longer exists")
+        if not product.get("is_available", False):
+            raise HTTPException(status_code=400, detail=f"{product['name']} is not available")
+        if product.get("stock", 0) < quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for {product['name']}")
+        by_vendor.setdefault(product["vendor_id"], []).append({
+            "product_id": product_id,
+            "product_name": product["name"],
+            "quantity": quantity,
+            "price": product["price"],
+            "total": round(product["price"] * quantity, 2),
+        })
+    
+    quotes = await quote_delivery(checkout.delivery_latitude, checkout.delivery_longitude, list(by_vendor))
+    checkout_id = str(ObjectId())
+    now = datetime.utcnow()
+    orders = []
+    for vendor_id, items in by_vendor.items():
+        quote = quotes.get(vendor_id)
+        if not quote:
+            raise HTTPException(status_code=400, detail=f"Vendor {vendor_id} not found")
+        if not quote["deliverable"]:
+            raise HTTPException(status_code=400, detail=f"Vendor {vendor_id} does not deliver to the address")
+        if checkout.delivery_type not in quote["delivery_options"]:
+            raise HTTPException(status_code=400, detail=f"Vendor {vendor_id} does not offer {checkout.delivery_type} delivery")
+        subtotal = round(sum(i["total"] for i in items), 2)
+        delivery_fee = order_delivery_fee(quote, subtotal)
+        orders.append({
+            **checkout.model_dump(),
+            "vendor_id": vendor_id,
+            "items": items,
+            "subtotal": subtotal,
+            "delivery_fee": delivery_fee,
+            "total": round(subtotal + delivery_fee, 2),
+            "delivery_quote": {k: quote[k] for k in ("distance_km", "band", "base_fee", "surge_multiplier")},
+            "checkout_id": checkout_id,
+            "user_id": current_user["_id"],
+            "status": "pending",
+            "courier_id": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+    
+    order_ids = await commit_checkout(cart, orders, quantities, now)
+    response = {
+        "checkout_id": checkout_id,
+        "orders": [
+            {
+                "order_id": order_id,
+                "vendor_id": order["vendor_id"],
+                "status": order["status"],
+                "subtotal": order["subtotal"],
+                "delivery_fee": order["delivery_fee"],
+                "total": order["total"],
+            }
+            for order_id, order in zip(order_ids, orders)
+        ],
+        "total": round(sum(o["total"] for o in orders), 2),
+        "created_at": now,
+    }
+    await commit_response(response)
+    await cache.delete(*(f"product:{product_id}" for product_id in quantities))
+    
+    try:
+        await enqueue("orders.placed", {
+            "order_ids": order_ids,
+            "checkout_id": checkout_id,
+            "user_id": current_user["_id"],
+            "created_at": now,
+        })
+    except Exception as e:
+        logger.error(f"Could not enqueue side effects for checkout {checkout_id}: {str(e)}")
+    
+    return response
+
+@job("orders.placed")
+async def order_placed(payload: dict):
+    """Post-order side effects (order_id, or order_ids for a cart checkout); must stay safe to run more than once"""
+    # Only clear a cart not touched since the order, so items added afterwards survive
+    # (a cart checkout has already emptied it, so this is a no-op then)
+    await db.carts.update_one(
+        {"user_id": payload["user_id"], "updated_at": {"$lte": payload["created_at"]}},
+        cart_update([], 0.0)
+    )
+    # Counted at most once per order however often this runs
+    await record_orders(payload.get("order_ids") or [payload["order_id"]])
+
+@router.get("/orders/my")
+async def get_my_orders(
+    before: Optional[datetime] = Query(None, description="Only orders created before this time (the oldest created_at of the previous page)"),
+    current_user: dict = Depends(require_role(["customer"]))
+):
+    """
+    Get current user's orders (customer only), newest first, 100 per page
+    """
+    query = {"user_id": current_user["_id"]}
+    if before is not None:
+        query["created_at"] = {"$lt": before}
+    orders = await db.orders.find(query).sort("created_at", -1).to_list(100)
+    for order in orders:
+        order["_id"] = str(order["_id"])
+    # Older history lives in the Parquet archive; only read it when the client pages past the live orders
+    # (or has no live orders left, so there is no cursor to page with)
+    if before is not None or not orders:
+        orders.extend(await archived_orders_for_user(current_user["_id"], 100 - len(orders), before))
+    return list_response(OrderRead, orders)
+
+# ============== LEGACY ORDER ENDPOINTS (kept for backward compatibility) ==============
+
+@router.get("/orders/{order_id}")
+async def get_order_by_id(order_id: str, current_user: dict = Depends(get_current_user)):
+    """Get single order by ID (legacy endpoint)"""
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=400, detail="Invalid order ID")
+    
+    order = await db.orders.find_one({"_id": ObjectId(order_id)})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    # Check authorization
+    if order["user_id"] != current_user["_id"]:
+        # Allow vendor/admin to view
+        if current_user.get("role") not in ["vendor", "admin"]:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    
+    order["_id"] = str(order["_id"])
+    return order
+
+@router.put("/orders/{order_id}/status")
+async def update_order_status(order_id: str, status: str, current_user: dict = Depends(require_role(["vendor", "admin"]))):
+    """Update order status (vendor/admin only), along the allowed transitions; vendors only for their own products"""
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=400, detail="Invalid order ID")
+    
+    result = (await transition_orders(
+        current_user["_id"], [(order_id, status)], as_admin=current_user.get("role") == "admin"
+    ))[0]
+    if result["result"] == "error":
+        status_code = {"invalid": 400, "not_found": 404}.get(result["code"], 409)
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    
+    order = await db.orders.find_one({"_id": ObjectId(order_id)})
+    order["_id"] = str(order["_id"])
+    return order
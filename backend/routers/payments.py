@@ -0,0 +1,64 @@
+"""
+Payment endpoints (enabled with ENABLE_PAYMENTS=1)
+
+The checkout integration depends on packages that are not installed yet, so
+only the models are live; the endpoints stay commented out until then.
+"""
+from typing import Dict
+
+from fastapi import APIRouter
+from pydantic import BaseModel
+
+router = APIRouter(prefix="/payments")
+
+# ============== PAYMENT MODELS ==============
+
+class PaymentPackage(BaseModel):
+    id: str
+    name: str
+    amount: float
+    currency: str = "try"
+    description: str
+
+class CheckoutRequest(BaseModel):
+    package_id: str
+    origin_url: str
+
+class CheckoutResponse(BaseModel):
+    url: str
+    session_id: str
+
+class PaymentStatusResponse(BaseModel):
+    status: str
+    payment_status: str
+    amount_total: float
+    currency: str
+    metadata: Dict[str, str]
+
+# ============== PAYMENT ENDPOINTS ==============
+# COMMENTED OUT DUE TO MISSING DEPENDENCIES
+
+# # Define fixed payment packages (SECURITY: Never accept amounts from frontend)
+# PAYMENT_PACKAGES = {
+#     "small": PaymentPackage(
+#         id="small",
+#         name="Küçük Paket",
+#         amount=50.00,
+#         currency="try",
+#         description="50 TL değerinde alışveriş"
+#     ),
+#     "medium": PaymentPackage(
+#         id="medium",
+#         name="Orta Paket",
+#         amount=100.00,
+#         currency="try",
+#         description="100 TL değerinde alışveriş"
+#     ),
+#     "large": PaymentPackage(
+#         id="large",
+#         name="Büyük Paket",
+#         amount=200.00,
+#         currency="try",
+#         description="200 TL değerinde alışveriş"
+#     )
+# }
@@ -0,0 +1,40 @@
+"""
+Personal "buy again" and "frequently bought together" lists
+
+Both are one read of a list precomputed by recommendations.py.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+import logging
+
+from auth import require_role
+from recommendations import BUY_AGAIN_SIZE, TOGETHER_SIZE, bought_together, buy_again
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# ============== RECOMMENDATION ENDPOINTS ==============
+
+@router.get("/recommendations/buy-again")
+async def get_buy_again(
+    limit: int = Query(BUY_AGAIN_SIZE, ge=1, le=BUY_AGAIN_SIZE),
+    current_user: dict = Depends(require_role(["customer"])),
+):
+    """
+    Products the customer orders often and recently, best first (customer only)
+    """
+    try:
+        return {"items": await buy_again(current_user["_id"], limit)}
+    except Exception as e:
+        logger.error(f"Error loading buy again list: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/recommendations/together/{product_id}")
+async def get_bought_together(product_id: str, limit: int = Query(TOGETHER_SIZE, ge=1, le=TOGETHER_SIZE)):
+    """
+    Products most often ordered together with `product_id`
+    """
+    try:
+        return {"product_id": product_id, "items": await bought_together(product_id, limit)}
+    except Exception as e:
+        logger.error(f"Error loading bought together list: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
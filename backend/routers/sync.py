@@ -0,0 +1,49 @@
+"""
+Delta sync for offline-first mobile clients
+
+GET /sync returns what changed since the client's watermark; see sync.py.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+import logging
+from typing import Optional
+
+from auth import get_current_user
+from read_models import SyncRead, json_response
+from sync import SYNC_COLLECTIONS, SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT, InvalidWatermark, sync_changes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ============== SYNC ENDPOINTS ==============
+
+@router.get("/sync")
+async def sync(
+    since: Optional[str] = None,
+    collections: Optional[str] = None,
+    limit: int = Query(SYNC_DEFAULT_LIMIT, ge=1, le=SYNC_MAX_LIMIT),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Changes since `since` (the watermark of the previous response; omit for a full sync)
+    Query params: since, collections (comma separated, default all), limit (per collection)
+
+    Call again with the returned watermark while has_more is true. When reset is
+    true the watermark was too old: drop local data and apply the response as a full sync.
+    """
+    try:
+        names = SYNC_COLLECTIONS
+        if collections:
+            names = [c.strip() for c in collections.split(",") if c.strip()]
+            unknown = [c for c in names if c not in SYNC_COLLECTIONS]
+            if unknown or not names:
+                raise HTTPException(status_code=400, detail=f"Unknown collection(s): {', '.join(unknown)}")
+        result = await sync_changes(current_user["_id"], since, names, limit)
+        return json_response(SyncRead, result)
+    except InvalidWatermark as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error syncing changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,593 @@
+"""
+Vendor panel API (vendor accounts with "vendor" type tokens)
+
+Product listing/creation/update and order listing live under /vendor/panel/...;
+the same paths under /vendor/... belong to the role based vendor router and
+used to shadow these handlers.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from analytics import load_order_lines, period_totals, sales_report
+from auth import create_access_token, get_password_hash, verify_password, verify_vendor_token
+from cache import cache
+from catalog_import import ImportFormatError, import_products
+from database import db, reporting_db
+from events import PRODUCTS_CHANGED, bus
+from models import (
+    VendorDashboardResponse,
+    VendorLogin,
+    VendorOrderStatusBatch,
+    VendorOrderStatusUpdate,
+    VendorProductCreate,
+    VendorProductUpdate,
+)
+from order_state import transition_orders
+from read_models import VendorProductRead, json_response, list_response
+from schedule import ScheduleError, compile_schedule, compile_stored_schedule, is_open_at
+from sync import record_deletion
+from uploads import UploadError, delete_upload, receive_upload
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ============== VENDOR PANEL ENDPOINTS ==============
+
+@router.post("/vendor/register")
+async def vendor_register(vendor_data: VendorLogin):
+    """Vendor registration endpoint"""
+    try:
+        # Check if vendor already exists
+        existing_vendor = await db.vendors.find_one({"email": vendor_data.email})
+        if existing_vendor:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Hash password
+        hashed_password = get_password_hash(vendor_data.password)
+        
+        # Create vendor
+        new_vendor = {
+            "email": vendor_data.email,
+            "password": hashed_password,
+            "name": vendor_data.email.split('@')[0],  # Default name from email
+            "phone": "",
+            "address": "",
+            "description": "",
+            "rating": 0.0,
+            "is_open": True,
+            "created_at": datetime.utcnow()
+        }
+        # No working hours yet: open around the clock until the vendor sets them
+        new_vendor.update(compile_schedule(None))
+        new_vendor["open_now"] = is_open_at(new_vendor)
+        
+        result = await db.vendors.insert_one(new_vendor)
+        new_vendor["_id"] = result.inserted_id
+        
+        # Create access token
+        access_token = create_access_token(data={
+            "sub": str(result.inserted_id),
+            "email": vendor_data.email,
+            "type": "vendor"
+        })
+        
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "vendor": {
+                "_id": str(result.inserted_id),
+                "name": new_vendor["name"],
+                "email": new_vendor["email"],
+                "phone": new_vendor.get("phone", ""),
+                "address": new_vendor.get("address", "")
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Registration error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/vendor/login")
+async def vendor_login(vendor_data: VendorLogin):
+    """Vendor login endpoint"""
+    try:
+        # Find vendor by email
+        vendor = await db.vendors.find_one({"email": vendor_data.email})
+        
+        if not vendor:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        # Verify password (assuming vendors collection has password field)
+        if not vendor.get("password"):
+            # If vendor doesn't have password, create one (temporary solution)
+            hashed_password = get_password_hash("vendor123")
+            await db.vendors.update_one(
+                {"_id": vendor["_id"]},
+                {"$set": {"password": hashed_password}}
+            )
+            vendor["password"] = hashed_password
+        
+        if not verify_password(vendor_data.password, vendor["password"]):
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        # Create access token
+        access_token = create_access_token(data={
+            "sub": str(vendor["_id"]),
+            "email": vendor["email"],
+            "type": "vendor"
+        })
+        
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "vendor": {
+                "_id": str(vendor["_id"]),
+                "name": vendor.get("name"),
+                "email": vendor.get("email"),
+                "address": vendor.get("address"),
+                "phone": vendor.get("phone")
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in vendor login: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vendor/dashboard", response_model=VendorDashboardResponse)
+async def get_vendor_dashboard(vendor = Depends(verify_vendor_token)):
+    """Get vendor dashboard statistics"""
+    try:
+        vendor_id = str(vendor["_id"])
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        week_ago = today - timedelta(days=7)
+        month_ago = today - timedelta(days=30)
+        
+        # Get all products for this vendor
+        products = await reporting_db.products.find(
+            {"vendor_id": vendor_id}, {"is_available": 1, "stock": 1}
+        ).to_list(None)
+        total_products = len(products)
+        active_products = len([p for p in products if p.get("is_available", True)])
+        low_stock_products = len([p for p in products if p.get("stock", 0) < 10])
+        
+        # Orders that contain vendor's products (indexed on items.product_id)
+        vendor_product_ids = [str(p["_id"]) for p in products]
+        vendor_orders = {"items.product_id": {"$in": vendor_product_ids}}
+        
+        # Today/week/month stats over this vendor's order lines of the last 30 days
+        lines = await load_order_lines(month_ago, vendor_product_ids, include_archive=False)
+        periods = await asyncio.to_thread(period_totals, lines, {"today": today, "week": week_ago, "month": month_ago})
+        total_orders_today = periods["today"]["orders"]
+        total_revenue_today = periods["today"]["revenue"]
+        total_orders_week = periods["week"]["orders"]
+        total_revenue_week = periods["week"]["revenue"]
+        total_orders_month = periods["month"]["orders"]
+        total_revenue_month = periods["month"]["revenue"]
+        pending_orders = await reporting_db.orders.count_documents({**vendor_orders, "status": "pending"})
+        
+        # Recent orders (last 5)
+        recent_orders = await reporting_db.orders.find(vendor_orders).sort("created_at", -1).limit(5).to_list(5)
+        recent_orders_formatted = []
+        for order in recent_orders:
+            recent_orders_formatted.append({
+                "_id": str(order["_id"]),
+                "order_number": order.get("order_number", "N/A"),
+                "customer_name": order.get("customer_name", "Unknown"),
+                "total": order.get("total", 0),
+                "status": order.get("status", "pending"),
+                "created_at": order.get("created_at", datetime.utcnow()).isoformat()
+            })
+        
+        return json_response(VendorDashboardResponse, {
+            "total_orders_today": total_orders_today,
+            "total_revenue_today": total_revenue_today,
+            "pending_orders": pending_orders,
+            "total_products": total_products,
+            "active_products": active_products,
+            "low_stock_products": low_stock_products,
+            "total_orders_week": total_orders_week,
+            "total_revenue_week": total_revenue_week,
+            "total_orders_month": total_orders_month,
+            "total_revenue_month": total_revenue_month,
+            "recent_orders": recent_orders_formatted
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting vendor dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vendor/panel/reports/sales")
+async def get_vendor_sales_report(days: int = Query(30, ge=1, le=730), vendor = Depends(verify_vendor_token)):
+    """Sales report for this vendor's products: top sellers, categories, hours, weekdays, AOV"""
+    try:
+        return await sales_report(days, str(vendor["_id"]))
+    except Exception as e:
+        logger.error(f"Error building vendor sales report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vendor/panel/products")
+async def get_vendor_all_products(vendor = Depends(verify_vendor_token)):
+    """Get all products for vendor (vendor API)"""
+    try:
+        vendor_id = str(vendor["_id"])
+        products = await db.products.find({"vendor_id": vendor_id}).to_list(None)
+        
+        # Format products
+        formatted_products = []
+        for product in products:
+            formatted_products.append({
+                "_id": str(product["_id"]),
+                "name": product.get("name"),
+                "category": product.get("category"),
+                "price": product.get("price"),
+                "unit": product.get("unit"),
+                "stock": product.get("stock", 0),
+                "description": product.get("description"),
+                "image": product.get("image"),
+                "discount_percentage": product.get("discount_percentage", 0),
+                "is_available": product.get("is_available", True),
+                "created_at": product.get("created_at", datetime.utcnow()).isoformat()
+            })
+        
+        return list_response(VendorProductRead, formatted_products)
+        
+    except Exception as e:
+        logger.error(f"Error getting vendor products: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/vendor/panel/products")
+async def create_vendor_product(product_data: VendorProductCreate, vendor = Depends(verify_vendor_token)):
+    """Create new product for vendor"""
+    try:
+        vendor_id = str(vendor["_id"])
+        
+        product = {
+            "vendor_id": vendor_id,
+            "name": product_data.name,
+            "category": product_data.category,
+            "price": product_data.price,
+            "unit": product_data.unit,
+            "stock": product_data.stock,
+            "description": product_data.description,
+            "image": product_data.image,
+            "discount_percentage": product_data.discount_percentage,
+            "is_available": product_data.is_available,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        
+        result = await db.products.insert_one(product)
+        product["_id"] = str(result.inserted_id)
+        await bus.publish(PRODUCTS_CHANGED, {"product_ids": [product["_id"]]})
+        
+        return product
+        
+    except Exception as e:
+        logger.error(f"Error creating product: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/vendor/panel/products/bulk")
+async def bulk_import_vendor_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    dry_run: bool = False,
+    vendor = Depends(verify_vendor_token)
+):
+    """
+    Create/update many products from a CSV or NDJSON upload (raw body or multipart "file")
+    Rows with an id update that product, rows without one create a product.
+    Returns a per-row report; dry_run=true only validates.
+    """
+    try:
+        vendor_id = str(vendor["_id"])
+        content_type = request.headers.get("content-type", "")
+        
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Missing file field")
+            filename = (upload.filename or "").lower()
+            fmt = format or ("ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv")
+            
+            async def chunks():
+                while data := await upload.read(64 * 1024):
+                    yield data
+            body = chunks()
+        else:
+            fmt = format or ("ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv")
+            body = request.stream()
+        
+        report = await import_products(vendor_id, body, fmt, dry_run)
+        logger.info(
+            f"Bulk import for vendor {vendor_id}: {report['created']} created, "
+            f"{report['updated']} updated, {report['error']} failed"
+        )
+        return report
+        
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing products: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/vendor/panel/products/{product_id}/image")
+async def upload_vendor_product_image(
+    product_id: str,
+    request: Request,
+    encoding: Optional[str] = Query(None, pattern="^base64$"),
+    vendor = Depends(verify_vendor_token)
+):
+    """
+    Replace a product's image (raw image body or multipart "file", streamed to disk)
+    encoding=base64 accepts a base64 body or data: URL instead of raw bytes.
+    """
+    try:
+        vendor_id = str(vendor["_id"])
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(status_code=400, detail="Invalid product ID")
+        
+        product = await db.products.find_one({"_id": ObjectId(product_id), "vendor_id": vendor_id}, {"image": 1})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        stored = await receive_upload(request, "images", encoding)
+        await db.products.update_one(
+            {"_id": ObjectId(product_id)},
+            {"$set": {"image": stored.url, "updated_at": datetime.utcnow()}}
+        )
+        delete_upload(product.get("image"))
+        await cache.delete(f"product:{product_id}")
+        
+        return stored.to_dict()
+        
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading product image: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/vendor/panel/products/{product_id}")
+async def update_vendor_product(
+    product_id: str,
+    product_data: VendorProductUpdate,
+    vendor = Depends(verify_vendor_token)
+):
+    """Update vendor product"""
+    try:
+        vendor_id = str(vendor["_id"])
+        
+        # Verify product belongs to vendor
+        product = await db.products.find_one({"_id": ObjectId(product_id), "vendor_id": vendor_id})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        # Build update dict
+        update_data = {}
+        if product_data.name is not None:
+            update_data["name"] = product_data.name
+        if product_data.category is not None:
+            update_data["category"] = product_data.category
+        if product_data.price is not None:
+            update_data["price"] = product_data.price
+        if product_data.unit is not None:
+            update_data["unit"] = product_data.unit
+        if product_data.stock is not None:
+            update_data["stock"] = product_data.stock
+        if product_data.description is not None:
+            update_data["description"] = product_data.description
+        if product_data.image is not None:
+            update_data["image"] = product_data.image
+        if product_data.discount_percentage is not None:
+            update_data["discount_percentage"] = product_data.discount_percentage
+        if product_data.is_available is not None:
+            update_data["is_available"] = product_data.is_available
+        
+        update_data["updated_at"] = datetime.utcnow()
+        
+        await db.products.update_one(
+            {"_id": ObjectId(product_id)},
+            {"$set": update_data}
+        )
+        await cache.delete(f"product:{product_id}")
+        await bus.publish(PRODUCTS_CHANGED, {"product_ids": [product_id]})
+        
+        updated_product = await db.products.find_one({"_id": ObjectId(product_id)})
+        updated_product["_id"] = str(updated_product["_id"])
+        
+        return updated_product
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating product: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/vendor/products/{product_id}")
+async def delete_vendor_product(product_id: str, vendor = Depends(verify_vendor_token)):
+    """Delete vendor product"""
+    try:
+        vendor_id = str(vendor["_id"])
+        
+        # Verify product belongs to vendor
+        product = await db.products.find_one({"_id": ObjectId(product_id), "vendor_id": vendor_id})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        await db.products.delete_one({"_id": ObjectId(product_id)})
+        await record_deletion("products", product_id, owner=vendor_id)
+        delete_upload(product.get("image"))
+        await cache.delete(f"product:{product_id}")
+        await bus.publish(PRODUCTS_CHANGED, {"product_ids": [product_id]})
+        
+        return {"message": "Product deleted successfully"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting product: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vendor/panel/orders")
+async def get_vendor_all_orders(vendor = Depends(verify_vendor_token), status: Optional[str] = None):
+    """Get all orders for vendor (vendor API)"""
+    try:
+        vendor_id = str(vendor["_id"])
+        
+        # Get vendor's products
+        products = await db.products.find({"vendor_id": vendor_id}).to_list(None)
+        vendor_product_ids = [str(p["_id"]) for p in products]
+        
+        # Get all orders
+        all_orders = await db.orders.find().to_list(None)
+        
+        # Filter orders containing vendor's products
+        vendor_orders = []
+        for order in all_orders:
+            for item in order.get("items", []):
+                if item.get("product_id") in vendor_product_ids:
+                    # Filter by status if provided
+                    if status is None or order.get("status") == status:
+                        vendor_orders.append(order)
+                    break
+        
+        # Format orders
+        formatted_orders = []
+        for order in vendor_orders:
+            formatted_orders.append({
+                "_id": str(order["_id"]),
+                "order_number": order.get("order_number", "N/A"),
+                "customer_name": order.get("customer_name", "Unknown"),
+                "customer_phone": order.get("customer_phone", "N/A"),
+                "delivery_address": order.get("delivery_address", {}),
+                "items": order.get("items", []),
+                "total": order.get("total", 0),
+                "status": order.get("status", "pending"),
+                "notes": order.get("notes", ""),
+                "created_at": order.get("created_at", datetime.utcnow()).isoformat(),
+                "updated_at": order.get("updated_at", datetime.utcnow()).isoformat()
+            })
+        
+        # Sort by created_at descending
+        formatted_orders.sort(key=lambda x: x["created_at"], reverse=True)
+        
+        return formatted_orders
+        
+    except Exception as e:
+        logger.error(f"Error getting vendor orders: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/vendor/orders/{order_id}/status")
+async def update_vendor_order_status(
+    order_id: str,
+    status_data: VendorOrderStatusUpdate,
+    vendor = Depends(verify_vendor_token)
+):
+    """Update order status (only orders containing this vendor's products, along the allowed transitions)"""
+    try:
+        result = (await transition_orders(str(vendor["_id"]), [(order_id, status_data.status)]))[0]
+        if result["result"] == "error":
+            status_code = {"invalid": 400, "not_found": 404}.get(result["code"], 409)
+            raise HTTPException(status_code=status_code, detail=result["error"])
+        
+        return {"message": "Order status updated successfully", "status": result["status"]}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating order status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/vendor/panel/orders/status")
+async def update_vendor_order_statuses(batch: VendorOrderStatusBatch, vendor = Depends(verify_vendor_token)):
+    """
+    Advance many orders at once; each entry succeeds or fails on its own
+    """
+    try:
+        results = await transition_orders(str(vendor["_id"]), [(u.order_id, u.status) for u in batch.updates])
+        updated = sum(1 for r in results if r["result"] == "updated")
+        return {"updated": updated, "failed": len(results) - updated, "results": results}
+        
+    except Exception as e:
+        logger.error(f"Error updating order statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vendor/profile")
+async def get_current_vendor_profile(vendor = Depends(verify_vendor_token)):
+    """Get current vendor profile (vendor API)"""
+    try:
+        return {
+            "_id": str(vendor["_id"]),
+            "name": vendor.get("name"),
+            "email": vendor.get("email"),
+            "phone": vendor.get("phone"),
+            "address": vendor.get("address"),
+            "description": vendor.get("description"),
+            "rating": vendor.get("rating", 0),
+            "working_hours": vendor.get("working_hours", {}),
+            "is_open": vendor.get("is_open", True),
+            "open_now": vendor.get("open_now", vendor.get("is_open", True))
+        }
+    except Exception as e:
+        logger.error(f"Error getting vendor profile: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/vendor/profile")
+async def update_vendor_profile(profile_data: Dict[str, Any], vendor = Depends(verify_vendor_token)):
+    """Update vendor profile"""
+    try:
+        vendor_id = vendor["_id"]
+        
+        # Build update dict
+        update_data = {}
+        allowed_fields = ["name", "phone", "address", "description", "working_hours", "is_open"]
+        
+        for field in allowed_fields:
+            if field in profile_data:
+                update_data[field] = profile_data[field]
+        
+        if "working_hours" in update_data:
+            update_data.update(compile_schedule(update_data["working_hours"]))
+        elif "open_intervals" not in vendor:
+            # Same fallback as the background compiler, so old hours never fail an unrelated change
+            update_data.update(compile_stored_schedule(vendor.get("working_hours"), str(vendor_id)))
+        if "open_intervals" in update_data or "is_open" in update_data:
+            update_data["open_now"] = is_open_at({**vendor, **update_data})
+        update_data["updated_at"] = datetime.utcnow()
+        
+        await db.vendors.update_one(
+            {"_id": vendor_id},
+            {"$set": update_data}
+        )
+        
+        updated_vendor = await db.vendors.find_one({"_id": vendor_id})
+        
+        return {
+            "_id": str(updated_vendor["_id"]),
+            "name": updated_vendor.get("name"),
+            "email": updated_vendor.get("email"),
+            "phone": updated_vendor.get("phone"),
+            "address": updated_vendor.get("address"),
+            "description": updated_vendor.get("description"),
+            "working_hours": updated_vendor.get("working_hours", {}),
+            "is_open": updated_vendor.get("is_open", True),
+            "open_now": updated_vendor.get("open_now", updated_vendor.get("is_open", True))
+        }
+        
+    except ScheduleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating vendor profile: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,192 @@
+"""
+Vendor opening hours compiled to weekly minute intervals
+
+``compile_schedule`` turns working hours, either the per-day maps of
+``VendorWorkingHours`` ({"monday": {"open": "09:00", "close": "22:00"}, ...,
+"holidays": ["2025-04-23"]}) or the "09:00-22:00" string of vendor profiles,
+into sorted, merged [start, end) minute-of-week intervals (Monday 00:00 is 0,
+in SCHEDULE_TIMEZONE). They are stored on the vendor as ``open_intervals``
+with a multikey index, so "open right now" is one indexed ``$elemMatch``
+(``open_now_filter``) instead of evaluating every schedule.
+
+``refresh_open_flags`` keeps the stored ``open_now`` flag in step with the
+intervals, flipping it within a scheduler tick of each boundary. The
+vendor-set ``is_open`` switch still overrides the schedule (closed for the
+day, on holiday).
+"""
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from database import db
+from metrics import metrics
+from scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_TIMEZONE = ZoneInfo(os.environ.get("SCHEDULE_TIMEZONE", "Europe/Istanbul"))
+SCHEDULE_VERSION = 1
+COMPILE_BATCH_SIZE = 500
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+ALWAYS_OPEN = [{"start": 0, "end": MINUTES_PER_WEEK}]
+
+# Collections holding vendors with working hours
+SCHEDULED_COLLECTIONS = ["vendors", "vendor_profiles"]
+
+TIME_PATTERN = re.compile(r"^([01]?\d|2[0-4]):([0-5]\d)$")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ScheduleError(ValueError):
+    pass
+
+# ============== COMPILING ==============
+
+
+def parse_time(value: str) -> int:
+    """Minutes since midnight for "HH:MM" ("24:00" is end of day)"""
+    match = TIME_PATTERN.match(str(value).strip())
+    if not match:
+        raise ScheduleError(f"Invalid time {value!r}, expected HH:MM")
+    minutes = int(match.group(1)) * 60 + int(match.group(2))
+    if minutes > MINUTES_PER_DAY:
+        raise ScheduleError(f"Invalid time {value!r}")
+    return minutes
+
+
+def _day_spans(day_index: int, open_at: int, close_at: int) -> List[Tuple[int, int]]:
+    start = day_index * MINUTES_PER_DAY + open_at
+    if close_at == open_at:
+        return []
+    if close_at < open_at:
+        # Past midnight: runs into the next day (Sunday night wraps to Monday)
+        close_at += MINUTES_PER_DAY
+    end = day_index * MINUTES_PER_DAY + close_at
+    if end <= MINUTES_PER_WEEK:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Dict[str, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [{"start": start, "end": end} for start, end in merged]
+
+
+def compile_schedule(working_hours: Any) -> Dict[str, Any]:
+    """Fields to store on the vendor for `working_hours`; missing hours mean always open"""
+    if not working_hours:
+        return {"open_intervals": ALWAYS_OPEN, "closed_dates": [], "schedule_version": SCHEDULE_VERSION}
+
+    spans: List[Tuple[int, int]] = []
+    closed_dates: List[str] = []
+    if isinstance(working_hours, str):
+        # Same hours every day
+        open_str, sep, close_str = working_hours.partition("-")
+        if not sep:
+            raise ScheduleError(f"Invalid working hours {working_hours!r}, expected HH:MM-HH:MM")
+        open_at, close_at = parse_time(open_str), parse_time(close_str)
+        for day_index in range(7):
+            spans.extend(_day_spans(day_index, open_at, close_at))
+    elif isinstance(working_hours, dict):
+        for day_index, day in enumerate(DAYS):
+            hours = working_hours.get(day) or {}
+            if not isinstance(hours, dict):
+                raise ScheduleError(f"Invalid hours for {day}")
+            if str(hours.get("closed", "")).lower() in ("true", "1", "yes") or not hours.get("open"):
+                continue
+            spans.extend(_day_spans(day_index, parse_time(hours["open"]), parse_time(hours.get("close", "24:00"))))
+        for value in working_hours.get("holidays") or []:
+            if not DATE_PATTERN.match(str(value)):
+                raise ScheduleError(f"Invalid holiday {value!r}, expected YYYY-MM-DD")
+            closed_dates.append(str(value))
+    else:
+        raise ScheduleError("Invalid working hours")
+
+    return {"open_intervals": _merge(spans), "closed_dates": sorted(set(closed_dates)), "schedule_version": SCHEDULE_VERSION}
+
+
+def compile_stored_schedule(working_hours: Any, owner: str) -> Dict[str, Any]:
+    """compile_schedule for hours already saved, which may predate validation"""
+    try:
+        return compile_schedule(working_hours)
+    except ScheduleError as e:
+        logger.warning(f"Vendor {owner} has invalid working hours: {str(e)}")
+        # Unreadable hours keep the old behaviour: open unless switched off
+        return compile_schedule(None)
+
+# ============== QUERYING ==============
+
+
+def local_position(at: Optional[datetime] = None) -> Tuple[int, str]:
+    """(minute of week, local date) for a naive UTC datetime"""
+    at = at or datetime.utcnow()
+    local = at.replace(tzinfo=timezone.utc).astimezone(SCHEDULE_TIMEZONE)
+    minute = local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+    return minute, local.date().isoformat()
+
+
+def open_now_filter(at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Mongo filter matching vendors that are open at `at` (default now)"""
+    minute, today = local_position(at)
+    return {
+        "open_intervals": {"$elemMatch": {"start": {"$lte": minute}, "end": {"$gt": minute}}},
+        "closed_dates": {"$ne": today},
+        "is_open": {"$ne": False},
+    }
+
+
+def is_open_at(vendor: Dict[str, Any], at: Optional[datetime] = None) -> bool:
+    """Same test as open_now_filter for a vendor document already in memory"""
+    minute, today = local_position(at)
+    if vendor.get("is_open") is False or today in (vendor.get("closed_dates") or []):
+        return False
+    return any(i["start"] <= minute < i["end"] for i in vendor.get("open_intervals") or [])
+
+# ============== MAINTENANCE ==============
+
+
+async def compile_missing(collection: str) -> int:
+    """Compile schedules of vendors saved before open_intervals existed (or by an older compiler)"""
+    compiled = 0
+    cursor = db[collection].find(
+        {"schedule_version": {"$ne": SCHEDULE_VERSION}}, {"working_hours": 1}
+    ).limit(COMPILE_BATCH_SIZE)
+    async for vendor in cursor:
+        fields = compile_stored_schedule(vendor.get("working_hours"), f"{vendor['_id']} in {collection}")
+        fields["updated_at"] = datetime.utcnow()
+        await db[collection].update_one({"_id": vendor["_id"]}, {"$set": fields})
+        compiled += 1
+    return compiled
+
+
+@periodic("refresh_open_flags", interval=30)
+async def refresh_open_flags() -> dict:
+    """Flip open_now for vendors whose opening interval started or ended since the last run"""
+    result = {"opened": 0, "closed": 0, "compiled": 0}
+    now = datetime.utcnow()
+    open_filter = open_now_filter(now)
+    for collection in SCHEDULED_COLLECTIONS:
+        result["compiled"] += await compile_missing(collection)
+        # updated_at too, so delta sync sends the flipped flag
+        opened = await db[collection].update_many(
+            {**open_filter, "open_now": {"$ne": True}}, {"$set": {"open_now": True, "updated_at": now}}
+        )
+        closed = await db[collection].update_many(
+            {"open_now": True, "$nor": [open_filter]}, {"$set": {"open_now": False, "updated_at": now}}
+        )
+        result["opened"] += opened.modified_count
+        result["closed"] += closed.modified_count
+    metrics.inc("vendors_opened", result["opened"])
+    metrics.inc("vendors_closed", result["closed"])
+    return result
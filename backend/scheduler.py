@@ -0,0 +1,194 @@
+"""
+Periodic maintenance tasks
+
+Tasks registered with ``@periodic`` run on every app process, but a lease in
+``scheduler_leases`` makes sure only one process runs a given task at a time
+across workers and hosts. The lease also records when the task is next due,
+so a restart does not re-run everything immediately.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from database import db
+from metrics import metrics
+from order_state import release_stock
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TICK_SECONDS = float(os.environ.get("SCHEDULER_TICK_SECONDS", "15"))
+PENDING_ORDER_TIMEOUT_MINUTES = int(os.environ.get("PENDING_ORDER_TIMEOUT_MINUTES", "30"))
+EMPTY_CART_TTL_HOURS = int(os.environ.get("EMPTY_CART_TTL_HOURS", "24"))
+EXPIRY_BATCH_SIZE = 500
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval: float, fn: Callable[[], Awaitable[Optional[dict]]]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+
+TASKS: Dict[str, PeriodicTask] = {}
+
+
+def periodic(name: str, interval: float):
+    """Register an async task to run every `interval` seconds; it may return a result dict for /api/metrics"""
+    def decorator(fn):
+        TASKS[name] = PeriodicTask(name, interval, fn)
+        return fn
+    return decorator
+
+
+class Scheduler:
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+    async def acquire(self, task: PeriodicTask) -> bool:
+        """Take the lease for `task` if it is due and nobody else holds it"""
+        now = datetime.utcnow()
+        try:
+            # No matching lease document means the upsert inserts one with the same _id and fails
+            await db.scheduler_leases.find_one_and_update(
+                {"_id": task.name, "next_run_at": {"$lte": now}, "locked_until": {"$lt": now}},
+                {"$set": {
+                    "owner": self.owner,
+                    "next_run_at": now,
+                    # Long enough for one run; a crashed owner loses the lease after this
+                    "locked_until": now + timedelta(seconds=max(task.interval, 60)),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The lease exists and is either held or not due yet
+            return False
+        return True
+
+    async def release(self, task: PeriodicTask):
+        now = datetime.utcnow()
+        await db.scheduler_leases.update_one(
+            {"_id": task.name, "owner": self.owner},
+            {"$set": {
+                "locked_until": now,
+                "next_run_at": now + timedelta(seconds=task.interval),
+                "last_run_at": now,
+                "last_result": task.last_result,
+                "last_error": task.last_error,
+            }},
+        )
+
+    async def run_task(self, task: PeriodicTask):
+        if not await self.acquire(task):
+            return
+        started = datetime.utcnow()
+        try:
+            task.last_result = await task.fn()
+            task.last_error = None
+            metrics.inc("scheduler_runs", task=task.name)
+        except Exception as e:
+            task.last_error = str(e)
+            logger.error(f"Scheduled task {task.name} failed: {str(e)}")
+            metrics.inc("scheduler_failures", task=task.name)
+        finally:
+            task.last_run = started
+            await self.release(task)
+
+    async def _loop(self):
+        while True:
+            for task in list(TASKS.values()):
+                try:
+                    await self.run_task(task)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Scheduler could not run {task.name}: {str(e)}")
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+    def start(self):
+        if SCHEDULER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+scheduler = Scheduler()
+
+
+def scheduler_stats() -> dict:
+    return {
+        name: {
+            "interval": task.interval,
+            "last_run": task.last_run.isoformat() if task.last_run else None,
+            "last_result": task.last_result,
+            "last_error": task.last_error,
+        }
+        for name, task in TASKS.items()
+    }
+
+
+metrics.register_collector("scheduler", scheduler_stats)
+
+# ============== TASKS ==============
+
+
+@periodic("expire_pending_orders", interval=60)
+async def expire_pending_orders() -> dict:
+    """Cancel orders a vendor never answered and put their stock back"""
+    # Finish stock release for cancellations that crashed half way
+    recovered = await release_stock({"status": "cancelled", "stock_released": False})
+
+    cutoff = datetime.utcnow() - timedelta(minutes=PENDING_ORDER_TIMEOUT_MINUTES)
+    expired = 0
+    while True:
+        ids = [
+            o["_id"] for o in await db.orders.find(
+                {"status": "pending", "created_at": {"$lt": cutoff}}, {"_id": 1}
+            ).limit(EXPIRY_BATCH_SIZE).to_list(EXPIRY_BATCH_SIZE)
+        ]
+        if not ids:
+            break
+        run_id = uuid.uuid4().hex
+        # Re-check the status so an order accepted meanwhile is left alone
+        result = await db.orders.update_many(
+            {"_id": {"$in": ids}, "status": "pending"},
+            {"$set": {
+                "status": "cancelled",
+                "cancel_reason": "vendor_timeout",
+                "expired_by": run_id,
+                "stock_released": False,
+                "updated_at": datetime.utcnow(),
+            }},
+        )
+        await release_stock({"expired_by": run_id, "stock_released": False})
+        expired += result.modified_count
+        if len(ids) < EXPIRY_BATCH_SIZE:
+            break
+    if expired:
+        logger.info(f"Cancelled {expired} pending order(s) older than {PENDING_ORDER_TIMEOUT_MINUTES} minutes")
+    metrics.inc("orders_expired", expired)
+    return {"expired": expired, "recovered": recovered}
+
+
+@periodic("backfill_cart_expiry", interval=3600)
+async def backfill_cart_expiry() -> dict:
+    """Give empty carts created before expires_at existed an expiry so the TTL index removes them"""
+    result = await db.carts.update_many(
+        {"items": {"$size": 0}, "expires_at": {"$exists": False}},
+        {"$set": {"expires_at": datetime.utcnow() + timedelta(hours=EMPTY_CART_TTL_HOURS)}},
+    )
+    return {"updated": result.modified_count}
@@ -1,12 +1,26 @@
 """
 Seed data script to populate the database with test data
+
+Without arguments it creates a small dataset with the usual test accounts.
+Pass larger counts to generate deterministic datasets for scaling tests:
+
+    python seed_data.py --vendors 2000 --products-per-vendor 500 \
+        --customers 200000 --orders 1000000 --carts 50000 --seed 42
+
+The same seed always produces the same documents (including ObjectIds), so
+runs are reproducible across machines.
 """
+import argparse
 import asyncio
+import math
 import os
+import random
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
 from passlib.context import CryptContext
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
+from bson import ObjectId
 from dotenv import load_dotenv
 
 ROOT_DIR = Path(__file__).parent
@@ -14,321 +28,439 @@ load_dotenv(ROOT_DIR / '.env')
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+DEFAULT_PASSWORD = "test123"
 
-async def seed_database():
-    print("🌱 Starting database seeding...")
-    
-    # Clear existing data
-    print("🗑️  Clearing existing data...")
-    await db.users.delete_many({})
-    await db.vendor_profiles.delete_many({})
-    await db.products.delete_many({})
-    await db.orders.delete_many({})
-    await db.carts.delete_many({})
-    
-    # Create test users
-    print("👤 Creating users...")
-    users = []
-    
-    # Regular customer
-    customer_user = {
-        "email": "customer@test.com",
-        "password": pwd_context.hash("test123"),
-        "full_name": "Ahmet Yılmaz",
-        "phone": "05551234567",
-        "role": "customer",
-        "is_active": True,
-        "created_at": datetime.utcnow()
-    }
-    customer_result = await db.users.insert_one(customer_user)
-    users.append(str(customer_result.inserted_id))
-    print(f"✅ Customer created: customer@test.com / test123")
-    
-    # Vendor users
-    vendor_users_data = [
-        {
-            "email": "manav1@test.com",
-            "password": pwd_context.hash("test123"),
-            "full_name": "Ali Manav",
-            "phone": "05551111111",
-            "role": "vendor",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "email": "manav2@test.com",
-            "password": pwd_context.hash("test123"),
-            "full_name": "Mehmet Sebzeci",
-            "phone": "05552222222",
-            "role": "vendor",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "email": "manav3@test.com",
-            "password": pwd_context.hash("test123"),
-            "full_name": "Ayşe Meyve",
-            "phone": "05553333333",
-            "role": "vendor",
+# ============== REFERENCE DATA ==============
+
+# (city, district, latitude, longitude)
+DISTRICTS = [
+    ("İstanbul", "Kadıköy", 40.9833, 29.0333),
+    ("İstanbul", "Beşiktaş", 41.0422, 29.0086),
+    ("İstanbul", "Üsküdar", 41.0214, 29.0627),
+    ("İstanbul", "Şişli", 41.0602, 28.9877),
+    ("İstanbul", "Bakırköy", 40.9800, 28.8720),
+    ("İstanbul", "Ataşehir", 40.9923, 29.1244),
+    ("İstanbul", "Maltepe", 40.9357, 29.1552),
+    ("İstanbul", "Sarıyer", 41.1669, 29.0572),
+    ("İstanbul", "Beyoğlu", 41.0370, 28.9770),
+    ("İstanbul", "Fatih", 41.0186, 28.9397),
+    ("Ankara", "Çankaya", 39.9179, 32.8627),
+    ("Ankara", "Keçiören", 39.9800, 32.8650),
+    ("Ankara", "Yenimahalle", 39.9700, 32.8100),
+    ("İzmir", "Konak", 38.4189, 27.1287),
+    ("İzmir", "Karşıyaka", 38.4602, 27.1100),
+    ("İzmir", "Bornova", 38.4697, 27.2211),
+    ("İzmir", "Buca", 38.3886, 27.1750),
+    ("Bursa", "Nilüfer", 40.2134, 28.9870),
+    ("Bursa", "Osmangazi", 40.1950, 29.0600),
+    ("Antalya", "Muratpaşa", 36.8841, 30.7056),
+    ("Antalya", "Konyaaltı", 36.8650, 30.6360),
+]
+
+NEIGHBOURHOODS = [
+    "Cumhuriyet Mah.", "Atatürk Mah.", "Yenidoğan Mah.", "Fatih Mah.", "Bahçelievler Mah.",
+    "Çamlık Mah.", "Gazi Mah.", "İnönü Mah.", "Merkez Mah.", "Yıldız Mah.",
+]
+
+STREETS = [
+    "Atatürk Cd.", "Cumhuriyet Cd.", "İstiklal Cd.", "Bağdat Cd.", "Gazi Sk.",
+    "Lale Sk.", "Menekşe Sk.", "Çınar Sk.", "Mimar Sinan Cd.", "Fevzi Çakmak Cd.",
+    "Papatya Sk.", "Gül Sk.", "Kıbrıs Şehitleri Cd.", "Şehit Mehmet Sk.", "Ihlamur Sk.",
+]
+
+FIRST_NAMES = [
+    "Ahmet", "Mehmet", "Mustafa", "Ali", "Hüseyin", "Hasan", "İbrahim", "Emre", "Burak", "Can",
+    "Ayşe", "Fatma", "Zeynep", "Elif", "Emine", "Hatice", "Merve", "Özlem", "Şule", "Gökçe",
+]
+
+LAST_NAMES = [
+    "Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Yıldırım", "Öztürk", "Aydın", "Özdemir",
+    "Arslan", "Doğan", "Kılıç", "Aslan", "Çetin", "Kara", "Koç", "Kurt", "Özkan", "Şimşek",
+]
+
+STORE_PREFIXES = ["Taze", "Organik", "Köy", "Bereket", "Doğal", "Yeşil", "Bahçe", "Mevsim", "Güneş", "Anadolu"]
+STORE_SUFFIXES = ["Manav", "Pazarı", "Meyve & Sebze", "Bostan", "Market", "Tarım", "Çiftliği", "Sepeti"]
+
+# (name, category, unit, base price in TRY)
+PRODUCT_CATALOG = [
+    ("Domates", "vegetables", "kg", 25.5),
+    ("Salatalık", "vegetables", "kg", 15.0),
+    ("Biber", "vegetables", "kg", 30.0),
+    ("Patlıcan", "vegetables", "kg", 28.0),
+    ("Patates", "vegetables", "kg", 12.0),
+    ("Soğan", "vegetables", "kg", 10.0),
+    ("Havuç", "vegetables", "kg", 14.0),
+    ("Ispanak", "vegetables", "kg", 30.0),
+    ("Marul", "vegetables", "adet", 20.0),
+    ("Taze Fasulye", "vegetables", "kg", 55.0),
+    ("Kabak", "vegetables", "kg", 22.0),
+    ("Brokoli", "vegetables", "kg", 45.0),
+    ("Elma", "fruits", "kg", 35.0),
+    ("Muz", "fruits", "kg", 45.0),
+    ("Portakal", "fruits", "kg", 30.0),
+    ("Mandalina", "fruits", "kg", 28.0),
+    ("Çilek", "fruits", "kg", 80.0),
+    ("Karpuz", "fruits", "kg", 20.0),
+    ("Kavun", "fruits", "kg", 25.0),
+    ("Üzüm", "fruits", "kg", 50.0),
+    ("Armut", "fruits", "kg", 40.0),
+    ("Kiraz", "fruits", "kg", 120.0),
+    ("Nar", "fruits", "kg", 45.0),
+    ("Köy Yumurtası", "dairy", "paket", 60.0),
+    ("Köy Peyniri", "dairy", "kg", 180.0),
+    ("Süzme Yoğurt", "dairy", "kg", 70.0),
+    ("Tereyağı", "dairy", "paket", 150.0),
+    ("Günlük Süt", "dairy", "adet", 35.0),
+    ("Köy Ekmeği", "bakery", "adet", 25.0),
+    ("Simit", "bakery", "adet", 10.0),
+    ("Kuru Kayısı", "snacks", "paket", 90.0),
+    ("Fındık", "snacks", "paket", 140.0),
+    ("Ayran", "beverages", "adet", 15.0),
+    ("Şalgam", "beverages", "adet", 20.0),
+    ("Tavuk But", "meat", "kg", 110.0),
+    ("Dana Kıyma", "meat", "kg", 450.0),
+    ("Nar Ekşisi", "other", "adet", 85.0),
+]
+
+PRODUCT_ADJECTIVES = ["", "Organik ", "Yerli ", "Taze ", "Köy ", "Seçme "]
+
+ORDER_STATUS_WEIGHTS = [
+    ("completed", 80),
+    ("cancelled", 8),
+    ("delivering", 3),
+    ("ready", 2),
+    ("preparing", 2),
+    ("accepted", 2),
+    ("pending", 3),
+]
+
+# ============== DETERMINISTIC HELPERS ==============
+
+# Fixed timestamp prefix so generated ObjectIds are identical between runs
+OID_EPOCH = int(datetime(2025, 1, 1).timestamp())
+
+KIND_USER = 1
+KIND_VENDOR = 2
+KIND_PRODUCT = 3
+KIND_ORDER = 4
+KIND_CART = 5
+
+
+def make_oid(kind: int, index: int) -> ObjectId:
+    """Deterministic ObjectId: 4-byte fixed timestamp, 1-byte kind, 7-byte index"""
+    return ObjectId(OID_EPOCH.to_bytes(4, "big") + bytes([kind]) + index.to_bytes(7, "big"))
+
+
+def batch_rng(seed: int, kind: str, batch_no: int) -> random.Random:
+    """Independent RNG per batch so batches can be generated in any order"""
+    return random.Random(f"{seed}:{kind}:{batch_no}")
+
+
+def random_location(rng: random.Random):
+    city, district, lat, lon = rng.choice(DISTRICTS)
+    # ~1.5 km jitter around the district centre
+    lat += rng.gauss(0, 0.0135)
+    lon += rng.gauss(0, 0.0175)
+    address = (
+        f"{rng.choice(NEIGHBOURHOODS)} {rng.choice(STREETS)} "
+        f"No:{rng.randint(1, 180)} D:{rng.randint(1, 24)}, {district}/{city}"
+    )
+    return address, round(lat, 6), round(lon, 6)
+
+
+def random_phone(rng: random.Random) -> str:
+    return f"05{rng.randint(30, 59)}{rng.randint(0, 9999999):07d}"
+
+
+def product_info(seed: int, vendor_index: int, slot: int):
+    """Name, category, unit and price of a product, derived only from its indices"""
+    rng = random.Random(f"{seed}:product:{vendor_index}:{slot}")
+    name, category, unit, base_price = PRODUCT_CATALOG[(vendor_index * 7 + slot) % len(PRODUCT_CATALOG)]
+    name = f"{rng.choice(PRODUCT_ADJECTIVES)}{name}"
+    price = round(base_price * rng.uniform(0.8, 1.4), 2)
+    return name, category, unit, price, rng
+
+# ============== DOCUMENT GENERATORS ==============
+
+
+class DatasetSpec:
+    def __init__(self, args):
+        self.seed = args.seed
+        self.vendors = args.vendors
+        self.products_per_vendor = args.products_per_vendor
+        self.customers = args.customers
+        self.orders = args.orders
+        self.carts = min(args.carts, args.customers)
+        self.batch_size = args.batch_size
+        self.days = args.days
+        self.end_date = datetime(2025, 1, 1) + timedelta(days=args.days)
+
+    @property
+    def products(self) -> int:
+        return self.vendors * self.products_per_vendor
+
+
+def generate_users(spec: DatasetSpec, password_hash: str, batch_no: int, start: int, stop: int):
+    """Customers occupy user indices [0, customers), vendor users follow them"""
+    rng = batch_rng(spec.seed, "users", batch_no)
+    created_base = spec.end_date - timedelta(days=spec.days)
+    docs = []
+    for i in range(start, stop):
+        is_vendor = i >= spec.customers
+        if is_vendor:
+            number = i - spec.customers + 1
+            email = f"manav{number}@test.com"
+        elif i == 0:
+            email = "customer@test.com"
+        else:
+            email = f"musteri{i}@test.com"
+        docs.append({
+            "_id": make_oid(KIND_USER, i),
+            "email": email,
+            "password": password_hash,
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "phone": random_phone(rng),
+            "role": "vendor" if is_vendor else "customer",
             "is_active": True,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    vendor_user_ids = []
-    for vendor_user in vendor_users_data:
-        result = await db.users.insert_one(vendor_user)
-        vendor_user_ids.append(str(result.inserted_id))
-        print(f"✅ Vendor user created: {vendor_user['email']} / test123")
-    
-    # Create vendor profiles
-    print("🏪 Creating vendor profiles...")
-    vendor_profiles_data = [
-        {
-            "user_id": vendor_user_ids[0],
-            "store_name": "Taze Meyve & Sebze",
-            "store_description": "En taze meyveler ve sebzeler burada!",
-            "address": "Kadıköy, İstanbul",
-            "latitude": 40.9833,
-            "longitude": 29.0333,
-            "phone": "05551111111",
-            "working_hours": "08:00-22:00",
-            "delivery_options": ["self", "platform"],
-            "is_approved": True,
-            "rating": 4.5,
-            "total_orders": 150,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "user_id": vendor_user_ids[1],
-            "store_name": "Organik Manav",
-            "store_description": "100% organik ürünler",
-            "address": "Beşiktaş, İstanbul",
-            "latitude": 41.0422,
-            "longitude": 29.0086,
-            "phone": "05552222222",
-            "working_hours": "09:00-21:00",
-            "delivery_options": ["platform"],
-            "is_approved": True,
-            "rating": 4.8,
-            "total_orders": 200,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "user_id": vendor_user_ids[2],
-            "store_name": "Köy Pazarı",
-            "store_description": "Köyden şehre taze lezzetler",
-            "address": "Üsküdar, İstanbul",
-            "latitude": 41.0214,
-            "longitude": 29.0627,
-            "phone": "05553333333",
-            "working_hours": "07:00-20:00",
-            "delivery_options": ["self", "platform"],
-            "is_approved": True,
-            "rating": 4.3,
-            "total_orders": 120,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    vendor_ids = []
-    for vendor_profile in vendor_profiles_data:
-        result = await db.vendor_profiles.insert_one(vendor_profile)
-        vendor_ids.append(str(result.inserted_id))
-        print(f"✅ Vendor profile created: {vendor_profile['store_name']}")
-    
-    # Create products
-    print("🛒 Creating products...")
-    products_data = [
-        # Vendor 1 - Taze Meyve & Sebze
-        {
-            "vendor_id": vendor_ids[0],
-            "name": "Domates",
-            "description": "Taze domates, kilosu",
-            "category": "vegetables",
-            "price": 25.50,
-            "unit": "kg",
-            "stock": 50,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[0],
-            "name": "Salatalık",
-            "description": "Taze salatalık",
-            "category": "vegetables",
-            "price": 15.00,
-            "unit": "kg",
-            "stock": 40,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[0],
-            "name": "Elma",
-            "description": "Amasya elması",
-            "category": "fruits",
-            "price": 35.00,
-            "unit": "kg",
-            "stock": 30,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 10,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[0],
-            "name": "Muz",
-            "description": "Ekvator muzu",
-            "category": "fruits",
-            "price": 45.00,
-            "unit": "kg",
-            "stock": 25,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        # Vendor 2 - Organik Manav
-        {
-            "vendor_id": vendor_ids[1],
-            "name": "Organik Domates",
-            "description": "100% organik domates",
-            "category": "vegetables",
-            "price": 40.00,
-            "unit": "kg",
-            "stock": 20,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[1],
-            "name": "Organik Marul",
-            "description": "Taze organik marul",
-            "category": "vegetables",
-            "price": 20.00,
-            "unit": "adet",
-            "stock": 35,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[1],
-            "name": "Organik Portakal",
-            "description": "Vitamin deposu",
-            "category": "fruits",
-            "price": 50.00,
-            "unit": "kg",
-            "stock": 15,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 15,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[1],
-            "name": "Organik Ispanak",
-            "description": "Demirden zengin",
-            "category": "vegetables",
-            "price": 30.00,
-            "unit": "kg",
-            "stock": 10,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        # Vendor 3 - Köy Pazarı
-        {
-            "vendor_id": vendor_ids[2],
-            "name": "Köy Yumurtası",
-            "description": "Köy yumurtası, 10'lu",
-            "category": "dairy",
-            "price": 60.00,
-            "unit": "paket",
-            "stock": 50,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[2],
-            "name": "Köy Peyniri",
-            "description": "El yapımı peynir",
-            "category": "dairy",
-            "price": 180.00,
-            "unit": "kg",
-            "stock": 8,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[2],
-            "name": "Taze Fasulye",
-            "description": "Köyden taze fasulye",
-            "category": "vegetables",
-            "price": 55.00,
-            "unit": "kg",
-            "stock": 12,
-            "images": [],
-            "is_available": True,
-            "discount_percentage": 0,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        },
-        {
-            "vendor_id": vendor_ids[2],
-            "name": "Karpuz",
-            "description": "Diyarbakır karpuzu",
-            "category": "fruits",
-            "price": 20.00,
-            "unit": "kg",
-            "stock": 30,
+            "created_at": created_base + timedelta(seconds=rng.randint(0, spec.days * 86400)),
+        })
+    return docs
+
+
+def generate_vendor_profiles(spec: DatasetSpec, batch_no: int, start: int, stop: int):
+    rng = batch_rng(spec.seed, "vendors", batch_no)
+    docs = []
+    for v in range(start, stop):
+        address, lat, lon = random_location(rng)
+        open_hour = rng.choice([7, 8, 9])
+        close_hour = rng.choice([20, 21, 22])
+        docs.append({
+            "_id": make_oid(KIND_VENDOR, v),
+            "user_id": str(make_oid(KIND_USER, spec.customers + v)),
+            "store_name": f"{rng.choice(STORE_PREFIXES)} {rng.choice(STORE_SUFFIXES)}",
+            "store_description": "Taze ve günlük ürünler",
+            "address": address,
+            "latitude": lat,
+            "longitude": lon,
+            "phone": random_phone(rng),
+            "working_hours": f"{open_hour:02d}:00-{close_hour:02d}:00",
+            "delivery_options": rng.choice([["self", "platform"], ["platform"], ["self"]]),
+            "is_approved": rng.random() < 0.95,
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "total_orders": 0,
+            "created_at": datetime(2025, 1, 1) + timedelta(minutes=v),
+        })
+    return docs
+
+
+def generate_products(spec: DatasetSpec, batch_no: int, start: int, stop: int):
+    created_at = datetime(2025, 1, 1)
+    docs = []
+    for p in range(start, stop):
+        vendor_index, slot = divmod(p, spec.products_per_vendor)
+        name, category, unit, price, rng = product_info(spec.seed, vendor_index, slot)
+        docs.append({
+            "_id": make_oid(KIND_PRODUCT, p),
+            "vendor_id": str(make_oid(KIND_VENDOR, vendor_index)),
+            "name": name,
+            "description": f"{name}, günlük taze",
+            "category": category,
+            "price": price,
+            "unit": unit,
+            "stock": rng.randint(0, 200),
             "images": [],
-            "is_available": True,
-            "discount_percentage": 20,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-    ]
-    
-    for product in products_data:
-        await db.products.insert_one(product)
-        print(f"✅ Product created: {product['name']} - {product['price']} TL/{product['unit']}")
-    
+            "is_available": rng.random() < 0.9,
+            "discount_percentage": rng.choice([0, 0, 0, 5, 10, 15, 20]),
+            "quality_grade": rng.choice(["A", "A", "B", "C"]),
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return docs
+
+
+def generate_orders(spec: DatasetSpec, batch_no: int, start: int, stop: int):
+    rng = batch_rng(spec.seed, "orders", batch_no)
+    statuses = [s for s, _ in ORDER_STATUS_WEIGHTS]
+    weights = [w for _, w in ORDER_STATUS_WEIGHTS]
+    start_date = spec.end_date - timedelta(days=spec.days)
+    docs = []
+    for o in range(start, stop):
+        customer = rng.randrange(spec.customers)
+        vendor_index = rng.randrange(spec.vendors)
+        slots = rng.sample(range(spec.products_per_vendor), k=min(spec.products_per_vendor, rng.randint(1, 6)))
+        items = []
+        for slot in slots:
+            name, _, unit, price, _ = product_info(spec.seed, vendor_index, slot)
+            quantity = rng.randint(1, 4)
+            items.append({
+                "product_id": str(make_oid(KIND_PRODUCT, vendor_index * spec.products_per_vendor + slot)),
+                "product_name": name,
+                "quantity": quantity,
+                "price": price,
+                "total": round(price * quantity, 2),
+            })
+        subtotal = round(sum(i["total"] for i in items), 2)
+        delivery_fee = rng.choice([0.0, 9.9, 14.9, 19.9])
+        address, lat, lon = random_location(rng)
+        # Busier evenings and weekends, like real grocery traffic
+        day = rng.randrange(spec.days)
+        hour = min(23, max(7, int(rng.gauss(17, 3.5))))
+        created_at = start_date + timedelta(days=day, hours=hour, minutes=rng.randrange(60))
+        status = rng.choices(statuses, weights)[0]
+        docs.append({
+            "_id": make_oid(KIND_ORDER, o),
+            "user_id": str(make_oid(KIND_USER, customer)),
+            "vendor_id": str(make_oid(KIND_VENDOR, vendor_index)),
+            "items": items,
+            "subtotal": subtotal,
+            "delivery_fee": delivery_fee,
+            "total": round(subtotal + delivery_fee, 2),
+            "delivery_address": address,
+            "delivery_latitude": lat,
+            "delivery_longitude": lon,
+            "phone": random_phone(rng),
+            "status": status,
+            "delivery_type": rng.choice(["self", "platform"]),
+            "courier_id": None,
+            "notes": None,
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(minutes=rng.randint(0, 90)),
+        })
+    return docs
+
+
+def generate_carts(spec: DatasetSpec, batch_no: int, start: int, stop: int):
+    rng = batch_rng(spec.seed, "carts", batch_no)
+    docs = []
+    for c in range(start, stop):
+        vendor_index = rng.randrange(spec.vendors)
+        slots = rng.sample(range(spec.products_per_vendor), k=min(spec.products_per_vendor, rng.randint(1, 5)))
+        items = []
+        for slot in slots:
+            _, _, _, price, _ = product_info(spec.seed, vendor_index, slot)
+            items.append({
+                "product_id": str(make_oid(KIND_PRODUCT, vendor_index * spec.products_per_vendor + slot)),
+                "quantity": rng.randint(1, 3),
+                "price": price,
+            })
+        docs.append({
+            "_id": make_oid(KIND_CART, c),
+            # Spread carts over the customer range without repeating users
+            "user_id": str(make_oid(KIND_USER, c * spec.customers // spec.carts)),
+            "items": items,
+            "total": round(sum(i["quantity"] * i["price"] for i in items), 2),
+            "updated_at": spec.end_date - timedelta(minutes=rng.randint(0, spec.days * 1440)),
+        })
+    return docs
+
+# ============== BULK WRITER ==============
+
+
+async def bulk_insert(collection, total: int, spec: DatasetSpec, build, concurrency: int, label: str):
+    """Generate and insert `total` documents in batches, keeping `concurrency` inserts in flight"""
+    if total <= 0:
+        return
+    started = time.perf_counter()
+    batches = math.ceil(total / spec.batch_size)
+    semaphore = asyncio.Semaphore(concurrency)
+    inserted = 0
+
+    async def write(docs):
+        nonlocal inserted
+        try:
+            await collection.insert_many(docs, ordered=False)
+            inserted += len(docs)
+        finally:
+            semaphore.release()
+
+    tasks = []
+    for batch_no in range(batches):
+        start = batch_no * spec.batch_size
+        stop = min(total, start + spec.batch_size)
+        await semaphore.acquire()
+        # Generating the next batch overlaps with the inserts already in flight
+        docs = build(batch_no, start, stop)
+        tasks.append(asyncio.create_task(write(docs)))
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {label}: {inserted:,} documents in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} docs/s)")
+
+# ============== ENTRYPOINT ==============
+
+
+async def seed_database(args):
+    print("🌱 Starting database seeding...")
+    spec = DatasetSpec(args)
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], maxPoolSize=max(10, args.concurrency * 2))
+    db = client[os.environ['DB_NAME']]
+
+    if not args.keep_existing:
+        print("🗑️  Clearing existing data...")
+        await asyncio.gather(
+            db.users.delete_many({}),
+            db.vendor_profiles.delete_many({}),
+            db.products.delete_many({}),
+            db.orders.delete_many({}),
+            db.carts.delete_many({}),
+        )
+
+    # One bcrypt hash shared by every generated account instead of one per user
+    password_hash = pwd_context.hash(DEFAULT_PASSWORD)
+
+    total_users = spec.customers + spec.vendors
+    print(f"👤 Creating {total_users:,} users...")
+    await bulk_insert(db.users, total_users, spec,
+                      lambda b, s, e: generate_users(spec, password_hash, b, s, e),
+                      args.concurrency, "Users")
+
+    print(f"🏪 Creating {spec.vendors:,} vendor profiles...")
+    await bulk_insert(db.vendor_profiles, spec.vendors, spec,
+                      lambda b, s, e: generate_vendor_profiles(spec, b, s, e),
+                      args.concurrency, "Vendor profiles")
+
+    print(f"🛒 Creating {spec.products:,} products...")
+    await bulk_insert(db.products, spec.products, spec,
+                      lambda b, s, e: generate_products(spec, b, s, e),
+                      args.concurrency, "Products")
+
+    print(f"📦 Creating {spec.orders:,} orders...")
+    await bulk_insert(db.orders, spec.orders, spec,
+                      lambda b, s, e: generate_orders(spec, b, s, e),
+                      args.concurrency, "Orders")
+
+    print(f"🧺 Creating {spec.carts:,} carts...")
+    await bulk_insert(db.carts, spec.carts, spec,
+                      lambda b, s, e: generate_carts(spec, b, s, e),
+                      args.concurrency, "Carts")
+
     print("\n✨ Database seeding completed!")
     print("\n📝 Test credentials:")
-    print("   Customer: customer@test.com / test123")
-    print("   Vendor 1: manav1@test.com / test123")
-    print("   Vendor 2: manav2@test.com / test123")
-    print("   Vendor 3: manav3@test.com / test123")
-    
+    print(f"   Customer: customer@test.com / {DEFAULT_PASSWORD}")
+    for number in range(1, min(spec.vendors, 3) + 1):
+        print(f"   Vendor {number}: manav{number}@test.com / {DEFAULT_PASSWORD}")
+
     client.close()
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic Manavım dataset")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed; same seed, same dataset")
+    parser.add_argument("--vendors", type=int, default=3)
+    parser.add_argument("--products-per-vendor", type=int, default=4)
+    parser.add_argument("--customers", type=int, default=1)
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--carts", type=int, default=0)
+    parser.add_argument("--days", type=int, default=180, help="Spread orders over this many days")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per insert_many call")
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many calls kept in flight")
+    parser.add_argument("--keep-existing", action="store_true", help="Do not clear collections first")
+    args = parser.parse_args(argv)
+    if args.vendors < 1 or args.customers < 1 or args.products_per_vendor < 1:
+        parser.error("--vendors, --customers and --products-per-vendor must be at least 1")
+    return args
+
+
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    asyncio.run(seed_database(parse_args()))
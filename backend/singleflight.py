@@ -0,0 +1,75 @@
+"""
+Request coalescing for hot read paths
+
+Concurrent calls with the same key share one in-flight execution and its
+result. The shared execution runs as its own task, so a caller that goes away
+(client disconnect) does not cancel the work other callers are waiting for.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import metrics
+
+# Per-key counters are kept for the most recently used keys only
+MAX_TRACKED_KEYS = 200
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._executions = 0
+        self._key_stats: "OrderedDict[Hashable, Dict[str, int]]" = OrderedDict()
+
+    def _track(self, key: Hashable, field: str):
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = {"calls": 0, "executions": 0}
+            if len(self._key_stats) > MAX_TRACKED_KEYS:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        stats[field] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._calls += 1
+        self._track(key, "calls")
+        task = self._inflight.get(key)
+        if task is None:
+            self._executions += 1
+            self._track(key, "executions")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Retrieve the exception so it is not reported as unhandled when every caller left
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        hot_keys = sorted(self._key_stats.items(), key=lambda kv: -kv[1]["calls"])[:10]
+        return {
+            "calls": self._calls,
+            "executions": self._executions,
+            "shared": self._calls - self._executions,
+            "inflight": len(self._inflight),
+            "hot_keys": {str(key): stats for key, stats in hot_keys},
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def group(name: str) -> SingleFlight:
+    """Named coalescing group; all groups are reported under "singleflight" in /api/metrics"""
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+metrics.register_collector("singleflight", lambda: {name: g.stats() for name, g in _groups.items()})
@@ -0,0 +1,117 @@
+"""
+Import-time profiler for the API process
+
+Runs ``python -X importtime -c "import server"`` in a fresh interpreter and
+summarises where cold start time goes:
+
+    python startup_profile.py                    # report
+    python startup_profile.py --budget-ms 900    # exit 1 when over budget (CI)
+    python startup_profile.py --json             # machine readable
+
+The best of ``--repeat`` runs is reported to reduce noise from the machine.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).parent
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def run_importtime(module: str) -> List[dict]:
+    env = dict(os.environ)
+    # Importing server must not need a reachable database
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "startup_profile")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2,
+            })
+    return entries
+
+
+def summarise(entries: List[dict], module: str, top: int) -> Dict:
+    # A module's imports are logged before it, one level deeper; its subtree
+    # starts right after the previous top-level entry (interpreter startup)
+    root_index = max(i for i, e in enumerate(entries) if e["module"] == module and e["depth"] == 0)
+    start = root_index
+    while start > 0 and entries[start - 1]["depth"] > 0:
+        start -= 1
+    root = entries[root_index]
+    subtree = entries[start:root_index + 1]
+    direct = [e for e in subtree if e["depth"] == 1]
+    by_package: Dict[str, int] = defaultdict(int)
+    for e in subtree:
+        by_package[e["module"].split(".")[0]] += e["self_us"]
+    return {
+        "module": module,
+        "total_ms": root["cumulative_us"] / 1000,
+        "self_ms": root["self_us"] / 1000,
+        "direct_imports": [
+            {"module": e["module"], "ms": e["cumulative_us"] / 1000}
+            for e in sorted(direct, key=lambda e: -e["cumulative_us"])[:top]
+        ],
+        "packages": [
+            {"package": name, "ms": us / 1000}
+            for name, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+        ],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time of the API process")
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the fastest of")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail when total import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    # The first run also writes .pyc files; it is included but rarely the fastest
+    reports = [summarise(run_importtime(args.module), args.module, args.top) for _ in range(args.repeat)]
+    report = min(reports, key=lambda r: r["total_ms"])
+
+    over_budget = args.budget_ms is not None and report["total_ms"] > args.budget_ms
+    report["budget_ms"] = args.budget_ms
+    report["over_budget"] = over_budget
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: {report['total_ms']:.1f} ms total, {report['self_ms']:.1f} ms in module body")
+        print("\nSlowest direct imports:")
+        for e in report["direct_imports"]:
+            print(f"  {e['ms']:8.1f} ms  {e['module']}")
+        print("\nSelf time by top-level package:")
+        for e in report["packages"]:
+            print(f"  {e['ms']:8.1f} ms  {e['package']}")
+        if args.budget_ms is not None:
+            verdict = "OVER BUDGET" if over_budget else "within budget"
+            print(f"\nBudget {args.budget_ms:.0f} ms: {verdict}")
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
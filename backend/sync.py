@@ -0,0 +1,175 @@
+"""
+Delta sync for offline-first clients
+
+Clients keep a local copy of products, vendors and their own orders and ask
+for what changed since an opaque watermark. Every synced collection is read
+in (updated_at, _id) order, so a page boundary never skips or repeats a
+document. Deletions are recorded as tombstones that expire after
+SYNC_TOMBSTONE_DAYS; a client whose watermark is older than that is told to
+reset and start from scratch.
+
+Changes newer than SYNC_SETTLE_SECONDS are held back until the next call, so
+a write that commits slightly after a later one (clock skew between workers,
+slow requests) is not skipped.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from database import catalog_db, db
+from scheduler import periodic
+
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", "30"))
+SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", "5"))
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+WATERMARK_VERSION = 1
+SYNC_COLLECTIONS = ["products", "vendors", "orders"]
+
+# Never sent to clients
+VENDOR_PRIVATE_FIELDS = {"tax_document": 0, "tax_number": 0}
+
+EPOCH = datetime(1970, 1, 1)
+Position = Tuple[datetime, Optional[ObjectId]]
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+# ============== WATERMARKS ==============
+
+
+def encode_watermark(positions: Dict[str, Position]) -> str:
+    payload = {"v": WATERMARK_VERSION}
+    for name, (at, last_id) in positions.items():
+        payload[name] = [(at - EPOCH) // timedelta(microseconds=1), str(last_id) if last_id else None]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_watermark(token: Optional[str]) -> Dict[str, Position]:
+    positions = {name: (EPOCH, None) for name in SYNC_COLLECTIONS}
+    if not token:
+        return positions
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise InvalidWatermark("Malformed sync watermark")
+    if not isinstance(payload, dict) or payload.get("v") != WATERMARK_VERSION:
+        raise InvalidWatermark("Unsupported sync watermark")
+    try:
+        for name in SYNC_COLLECTIONS:
+            if name in payload:
+                micros, last_id = payload[name]
+                positions[name] = (EPOCH + timedelta(microseconds=micros), ObjectId(last_id) if last_id else None)
+    except Exception:
+        raise InvalidWatermark("Malformed sync watermark")
+    return positions
+
+# ============== TOMBSTONES ==============
+
+
+async def record_deletion(collection: str, doc_id: str, owner: Optional[str] = None):
+    """Call after deleting a synced document so clients drop their copy"""
+    now = datetime.utcnow()
+    await db.tombstones.insert_one({
+        "collection": collection,
+        "doc_id": doc_id,
+        "owner": owner,
+        "deleted_at": now,
+        # Kept a day past the sync horizon so a client right at the edge still sees it
+        "expires_at": now + timedelta(days=SYNC_TOMBSTONE_DAYS + 1),
+    })
+
+
+async def deleted_since(collection: str, since: datetime, until: datetime) -> List[str]:
+    cursor = db.tombstones.find(
+        {"collection": collection, "deleted_at": {"$gt": since, "$lte": until}},
+        {"doc_id": 1},
+    )
+    return [t["doc_id"] async for t in cursor]
+
+# ============== CHANGE FEEDS ==============
+
+
+def _after(position: Position, until: datetime) -> dict:
+    at, last_id = position
+    newer = {"updated_at": {"$gt": at, "$lte": until}}
+    if last_id is None:
+        return newer
+    return {"$or": [newer, {"updated_at": at, "_id": {"$gt": last_id}}]}
+
+
+async def changed_page(collection, base_filter: dict, position: Position, until: datetime, limit: int, projection=None):
+    """Documents changed after `position`, oldest first; returns (docs, new position, has_more)"""
+    query = {**base_filter, **_after(position, until)}
+    docs = await collection.find(query, projection).sort([("updated_at", 1), ("_id", 1)]).limit(limit + 1).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if not has_more and until > position[0]:
+        # Nothing else pending up to `until`; the next call starts there
+        position = (until, None)
+    elif docs:
+        position = (docs[-1]["updated_at"], docs[-1]["_id"])
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return docs, position, has_more
+
+
+async def sync_changes(user_id: str, token: Optional[str], collections: List[str], limit: int) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    until = now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    # Positions of collections not requested this time are carried over unchanged
+    positions = decode_watermark(token)
+
+    reset = False
+    horizon = now - timedelta(days=SYNC_TOMBSTONE_DAYS)
+    if token and any(EPOCH < at < horizon for at, _ in positions.values()):
+        # Tombstones older than the horizon are gone; the client must start over
+        reset = True
+        positions = {name: (EPOCH, None) for name in SYNC_COLLECTIONS}
+
+    result: Dict[str, Any] = {"reset": reset, "server_time": now}
+    for name in collections:
+        position = positions[name]
+        deleted: List[str] = []
+        if name == "products":
+            docs, new_position, has_more = await changed_page(catalog_db.products, {}, position, until, limit)
+            if position[0] > EPOCH:
+                deleted = await deleted_since("products", position[0], until)
+        elif name == "vendors":
+            docs, new_position, has_more = await changed_page(
+                catalog_db.vendor_profiles, {}, position, until, limit, VENDOR_PRIVATE_FIELDS
+            )
+            # Vendors that lost approval are removals from the client's point of view
+            deleted = [d["_id"] for d in docs if not d.get("is_approved")]
+            docs = [d for d in docs if d.get("is_approved")]
+        elif name == "orders":
+            # Own orders are read back right after writes, so they come from the primary
+            docs, new_position, has_more = await changed_page(db.orders, {"user_id": user_id}, position, until, limit)
+        else:
+            raise ValueError(f"Unknown sync collection {name}")
+        positions[name] = new_position
+        result[name] = {"changed": docs, "deleted": deleted, "has_more": has_more}
+
+    result["watermark"] = encode_watermark(positions)
+    result["has_more"] = any(result[name]["has_more"] for name in collections)
+    return result
+
+
+@periodic("backfill_updated_at", interval=3600)
+async def backfill_updated_at() -> dict:
+    """Documents written before updated_at was maintained everywhere would never sync"""
+    updated = {}
+    for name in ("products", "vendor_profiles", "orders"):
+        result = await db[name].update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": {"$ifNull": ["$created_at", "$$NOW"]}}}],
+        )
+        updated[name] = result.modified_count
+    return updated
@@ -0,0 +1,213 @@
+"""
+File uploads streamed to disk
+
+Images and documents used to arrive as base64 strings inside JSON bodies,
+which buffers, parses and validates the whole file in memory. The upload
+endpoints instead take a raw body (optionally base64, for clients that still
+hold base64 strings) or a multipart "file" field and write it to
+UPLOAD_DIR/<kind>/ chunk by chunk, decoding base64 on the fly. The size
+limit is enforced while streaming, and the file type is checked from its
+first bytes, so nothing larger than a chunk is ever held in memory.
+
+Stored files are referenced by URL: images are public under /api/uploads/,
+documents (tax certificates) are served to admins under /api/admin/uploads/.
+"""
+import binascii
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import Request
+
+from metrics import metrics
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", str(ROOT_DIR / "uploads")))
+UPLOAD_MAX_IMAGE_BYTES = int(os.environ.get("UPLOAD_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_MAX_DOCUMENT_BYTES = int(os.environ.get("UPLOAD_MAX_DOCUMENT_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+# Magic bytes -> (extension, content type)
+SIGNATURES = [
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+    (b"%PDF-", ("pdf", "application/pdf")),
+]
+
+KINDS = {
+    "images": {"types": {"image/jpeg", "image/png", "image/webp"}, "max_bytes": UPLOAD_MAX_IMAGE_BYTES, "public": True},
+    "documents": {
+        "types": {"image/jpeg", "image/png", "image/webp", "application/pdf"},
+        "max_bytes": UPLOAD_MAX_DOCUMENT_BYTES,
+        "public": False,
+    },
+}
+
+PUBLIC_URL_PREFIX = "/api/uploads/"
+PRIVATE_URL_PREFIX = "/api/admin/uploads/"
+
+NAME_PATTERN = re.compile(r"^[0-9a-f]{24}\.[a-z]{3,4}$")
+DATA_URL_PREFIX = re.compile(rb"^data:[\w/+.-]+;base64,")
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredUpload:
+    kind: str
+    name: str
+    size: int
+    content_type: str
+    sha256: str
+
+    @property
+    def url(self) -> str:
+        prefix = PUBLIC_URL_PREFIX if KINDS[self.kind]["public"] else PRIVATE_URL_PREFIX
+        return f"{prefix}{self.kind}/{self.name}"
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"url": self.url, "size": self.size, "content_type": self.content_type, "sha256": self.sha256}
+
+
+def sniff(head: bytes) -> Optional[Tuple[str, str]]:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    for signature, info in SIGNATURES:
+        if head.startswith(signature):
+            return info
+    return None
+
+
+def upload_path(kind: str, name: str) -> Optional[Path]:
+    """Path of a stored upload, or None for names that cannot be ours"""
+    if kind not in KINDS or not NAME_PATTERN.match(name):
+        return None
+    return UPLOAD_DIR / kind / name
+
+# ============== DECODING ==============
+
+
+async def base64_decoded(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Decode a base64 stream (optionally a data: URL) without joining it"""
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        data = pending + b"".join(chunk.split())
+        if first:
+            if len(data) < 64 and not data.endswith(b","):
+                # Too short to tell whether a data: URL prefix follows; wait for more
+                pending = data
+                continue
+            data = DATA_URL_PREFIX.sub(b"", data, count=1)
+            first = False
+        usable = len(data) - len(data) % 4
+        pending = data[usable:]
+        if usable:
+            try:
+                yield binascii.a2b_base64(data[:usable], strict_mode=True)
+            except binascii.Error:
+                raise UploadError(400, "Invalid base64 data")
+    if first:
+        pending = DATA_URL_PREFIX.sub(b"", pending, count=1)
+    if pending:
+        if len(pending) % 4:
+            raise UploadError(400, "Invalid base64 data")
+        try:
+            yield binascii.a2b_base64(pending, strict_mode=True)
+        except binascii.Error:
+            raise UploadError(400, "Invalid base64 data")
+
+
+async def request_chunks(request: Request, field: str = "file") -> AsyncIterator[bytes]:
+    """Raw request body, or the contents of one multipart file field"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get(field)
+        if upload is None or isinstance(upload, str):
+            raise UploadError(400, f"Missing {field} field")
+        try:
+            while data := await upload.read(CHUNK_SIZE):
+                yield data
+        finally:
+            await upload.close()
+    else:
+        async for data in request.stream():
+            if data:
+                yield data
+
+# ============== STORAGE ==============
+
+
+async def store_upload(kind: str, chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> StoredUpload:
+    """Write `chunks` to UPLOAD_DIR/<kind>/ with size and type checks; nothing is kept on failure"""
+    rules = KINDS[kind]
+    max_bytes = min(max_bytes or rules["max_bytes"], rules["max_bytes"])
+    directory = UPLOAD_DIR / kind
+    directory.mkdir(parents=True, exist_ok=True)
+
+    upload_id = str(ObjectId())
+    # Dot-prefixed until complete, so half-written files are never served
+    tmp_path = directory / f".{upload_id}.part"
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    detected = None
+    try:
+        with open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    metrics.inc("uploads_rejected", kind=kind, reason="too_large")
+                    raise UploadError(413, f"File is larger than {max_bytes} bytes")
+                if detected is None:
+                    head += chunk[:16]
+                    if len(head) >= 12:
+                        detected = sniff(head)
+                        if detected is None or detected[1] not in rules["types"]:
+                            metrics.inc("uploads_rejected", kind=kind, reason="type")
+                            raise UploadError(415, "Unsupported file type")
+                digest.update(chunk)
+                f.write(chunk)
+        if detected is None:
+            detected = sniff(head)
+            if detected is None or detected[1] not in rules["types"]:
+                metrics.inc("uploads_rejected", kind=kind, reason="type")
+                raise UploadError(415 if size else 400, "Unsupported file type" if size else "Empty upload")
+        extension, content_type = detected
+        name = f"{upload_id}.{extension}"
+        os.replace(tmp_path, directory / name)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    metrics.inc("uploads_stored", kind=kind)
+    metrics.inc("upload_bytes", size, kind=kind)
+    return StoredUpload(kind, name, size, content_type, digest.hexdigest())
+
+
+def delete_upload(url: Optional[str]):
+    """Remove a file previously returned by store_upload (ignores anything else)"""
+    prefix = next((p for p in (PUBLIC_URL_PREFIX, PRIVATE_URL_PREFIX) if url and url.startswith(p)), None)
+    if prefix is None:
+        return
+    parts = url[len(prefix):].split("/")
+    path = upload_path(*parts) if len(parts) == 2 else None
+    if path is not None:
+        path.unlink(missing_ok=True)
+
+
+async def receive_upload(request: Request, kind: str, encoding: Optional[str] = None) -> StoredUpload:
+    chunks = request_chunks(request)
+    if encoding == "base64":
+        chunks = base64_decoded(chunks)
+    return await store_upload(kind, chunks)
@@ -47,6 +47,15 @@ interface Category {
   icon: string;
 }
 
+interface Suggestion {
+  text: string;
+  kind: 'product' | 'category';
+  popularity: number;
+  products: number;
+}
+
+const SEARCH_DEBOUNCE_MS = 300;
+
 type SortOption = 'default' | 'price_asc' | 'price_desc' | 'name_asc' | 'discount';
 type ViewMode = 'grid' | 'list';
 
@@ -69,6 +78,8 @@ export default function Search() {
   const [selectedQuality, setSelectedQuality] = useState<string[]>([]);
   const [onlyAvailable, setOnlyAvailable] = useState(true);
   const [onlyDiscount, setOnlyDiscount] = useState(false);
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+  const [showSuggestions, setShowSuggestions] = useState(false);
   
   const fadeAnim = useRef(new Animated.Value(0)).current;
   const slideAnim = useRef(new Animated.Value(50)).current;
@@ -80,14 +91,45 @@ export default function Search() {
   }, []);
 
   useEffect(() => {
-    if (searchQuery || selectedCategory) {
-      searchProducts();
-    } else {
+    if (!searchQuery && !selectedCategory) {
       setProducts([]);
       setFilteredProducts([]);
+      return;
     }
+    // Full searches wait for a pause in typing; suggestions cover the keystrokes in between
+    const timer = setTimeout(searchProducts, searchQuery ? SEARCH_DEBOUNCE_MS : 0);
+    return () => clearTimeout(timer);
   }, [searchQuery, selectedCategory]);
 
+  useEffect(() => {
+    if (!searchQuery.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    api
+      .get(`/search/autocomplete?q=${encodeURIComponent(searchQuery)}&limit=8`)
+      .then((response) => {
+        if (!cancelled) setSuggestions(response.data.suggestions);
+      })
+      .catch(() => {
+        if (!cancelled) setSuggestions([]);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [searchQuery]);
+
+  const selectSuggestion = (suggestion: Suggestion) => {
+    setShowSuggestions(false);
+    if (suggestion.kind === 'category') {
+      setSearchQuery('');
+      setSelectedCategory(suggestion.text);
+    } else {
+      setSearchQuery(suggestion.text);
+    }
+  };
+
   useEffect(() => {
     applyFiltersAndSort();
   }, [products, sortBy, priceRange, selectedQuality, onlyAvailable, onlyDiscount]);
@@ -476,7 +518,12 @@ export default function Search() {
             placeholder="Ürün ara..."
             placeholderTextColor="#9ca3af"
             value={searchQuery}
-            onChangeText={setSearchQuery}
+            onChangeText={(text) => {
+              setSearchQuery(text);
+              setShowSuggestions(true);
+            }}
+            onSubmitEditing={() => setShowSuggestions(false)}
+            returnKeyType="search"
             autoCorrect={false}
           />
           {searchQuery.length > 0 && (
@@ -485,6 +532,26 @@ export default function Search() {
             </TouchableOpacity>
           )}
         </View>
+        {showSuggestions && suggestions.length > 0 && (
+          <View style={styles.suggestions}>
+            {suggestions.map((suggestion) => (
+              <TouchableOpacity
+                key={`${suggestion.kind}:${suggestion.text}`}
+                style={styles.suggestionRow}
+                onPress={() => selectSuggestion(suggestion)}
+              >
+                <Ionicons
+                  name={suggestion.kind === 'category' ? 'grid-outline' : 'search-outline'}
+                  size={16}
+                  color="#9ca3af"
+                />
+                <Text style={styles.suggestionText} numberOfLines={1}>
+                  {suggestion.text}
+                </Text>
+              </TouchableOpacity>
+            ))}
+          </View>
+        )}
       </View>
 
       {/* Categories */}
@@ -757,6 +824,9 @@ const getStyles = (colors: any) => StyleSheet.create({
   searchSection: { paddingHorizontal: 20, paddingVertical: 16, backgroundColor: colors.surface },
   searchContainer: { flexDirection: 'row', alignItems: 'center', backgroundColor: colors.card, borderRadius: 12, paddingHorizontal: 16, height: 48, borderWidth: 1, borderColor: colors.border },
   searchIcon: { marginRight: 8 },
+  suggestions: { marginTop: 8, backgroundColor: colors.card, borderRadius: 12, borderWidth: 1, borderColor: colors.border, overflow: 'hidden' },
+  suggestionRow: { flexDirection: 'row', alignItems: 'center', paddingHorizontal: 16, paddingVertical: 10, gap: 8 },
+  suggestionText: { flex: 1, fontSize: 15, color: colors.text },
   searchInput: { flex: 1, fontSize: 16, color: colors.text },
   categoriesSection: { paddingVertical: 12, backgroundColor: colors.surface, borderBottomWidth: 1, borderBottomColor: '#e5e7eb' },
   categoriesList: { paddingHorizontal: 20, gap: 8 },